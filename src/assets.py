@@ -0,0 +1,228 @@
+"""
+A cache of parsed asset files, kept as memory-mappable NumPy arrays.
+
+``AssetCache.get`` reads a file with a reader function returning named
+arrays, and saves them as ``.npy`` files in a directory of the cache.
+Entries are keyed by the content hash of the file, found again from its
+path, size and modification time without rereading it, so later reads
+of the same content map the saved arrays instead of parsing the file.
+The arrays are mapped copy-on-write, so they can be changed in place
+without changing the entry.
+
+The least recently used entries are removed while the cache takes more
+than its size limit.  ``cached`` reads through ``default_cache``, which
+``Mesh.load`` and ``formats.load`` use.
+"""
+
+from typing import Callable, Dict, Optional
+Arrays = Dict[str, 'np.ndarray']
+
+import hashlib
+import os
+import shutil
+import threading
+
+import numpy as np
+
+from common import represent
+
+
+# Total size of the entries kept by the default cache.
+CACHE_BYTES = 2**30
+
+# Bump to invalidate every entry when the saved arrays change.
+CACHE_VERSION = 1
+
+# Bytes hashed at a time.
+HASH_BLOCK_BYTES = 2**20
+
+SOURCES = 'sources'
+
+
+def default_directory() -> str:
+    """ Return the directory of the default cache, in the local
+    application data folder on Windows and ``~/.cache`` elsewhere.
+    """
+    base = (os.environ.get('LOCALAPPDATA')
+            or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'rendering', 'assets')
+
+
+class AssetCache(object):
+    """ Named arrays read from asset files, saved in directory.
+
+    Entries are never kept if larger than max_bytes.  A cache that
+    cannot be written to still reads files, so it is never required.
+    """
+
+    def __init__(self, directory: Optional[str] = None,
+                 max_bytes: int = CACHE_BYTES):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self) -> str:
+        return represent(self, self.directory, self.max_bytes,
+                         hits=self.hits, misses=self.misses)
+
+    def get(self, path, kind: str, read: Callable[[str], Arrays]
+            ) -> Arrays:
+        """ Return the arrays read from the file at path by read.  kind
+        names read and must be usable in a file name; arrays saved by
+        the same kind from the same content are memory-mapped instead.
+        """
+        entry = os.path.join(
+            self.directory, f'{kind}-{CACHE_VERSION}-{self.digest(path)}')
+        arrays = _load(entry)
+        if arrays is not None:
+            self.hits += 1
+            try:
+                os.utime(entry)
+            except OSError:
+                pass
+            return arrays
+
+        self.misses += 1
+        arrays = read(path)
+        if sum(array.nbytes for array in arrays.values()) <= self.max_bytes:
+            self._save(entry, arrays)
+            self.evict()
+        return arrays
+
+    def digest(self, path) -> str:
+        """ Return the content hash of the file at path, only hashing
+        the file again if its size or modification time has changed.
+        """
+        status = os.stat(path)
+        stamp = f'{status.st_size}-{status.st_mtime_ns}'
+        source = hashlib.sha1(os.path.realpath(path).encode()).hexdigest()
+        record = os.path.join(self.directory, SOURCES, source)
+
+        try:
+            with open(record) as file:
+                saved_stamp, digest = file.read().split()
+            if saved_stamp == stamp:
+                return digest
+        except (OSError, ValueError):
+            pass
+
+        digest = _hash_file(path)
+        try:
+            os.makedirs(os.path.dirname(record), exist_ok=True)
+            _replace(record, lambda temporary: _write_text(
+                temporary, f'{stamp} {digest}'))
+        except OSError:
+            pass
+        return digest
+
+    def entries(self) -> Dict[str, int]:
+        """ Return the size in bytes of every entry, keyed by its path,
+        from least to most recently used.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return {}
+
+        entries = []
+        for name in names:
+            entry = os.path.join(self.directory, name)
+            if name == SOURCES or name.endswith('.tmp'):
+                continue
+            try:
+                files = [os.path.join(entry, file)
+                         for file in os.listdir(entry)]
+                size = sum(os.path.getsize(file) for file in files)
+                entries.append((os.path.getmtime(entry), entry, size))
+            except OSError:
+                continue
+        return {entry: size for _, entry, size in sorted(entries)}
+
+    def evict(self) -> None:
+        """ Remove the least recently used entries while the entries
+        take more than max_bytes.
+        """
+        entries = self.entries()
+        total = sum(entries.values())
+        for entry, size in entries.items():
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        """ Remove every entry and source record, keeping the hit and
+        miss counts.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _save(self, entry: str, arrays: Arrays) -> None:
+        """ Save arrays as the files of the entry directory.
+        """
+        def save(temporary):
+            os.makedirs(temporary)
+            for name, array in arrays.items():
+                np.save(os.path.join(temporary, f'{name}.npy'), array,
+                        allow_pickle=False)
+        try:
+            _replace(entry, save)
+        except OSError:
+            # The arrays are still usable without their entry.
+            pass
+
+
+default_cache = AssetCache()
+
+
+def cached(path, kind: str, read: Callable[[str], Arrays]) -> Arrays:
+    """ Return the arrays read from the file at path by read, through
+    ``default_cache`` unless it is None.
+    """
+    if default_cache is None:
+        return read(path)
+    return default_cache.get(path, kind, read)
+
+
+def _load(entry: str) -> Optional[Arrays]:
+    """ Return the arrays of the entry directory memory-mapped
+    copy-on-write, or None if there is no such entry.
+    """
+    try:
+        return {os.path.splitext(name)[0]: np.load(os.path.join(entry, name),
+                                                   mmap_mode='c')
+                for name in os.listdir(entry) if name.endswith('.npy')}
+    except (OSError, ValueError):
+        return None
+
+
+def _hash_file(path) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _replace(path: str, write: Callable[[str], None]) -> None:
+    """ Make path by calling write with a temporary path and renaming
+    it, so path is never seen half written.
+    """
+    # Loader threads of one process may write the same entry at once.
+    temporary = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except OSError:
+        # Another process may have made a directory entry first.
+        if os.path.isdir(temporary):
+            shutil.rmtree(temporary, ignore_errors=True)
+        elif os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, 'w') as file:
+        file.write(text)
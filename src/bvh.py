@@ -0,0 +1,226 @@
+"""
+Bounding volume hierarchies for ray queries.
+
+Nodes are stored in flat arrays.  The children of an internal node are
+at ``left`` and ``left + 1``, and a leaf (``left == -1``) holds
+``count`` primitives listed from ``start`` in ``order``.  Queries
+traverse a whole tree level at a time with vectorized slab tests,
+rather than visiting nodes one by one.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+LEAF_SIZE = 8
+
+
+def ray_box_distances(origin, direction, lower: np.ndarray,
+                      upper: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return the distances along the ray at which it enters and
+    leaves each (N, 3) axis-aligned box.  The ray misses a box when
+    the entry distance is greater than the exit distance.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = 1.0 / np.asarray(direction, dtype=float)
+        near = (lower - origin)*inverse
+        far = (upper - origin)*inverse
+
+    # fmin and fmax ignore the NaNs of rays lying in a box's face.
+    entry = np.fmax.reduce(np.fmin(near, far), axis=1)
+    exit_ = np.fmin.reduce(np.fmax(near, far), axis=1)
+    return entry, exit_
+
+
+def ray_triangle_distances(origin, direction, corners_1: np.ndarray,
+                           corners_2: np.ndarray, corners_3: np.ndarray,
+                           epsilon: float = 1e-12) -> np.ndarray:
+    """ Return the distances along the ray to each triangle given by
+    its (N, 3) corners, or infinity where the ray misses.  Uses the
+    Moller-Trumbore test.
+    """
+    edges_1 = corners_2 - corners_1
+    edges_2 = corners_3 - corners_1
+
+    p = np.cross(direction, edges_2)
+    determinants = np.einsum('ij,ij->i', edges_1, p)
+    valid = np.abs(determinants) > epsilon
+    inverse = 1.0 / np.where(valid, determinants, 1.0)
+
+    s = origin - corners_1
+    u = np.einsum('ij,ij->i', s, p)*inverse
+    q = np.cross(s, edges_1)
+    v = (q @ direction)*inverse
+    distances = np.einsum('ij,ij->i', edges_2, q)*inverse
+
+    hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (distances > 0)
+    return np.where(hit, distances, np.inf)
+
+
+def transform_boxes(matrices: np.ndarray, lower: np.ndarray,
+                    upper: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return the axis-aligned boxes bounding each (N, 3) box after it
+    is transformed by the matching (N, 4, 4) matrix.
+    """
+    centers = (lower + upper) / 2
+    extents = (upper - lower) / 2
+
+    rotations = matrices[:, :3, :3]
+    centers = np.einsum('nij,nj->ni', rotations, centers) + matrices[:, :3, 3]
+    extents = np.einsum('nij,nj->ni', np.abs(rotations), extents)
+    return centers - extents, centers + extents
+
+
+class BVH(object):
+    """ Bounding volume hierarchy over axis-aligned primitive boxes.
+    """
+
+    def __init__(self, lower: np.ndarray, upper: np.ndarray,
+                 leaf_size: int = LEAF_SIZE):
+        """ Build the hierarchy by splitting the primitives at the
+        median centroid along the longest axis of each node.
+        """
+        lower = np.asarray(lower, dtype=float).reshape(-1, 3)
+        upper = np.asarray(upper, dtype=float).reshape(-1, 3)
+        count = len(lower)
+        centroids = (lower + upper) / 2
+
+        capacity = max(2*count - 1, 1)
+        self.starts = np.zeros(capacity, dtype=np.intp)
+        self.counts = np.zeros(capacity, dtype=np.intp)
+        self.left = np.full(capacity, -1, dtype=np.intp)
+        self.depths = np.zeros(capacity, dtype=np.intp)
+        self.order = np.arange(count)
+
+        node_count = 1
+        stack = [(0, 0, count, 0)]
+        while stack:
+            node, start, end, depth = stack.pop()
+            self.starts[node] = start
+            self.counts[node] = end - start
+            self.depths[node] = depth
+            if end - start <= leaf_size:
+                continue
+
+            segment = self.order[start:end]
+            points = centroids[segment]
+            axis = np.argmax(points.max(axis=0) - points.min(axis=0))
+            middle = (end - start) // 2
+            split = np.argpartition(points[:, axis], middle)
+            self.order[start:end] = segment[split]
+
+            left = self.left[node] = node_count
+            node_count += 2
+            stack.append((left, start, start + middle, depth + 1))
+            stack.append((left + 1, start + middle, end, depth + 1))
+
+        for name in ('starts', 'counts', 'left', 'depths'):
+            setattr(self, name, getattr(self, name)[:node_count])
+
+        self.lower = np.empty((node_count, 3))
+        self.upper = np.empty((node_count, 3))
+        BVH.refit(self, lower, upper)
+
+    def __len__(self) -> int:
+        return len(self.left)
+
+    def refit(self, lower: np.ndarray, upper: np.ndarray) -> None:
+        """ Update the node bounds for moved primitive boxes, keeping
+        the structure of the hierarchy.
+        """
+        leaves = np.flatnonzero(self.left < 0)
+        leaves = leaves[np.argsort(self.starts[leaves])]
+        if len(self.order):
+            starts = self.starts[leaves]
+            self.lower[leaves] = np.minimum.reduceat(
+                np.asarray(lower)[self.order], starts)
+            self.upper[leaves] = np.maximum.reduceat(
+                np.asarray(upper)[self.order], starts)
+        else:
+            self.lower[:] = np.inf
+            self.upper[:] = -np.inf
+
+        # Children are always deeper than their parent.
+        internal = np.flatnonzero(self.left >= 0)
+        for depth in range(self.depths.max(), -1, -1):
+            nodes = internal[self.depths[internal] == depth]
+            left = self.left[nodes]
+            self.lower[nodes] = np.minimum(self.lower[left],
+                                           self.lower[left + 1])
+            self.upper[nodes] = np.maximum(self.upper[left],
+                                           self.upper[left + 1])
+
+    def candidates(self, origin, direction,
+                   max_distance: float = np.inf) -> np.ndarray:
+        """ Return the indices of the primitives in every leaf whose box
+        is hit by the ray within max_distance.
+        """
+        origin = np.asarray(origin, dtype=float)
+        frontier = np.zeros(1, dtype=np.intp)
+        leaves = []
+
+        while frontier.size:
+            entry, exit_ = ray_box_distances(
+                origin, direction, self.lower[frontier], self.upper[frontier])
+            hit = (entry <= exit_) & (exit_ >= 0) & (entry <= max_distance)
+            frontier = frontier[hit]
+
+            is_leaf = self.left[frontier] < 0
+            leaves.append(frontier[is_leaf])
+            left = self.left[frontier[~is_leaf]]
+            frontier = np.concatenate((left, left + 1))
+
+        leaves = np.concatenate(leaves)
+        counts = self.counts[leaves]
+        if not counts.sum():
+            return np.zeros(0, dtype=np.intp)
+
+        # Expand each leaf into the range of ``order`` it covers.
+        offsets = np.repeat(self.starts[leaves] - np.cumsum(counts) + counts,
+                            counts)
+        return self.order[offsets + np.arange(counts.sum())]
+
+
+class TriangleBVH(BVH):
+    """ Bounding volume hierarchy over the triangles of a mesh, in mesh
+    space.  Vertices are passed to each query rather than stored, so
+    the hierarchy never holds a stale copy of them.
+    """
+
+    def __init__(self, vertices: np.ndarray, triangles: np.ndarray,
+                 leaf_size: int = LEAF_SIZE):
+        super().__init__(*self._triangle_boxes(vertices, triangles),
+                         leaf_size)
+
+    def refit(self, vertices: np.ndarray, triangles: np.ndarray) -> None:
+        """ Update the node bounds after the vertices have moved.
+        """
+        super().refit(*self._triangle_boxes(vertices, triangles))
+
+    def intersect(self, vertices: np.ndarray, triangles: np.ndarray,
+                  origin, direction) -> Optional[Tuple[int, float]]:
+        """ Return the index of the nearest triangle hit by the ray and
+        the distance to it in multiples of direction, or None.
+        """
+        origin = np.asarray(origin, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+
+        candidates = self.candidates(origin, direction)
+        if not candidates.size:
+            return None
+
+        # Only the candidate corners are converted, never every vertex.
+        corners = vertices[triangles[candidates]].astype(float)
+        distances = ray_triangle_distances(
+            origin, direction, corners[:, 0], corners[:, 1], corners[:, 2])
+
+        nearest = np.argmin(distances)
+        if np.isinf(distances[nearest]):
+            return None
+        return int(candidates[nearest]), float(distances[nearest])
+
+    @staticmethod
+    def _triangle_boxes(vertices, triangles) -> Tuple[np.ndarray, np.ndarray]:
+        corners = np.asarray(vertices, dtype=float)[np.asarray(triangles)]
+        return corners.min(axis=1), corners.max(axis=1)
@@ -2,10 +2,14 @@
 
 """
 
+import weakref
+from functools import lru_cache
 from math import degrees
 
+import numpy as np
 from kivy.core.window import Window
-from kivy.graphics import Color, Line, Triangle, Rectangle
+from kivy.graphics import Color, Line, Mesh as KivyMesh, Triangle, Rectangle
+from kivy.graphics.texture import Texture
 from kivy.properties import (BooleanProperty, BoundedNumericProperty,
     ObjectProperty, ReferenceListProperty)
 
@@ -15,7 +19,70 @@ from kivy.uix.gridlayout import GridLayout
 import shapes
 from controls import set_cursor_position
 from common import special_string, next_randint
-from geometry import CameraLogic, PhysicsMesh, Mesh, RGBA
+from geometry import CameraLogic, Instance, PhysicsMesh, Mesh, RGBA
+from scene import Scene
+
+
+# Kivy meshes index vertices with unsigned shorts.
+MAX_BATCH_TRIANGLES = 65535 // 3
+
+# Textured triangles are drawn in groups of this many shades, one color
+# instruction for each.
+TEXTURE_SHADES = 32
+
+# Kivy textures of the images of textured meshes.
+_textures = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=None)
+def shade_ramp() -> Texture:
+    """ Return a 256 by 1 luminance texture from black to white, so
+    the u coordinate of a vertex scales the color of its triangle.
+    """
+    texture = Texture.create(size=(256, 1), colorfmt='luminance')
+    texture.blit_buffer(bytes(range(256)), colorfmt='luminance',
+                        bufferfmt='ubyte')
+    texture.wrap = 'clamp_to_edge'
+    return texture
+
+
+def kivy_texture(image) -> Texture:
+    """ Return a Kivy texture of the planes of image, such as a
+    ``pixels.Texture``.  Textures of images whose planes are read-only
+    are made on first use and kept; images that can still be drawn
+    into, such as a ``pixels.PixelGrid``, are uploaded on every call,
+    so the texture never shows stale pixels.
+    """
+    cached = not image.planes.flags.writeable
+    if cached:
+        try:
+            return _textures[image]
+        except KeyError:
+            pass
+
+    planes = image.planes
+    width, height = planes.shape[1:]
+    # Rows of rgba bytes from the bottom up.
+    rgba = np.full((height, width, 4), 255, dtype=np.uint8)
+    rgba[..., :3] = planes.transpose(2, 1, 0)
+    texture = Texture.create(size=(width, height), colorfmt='rgba')
+    texture.blit_buffer(rgba.tobytes(), colorfmt='rgba', bufferfmt='ubyte')
+    texture.wrap = 'clamp_to_edge'
+    if cached:
+        _textures[image] = texture
+    return texture
+
+
+def _draw_batches(vertices: np.ndarray, texture=None) -> None:
+    """ Draw (3M, 4) x, y, u, v vertices as triangles with one Kivy
+    mesh instruction per ``MAX_BATCH_TRIANGLES`` triangles.
+    """
+    batch_size = 3*MAX_BATCH_TRIANGLES
+    for start in range(0, len(vertices), batch_size):
+        batch = vertices[start:start + batch_size]
+        KivyMesh(vertices=batch.ravel().tolist(),
+                 indices=range(len(batch)), mode='triangles',
+                 texture=texture)
 
 
 def _center_cursor(window=Window):
@@ -51,6 +118,9 @@ class Camera3D(CameraLogic, StencilView):
     _mouse_controlled = set()
     _last_mouse_controlled = None
 
+    # The scene.Pick of the last left click, or None.
+    selection = None
+
     def __init__(self, position=(0, 0, 0), heading=(0, 0, 0), meshes=(),
                  fov=100, **keywords):
         """ 
@@ -109,7 +179,16 @@ class Camera3D(CameraLogic, StencilView):
 
     def on_touch_down(self, touch):
         if self.mouse_control and touch.button == 'left':
-            self.parent.parent.notify(f'{self}: {touch.x:.5}, {touch.y:.5}')
+            self.selection = self.pick(touch.x, touch.y)
+            if self.selection is None:
+                self.parent.parent.notify(
+                    f'{self}: {touch.x:.5}, {touch.y:.5}')
+            else:
+                mesh, triangle, point, distance = self.selection
+                point = ', '.join(f'{axis:.3f}' for axis in point)
+                self.parent.parent.notify(
+                    f'{self}: {mesh.__class__.__name__} triangle '
+                    f'{triangle} at ({point})')
 
     def on_touch_up(self, touch):
         if touch == touch.ud.get('drag', None):
@@ -134,6 +213,61 @@ class Camera3D(CameraLogic, StencilView):
         Triangle(points=(x1, y1, x2, y2, x3, y3))
         # Line(points=(x1, y1, x2, y2, x3, y3), close=True)
 
+    @staticmethod
+    def draw_triangles(screen_points, triangles, shades=None, *,
+                       depths=None):
+        """ Draw all triangles with one Kivy mesh instruction per
+        ``MAX_BATCH_TRIANGLES`` triangles.  Shades pick a texel of
+        ``shade_ramp`` for each triangle, which scales the current
+        color.  Depths are ignored, as Kivy meshes are flat and drawn
+        in order.
+        """
+        corners = screen_points[triangles].reshape(-1, 2)
+
+        # Vertex format is x, y, u, v.
+        vertices = np.zeros((len(corners), 4), dtype=np.float32)
+        vertices[:, :2] = corners
+        texture = None
+        if shades is not None:
+            # Texel centers, so shades are not blended with neighbours.
+            vertices[:, 2] = np.repeat((np.asarray(shades)*255 + 0.5) / 256,
+                                       3)
+            vertices[:, 3] = 0.5
+            texture = shade_ramp()
+        _draw_batches(vertices, texture)
+
+    @staticmethod
+    def draw_textured_triangles(screen_points, depths, triangles, uvs,
+                                texture, shades=None):
+        """ Draw all triangles mapped with ``kivy_texture(texture)``,
+        with a color instruction for each of ``TEXTURE_SHADES`` shades.
+        Texture coordinates are interpolated linearly on screen, as Kivy
+        meshes are flat.
+        """
+        vertices = np.empty((3*len(triangles), 4), dtype=np.float32)
+        vertices[:, :2] = screen_points[triangles].reshape(-1, 2)
+        vertices[:, 2:] = np.asarray(uvs)[triangles].reshape(-1, 2)
+
+        if shades is None:
+            levels = np.full(len(triangles), TEXTURE_SHADES - 1)
+        else:
+            levels = np.rint(np.asarray(shades)*(TEXTURE_SHADES - 1)
+                             ).astype(int)
+        order = np.argsort(levels, kind='stable')
+        vertices = vertices.reshape(-1, 3, 4)[order].reshape(-1, 4)
+        levels = levels[order]
+
+        mapped = kivy_texture(texture)
+        starts = np.flatnonzero(np.diff(levels, prepend=-1))
+        for start, stop in zip(starts, np.append(starts[1:], len(levels))):
+            shade = levels[start] / (TEXTURE_SHADES - 1)
+            Color(shade, shade, shade)
+            _draw_batches(vertices[3*start:3*stop], mapped)
+
+    def draw_mesh(self, mesh, model_view=None, points=None):
+        Color(*mesh.color)
+        super().draw_mesh(mesh, model_view, points)
+
     def _debug_instructions(self):
         Color(0.0, 0.0, 0.0, 1.0)
         Line(rectangle=(self.x + 1.5, self.y + 1.5, self.width - 3,
@@ -142,10 +276,7 @@ class Camera3D(CameraLogic, StencilView):
     def draw_frame(self):
         self.canvas.clear()
         with self.canvas:
-            for mesh in sorted(self.meshes, key=self.distance_to_mesh,
-                               reverse=True):
-                Color(*mesh.color)
-                self.draw_mesh(mesh)
+            self.draw_meshes()
 
             if self.show_debug:
                 self._debug_instructions()
@@ -158,7 +289,7 @@ class CameraGrid(GridLayout):
     def __init__(self, meshes=(), **kwargs):
         super().__init__(**kwargs)
 
-        self.meshes = set(meshes)
+        self.meshes = Scene(meshes)
         self.load_meshes_initial()
 
     def __iter__(self) -> iter:
@@ -214,16 +345,18 @@ class CameraGrid(GridLayout):
 
     def load_meshes_3(self):
         sides = next_randint(3, 12)
-        self.meshes.add(Mesh(shapes.polygon(sides, 0.2), (0, 0, 3)))
+        self.meshes.add(Instance(Mesh.shape.polygon(sides, 0.2), (0, 0, 3)))
 
     def load_meshes_4(self):
-        def add_circle(rad, sides, z, func=shapes.circle):
-            self.meshes.add(Mesh(func(rad, sides), (0, 0, z),
-                color=RGBA.random(0.5)))
-        add_circle(1, 64, 4.1)
+        def add_circle(rad, sides, z, func=Mesh.shape.circle):
+            mesh = Instance(func(rad, sides), (0, 0, z),
+                            color=RGBA.random(0.5))
+            self.meshes.add(mesh)
+            return mesh
+        self.meshes.add_detail_levels(add_circle(1, 64, 4.1))
         add_circle(0.8, 12, 4)
         add_circle(0.6, 8, 3.9)
-        add_circle(0.4, 5, 3.8, shapes.centered_circle)
+        add_circle(0.4, 5, 3.8, Mesh.shape.centered_circle)
         add_circle(0.2, 3, 3.7)
 
     def load_meshes_5(self):
@@ -232,8 +365,10 @@ class CameraGrid(GridLayout):
         self.meshes.add(cuboid)
 
     def load_meshes_6(self):
+        cube = Mesh.shape.cube(1)
+
         def add_cube(x, y, z):
-            self.meshes.add(Mesh(shapes.cube(1), (x, y, z)))
+            self.meshes.add(Instance(cube, (x, y, z)))
         add_cube(5, 0, 0)
         add_cube(-5, 0, 0)
         add_cube(0, 5, 0)
@@ -0,0 +1,228 @@
+"""
+Records rendered frames on a background thread.
+
+``FrameCapture.capture`` is called once a frame with the pixels drawn,
+and only copies them into a bounded queue, so the render loop never
+waits for a frame to be encoded or written.  A writer thread takes the
+frames from the queue and writes them as a sequence of numbered PNG or
+PPM images, or appends them to a single raw RGB video file.
+
+Frames are (height, width, 3) arrays of bytes with rows from the top,
+as ``PixelGrid.image`` gives.  When the writer falls behind and the
+queue is full, new frames are dropped and counted rather than waited
+for.
+
+A raw video file holds the frames back to back with no header, and
+can be converted with, for example::
+
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s WIDTHxHEIGHT -r 30 -i frames.rgb
+"""
+
+from typing import Optional
+
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from common import represent
+
+
+# Frames waiting to be written before new frames are dropped.
+QUEUE_FRAMES = 8
+
+# zlib level of PNG images.  Low levels keep up with the frame rate.
+PNG_LEVEL = 1
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# The extension of the path of each kind of capture.
+KINDS = {
+    '.png': 'png',
+    '.ppm': 'ppm',
+    '.raw': 'raw',
+    '.rgb': 'raw',
+}
+
+
+def encode_ppm(frame: np.ndarray) -> bytes:
+    """ Return the (height, width, 3) frame as a binary PPM image.
+    """
+    height, width, _ = frame.shape
+    return b'P6 %d %d 255\n' % (width, height) + frame.tobytes()
+
+
+def encode_png(frame: np.ndarray, level: int = PNG_LEVEL) -> bytes:
+    """ Return the (height, width, 3) frame as an 8 bit RGB PNG image,
+    compressed at the zlib level.
+    """
+    height, width, _ = frame.shape
+    # Each row starts with a zero, for no filter.
+    rows = np.zeros((height, 1 + 3*width), dtype=np.uint8)
+    rows[:, 1:] = frame.reshape(height, -1)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b''.join((PNG_SIGNATURE,
+                     _png_chunk(b'IHDR', header),
+                     _png_chunk(b'IDAT', zlib.compress(rows, level)),
+                     _png_chunk(b'IEND', b'')))
+
+
+ENCODERS = {
+    'png': encode_png,
+    'ppm': encode_ppm,
+}
+
+
+class FrameCapture(object):
+    """ Writes the frames passed to ``capture`` to path on a background
+    thread, holding at most queue_frames frames not yet written.
+
+    The extension of path picks the kind of capture.  For ``.png`` and
+    ``.ppm`` images, path is formatted with the number of each frame,
+    as in ``'frames/{:05d}.png'``; for ``.raw`` or ``.rgb`` it is the
+    single file the frames are appended to, which must all have the
+    size of the first frame.
+    """
+
+    def __init__(self, path: str, queue_frames: int = QUEUE_FRAMES):
+        """ Start the writer thread, raising ValueError if the extension
+        of path is not a kind of capture.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in KINDS:
+            raise ValueError(f'Cannot capture frames to {extension} files.')
+        self.path = path
+        self.kind = KINDS[extension]
+
+        self.frames_captured = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        # The exception that stopped the writer, or None.
+        self.error: Optional[BaseException] = None
+
+        self.closed = False
+        self._shape = None
+        self._queue = queue.Queue(queue_frames)
+        self._thread = threading.Thread(target=self._write_frames,
+                                        name='FrameCapture', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'FrameCapture':
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return represent(self, self.path, captured=self.frames_captured,
+                         written=self.frames_written,
+                         dropped=self.frames_dropped)
+
+    def __str__(self) -> str:
+        return (f'capturing {os.path.basename(self.path)}: '
+                f'{self.frames_captured} frames, '
+                f'{self.frames_dropped} dropped')
+
+    def ready(self) -> bool:
+        """ Return whether a frame passed to ``capture`` now would be
+        queued, or count it as dropped and return False if the queue is
+        full, so a frame need not be read back only to be dropped.
+        """
+        if self._queue.full():
+            self.frames_dropped += 1
+            return False
+        return True
+
+    def capture(self, frame: np.ndarray, *, copy: bool = True) -> bool:
+        """ Queue the (height, width, 3) uint8 frame to be written and
+        return True, or count it as dropped and return False if the
+        queue is full.  Unless copy is False, the frame is copied
+        keeping its memory layout, so a view of a buffer drawn into next
+        is copied at the speed of memory and reordered on the writer
+        thread.  Raises ValueError for frames of another shape or type.
+        """
+        if self.closed:
+            raise ValueError('Frame capture is closed.')
+        if (frame.ndim != 3 or frame.shape[2] != 3
+                or frame.dtype != np.uint8):
+            raise ValueError(f'Frames must be (height, width, 3) uint8 '
+                             f'arrays, not {frame.shape} {frame.dtype}.')
+        if self.kind == 'raw' and self._shape not in (None, frame.shape):
+            # Frames of another size would garble the video.
+            self.frames_dropped += 1
+            return False
+        if not self.ready():
+            return False
+
+        if copy:
+            frame = np.copy(frame, order='K')
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+        self._shape = frame.shape
+        self.frames_captured += 1
+        return True
+
+    def close(self) -> None:
+        """ Write the frames still queued and stop the writer thread.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_frames(self) -> None:
+        """ Write queued frames until None is queued.  After an error,
+        frames are taken from the queue unwritten, so ``close`` never
+        waits.
+        """
+        video = None
+        try:
+            while True:
+                frame = self._queue.get()
+                if frame is None:
+                    return
+                if self.error is not None:
+                    continue
+                try:
+                    video = self._write(np.ascontiguousarray(frame), video)
+                    self.frames_written += 1
+                except Exception as error:
+                    # The thread must keep emptying the queue.
+                    self.error = error
+        finally:
+            if video is not None:
+                video.close()
+
+    def _write(self, frame: np.ndarray, video):
+        """ Write frame, and return the open raw video file, if any.
+        """
+        if self.kind == 'raw':
+            if video is None:
+                video = open(_made_path(self.path), 'wb')
+            video.write(frame.data)
+            return video
+
+        path = _made_path(self.path.format(self.frames_written))
+        with open(path, 'wb') as file:
+            file.write(ENCODERS[self.kind](frame))
+        return video
+
+
+def _made_path(path: str) -> str:
+    """ Make the directory of path if needed, and return path.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    return path
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    checksum = zlib.crc32(data, zlib.crc32(kind))
+    return struct.pack('>I', len(data)) + kind + data \
+        + struct.pack('>I', checksum)
@@ -0,0 +1,11 @@
+from pytest import fixture
+
+import assets
+
+
+@fixture(autouse=True)
+def asset_cache(tmp_path, monkeypatch):
+    """ Keep the assets cached by each test in its temporary directory.
+    """
+    monkeypatch.setattr(assets, 'default_cache',
+                        assets.AssetCache(str(tmp_path / 'cache')))
@@ -0,0 +1,168 @@
+"""
+Readers and writers of mesh file formats.
+
+``load`` reads a file with the loader registered for its extension in
+``LOADERS``.  Every loader returns a scene graph node whose descendants
+hold the meshes of the file, and takes an optional progress function,
+called with the fraction of the file read so far.
+
+Parsed files are kept in ``assets.default_cache`` as arrays describing
+the scene graph, so reading a file again only maps those arrays.  The
+loaders in ``UNCACHED_LOADERS`` are not cached here: they either map
+the file itself, as the binary PLY and STL readers do, or cache it on
+their own.
+"""
+
+from typing import Callable
+
+import os
+
+import numpy as np
+
+import assets
+from formats import ac3d, obj, ply, stl
+from formats.bulk import Progress
+from geometry import Mesh
+from scene import Node
+
+
+def load_mesh_file(file, progress: Progress = None) -> Node:
+    """ Read a file in the points and triangles text format of
+    ``geometry.read_mesh_file`` and return a scene graph node with a
+    child holding its mesh.
+    """
+    root = Node()
+    Node(Mesh.from_path(file), parent=root,
+         name=os.path.splitext(os.path.basename(file))[0])
+    if progress is not None:
+        progress(1.0)
+    return root
+
+
+LOADERS = {
+    '.ac': ac3d.load,
+    '.obj': obj.load,
+    '.ply': ply.load,
+    '.stl': stl.load,
+    '.txt': load_mesh_file,
+}
+
+# Loaders whose meshes already map the file, or that cache it through
+# ``Mesh.load``, so an entry would only be a second copy.
+UNCACHED_LOADERS = {ply.load, stl.load, load_mesh_file}
+
+
+def register_loader(*extensions: str, cached: bool = True):
+    """ Return a decorator registering a loader for files with any of
+    the extensions (like ``'.obj'``).  Unless cached, ``load`` reads
+    the files every time, for loaders that map them.
+    """
+    def register(function):
+        for extension in extensions:
+            LOADERS[extension.lower()] = function
+        if not cached:
+            UNCACHED_LOADERS.add(function)
+        return function
+    return register
+
+
+def loader(path) -> Callable:
+    """ Return the loader for the extension of path, or raise
+    ValueError if there is none.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        return LOADERS[extension]
+    except KeyError:
+        raise ValueError(f'No loader for {extension!r} files.') from None
+
+
+def load(path, progress: Progress = None) -> Node:
+    """ Read the mesh file at path and return a scene graph node whose
+    descendants hold its meshes.
+    """
+    function = loader(path)
+    if function in UNCACHED_LOADERS:
+        return function(path, progress)
+    # A node read on a miss is returned as it is, not rebuilt.
+    read = []
+
+    def read_arrays(path) -> assets.Arrays:
+        read.append(function(path, progress))
+        return _tree_arrays(read[0])
+
+    arrays = assets.cached(path, f'{function.__module__}.{function.__name__}',
+                           read_arrays)
+    if read:
+        return read[0]
+    if progress is not None:
+        progress(1.0)
+    return _tree(arrays)
+
+
+def _tree_arrays(root: Node) -> assets.Arrays:
+    """ Return arrays holding root, its descendants and their meshes,
+    with nodes in breadth first order.  Points keep the type they were
+    read as.
+    """
+    nodes = [root]
+    parents = [-1]
+    for index, node in enumerate(nodes):
+        nodes.extend(node.children)
+        parents.extend([index]*len(node.children))
+
+    meshes = [node.mesh for node in nodes if node.mesh is not None]
+    point_type = (np.result_type(*(mesh.vertices for mesh in meshes))
+                  if meshes else float)
+    numbers = np.cumsum([node.mesh is not None for node in nodes]) - 1
+    return {
+        'parents': np.array(parents, dtype=np.int64),
+        'names': np.array([node.name or '' for node in nodes], dtype=str),
+        'matrices': np.array([node.local_matrix for node in nodes]),
+        'meshes': np.where([node.mesh is None for node in nodes], -1,
+                           numbers).astype(np.int64),
+        'colors': np.array([tuple(mesh.color) for mesh in meshes],
+                           dtype=float).reshape(-1, 4),
+        'positions': np.array([mesh.position for mesh in meshes],
+                              dtype=float).reshape(-1, 3),
+        'orientations': np.array([mesh.orientation for mesh in meshes],
+                                 dtype=float).reshape(-1, 4),
+        'point_counts': np.array([len(mesh.vertices) for mesh in meshes],
+                                 dtype=np.int64),
+        'triangle_counts': np.array([len(mesh.indices) for mesh in meshes],
+                                    dtype=np.int64),
+        'points': np.concatenate([np.empty((0, 3), dtype=point_type)] + [
+            mesh.vertices for mesh in meshes]),
+        'triangles': np.concatenate([np.empty((0, 3), dtype=np.uint32)] + [
+            np.asarray(mesh.indices, dtype=np.uint32) for mesh in meshes]),
+    }
+
+
+def _tree(arrays: assets.Arrays) -> Node:
+    """ Return the root of the scene graph held by arrays, as made by
+    ``_tree_arrays``.
+    """
+    point_ends = np.cumsum(arrays['point_counts']).tolist()
+    triangle_ends = np.cumsum(arrays['triangle_counts']).tolist()
+
+    meshes = []
+    point_start = triangle_start = 0
+    for index, (point_end, triangle_end) in enumerate(zip(point_ends,
+                                                          triangle_ends)):
+        mesh = Mesh((arrays['points'][point_start:point_end],
+                     arrays['triangles'][triangle_start:triangle_end]),
+                    arrays['positions'][index],
+                    color=arrays['colors'][index].tolist(), copy=False)
+        mesh.orientation = arrays['orientations'][index]
+        meshes.append(mesh)
+        point_start, triangle_start = point_end, triangle_end
+
+    nodes = []
+    for parent, name, matrix, mesh in zip(
+            arrays['parents'].tolist(), arrays['names'].tolist(),
+            arrays['matrices'], arrays['meshes'].tolist()):
+        node = Node(None if mesh < 0 else meshes[mesh], name=name or None,
+                    parent=None if parent < 0 else nodes[parent])
+        node.local_matrix = matrix
+        nodes.append(node)
+    return nodes[0]
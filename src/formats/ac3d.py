@@ -1,53 +1,317 @@
+"""
+Reads and writes AC3D (``.ac``) files.
+
+Files are streamed a line at a time, and the points and surface
+references of each object are parsed in bulk into arrays, so memory
+stays bounded by the largest single object rather than the file.
+Polygons are triangulated as fans all at once, and the ``kids`` of
+each object become child nodes of a scene graph.
+
+Writing formats the point and surface blocks a chunk of rows at a
+time with ``bulk.write_rows``, rather than a call per line.
+"""
+
+from typing import (Callable, Dict, Iterator, List, Optional, TextIO,
+    Tuple)
+
+import re
+from itertools import islice
+
+import numpy as np
+
+from formats.bulk import (Progress, fans, parse_rows, stream_progress,
+    write_rows)
+from geometry import Mesh, RGBA
+from scene import Node
+
+
 SIGNATURE = 'AC3D'
 
 VERSION = 11
 VERSION_CHAR = format(VERSION, 'x')
 
-TOKENS = {
-    name
-        data
-    texture
-    texrep
-    rot
-    loc
-    url
-    numvert
-    numsurf
-        SURF
-        mat
-        refs
-    kids
-}
-
-
-def load(file):
-    """ Read a .cbt formatted file and return its points and triangles.
+# Object tokens that are read past without being used.
+TOKENS = frozenset({
+    'crease', 'folded', 'hidden', 'locked', 'subdiv', 'texoff', 'texrep',
+    'texture', 'url',
+})
+
+# The surface type of filled polygons, in the low bits of SURF flags.
+POLYGON = 0
+# Flags of written surfaces: shaded polygons.
+SURFACE_FLAGS = 0x10
+
+# Points are written with enough digits for the float32 scene buffers.
+POINT_FORMAT = '%.9g %.9g %.9g\n'
+
+_RGB = re.compile(r'\brgb\s+(\S+)\s+(\S+)\s+(\S+)')
+_TRANS = re.compile(r'\btrans\s+(\S+)')
+
+
+def load(file, progress: Progress = None) -> Node:
+    """ Read the AC3D file at the path file and return a scene graph
+    node whose children are the top level objects of the file.
     """
     with open(file, 'r') as stream:
+        return read(stream, progress)
+
+
+def read(stream: TextIO, progress: Progress = None) -> Node:
+    """ Read an AC3D file from the text stream and return a scene graph
+    node whose children are the top level objects of the file.
+    progress is called with the fraction read after each object.
+
+    Objects with polygons get a mesh, colored by the material of their
+    first polygon, and are placed by their ``loc`` and ``rot``.
+    """
+    report = stream_progress(stream, progress)
+
+    # Read the signature and version char:
+    header = stream.readline().strip()
+    signature = header[:len(SIGNATURE)]
+    if signature != SIGNATURE:
+        raise SyntaxError(
+            f'Invalid signature: {signature!r} != {SIGNATURE}.')
+    try:
+        int(header[len(SIGNATURE):], base=16)
+    except ValueError:
+        raise SyntaxError(f'Invalid version: {header!r}.') from None
+
+    root = Node()
+    materials = []
+    for tokens in _token_lines(stream):
+        if tokens[0] == 'MATERIAL':
+            materials.append(_material(' '.join(tokens)))
+        elif tokens[0] == 'OBJECT':
+            _read_object(stream, materials, root, report)
+        else:
+            raise SyntaxError(f'Unexpected token: {tokens[0]!r}.')
+    return root
+
+
+def save(file, objects) -> None:
+    """ Write objects to an AC3D file at the path file.  objects is a
+    scene graph node whose children are written under the world object
+    (as returned by ``load``), or an iterable of meshes.
+    """
+    with open(file, 'w') as stream:
+        write(stream, objects)
+
+
+def write(stream: TextIO, objects) -> None:
+    """ Write objects to the text stream in AC3D format.  objects is a
+    scene graph node whose children are written as the kids of a single
+    world object, or an iterable of meshes.  A lone child without a
+    mesh, as returned by ``read``, is written as the world object
+    itself.
+
+    Each mesh is written in mesh space, placed by the transform of its
+    node combined with its own position and orientation.
+    """
+    if not isinstance(objects, Node):
+        root = Node()
+        for mesh in objects:
+            Node(mesh, parent=root)
+        objects = root
+
+    materials = {}
+    for node in objects:
+        if node.mesh is not None:
+            materials.setdefault(RGBA(*node.mesh.color), len(materials))
+
+    stream.write(f'{SIGNATURE}{VERSION_CHAR}\n')
+    for color in materials:
+        r, g, b, a = color
+        stream.write(f'MATERIAL "ac3dmat{materials[color]}" '
+                     f'rgb {r:.6g} {g:.6g} {b:.6g}  amb 0.2 0.2 0.2  '
+                     f'emis 0 0 0  spec 0.5 0.5 0.5  shi 10  '
+                     f'trans {1 - a:.6g}\n')
+    children = objects.children
+    if len(children) == 1 and children[0].mesh is None:
+        _write_object(stream, children[0], materials, 'world')
+    else:
+        # Files hold one world object, whose kids carry the geometry.
+        stream.write(f'OBJECT world\nkids {len(children)}\n')
+        for node in children:
+            _write_object(stream, node, materials, 'poly')
 
-        # Read the signature:
-        signature = stream.read(4)
-        if signature != SIGNATURE:
-            raise SyntaxError(
-                f'Invalid signature: {signature!r} != {SIGNATURE}.')
 
-        # Read the version char:
-        version_char = stream.read(1)
-        version = int(version_char, base=16)
+def _read_object(stream: TextIO, materials: List[RGBA], parent: Node,
+                 report: Callable[[], None]) -> Node:
+    """ Read the body of an object, after its ``OBJECT`` line, and its
+    kids into a new child node of parent, calling report after each.
+    """
+    name = None
+    points = np.empty((0, 3))
+    triangles = np.empty((0, 3), dtype=np.uint32)
+    material = None
+    matrix = np.identity(4)
+
+    for tokens in _token_lines(stream):
+        token = tokens[0]
+        if token == 'name':
+            name = ' '.join(tokens[1:]).strip('"')
+        elif token == 'data':
+            _skip_characters(stream, int(tokens[1]))
+        elif token == 'rot':
+            # Rotations are stored for row vectors.
+            matrix[:3, :3] = np.array(tokens[1:10], dtype=float
+                                      ).reshape(3, 3).T
+        elif token == 'loc':
+            matrix[:3, 3] = np.array(tokens[1:4], dtype=float)
+        elif token == 'numvert':
+            points = _read_rows(stream, int(tokens[1]), 3).reshape(-1, 3)
+        elif token == 'numsurf':
+            triangles, material = _read_surfaces(stream, int(tokens[1]),
+                                                 len(points))
+        elif token == 'kids':
+            break
+        elif token not in TOKENS:
+            raise SyntaxError(f'Unexpected token: {token!r}.')
+    else:
+        raise SyntaxError('Object without kids.')
+
+    mesh = None
+    if len(triangles):
+        color = None if material is None else _lookup(materials, material)
+        mesh = Mesh((points, triangles), (0, 0, 0), color=color)
+    node = Node(mesh, parent=parent, name=name)
+    node.local_matrix = matrix
+    report()
+
+    for _ in range(int(tokens[1])):
+        tokens = next(_token_lines(stream), None)
+        if tokens is None or tokens[0] != 'OBJECT':
+            raise SyntaxError('Missing kid object.')
+        _read_object(stream, materials, node, report)
+    return node
+
+
+def _read_surfaces(stream: TextIO, count: int, point_count: int
+                   ) -> Tuple[np.ndarray, Optional[int]]:
+    """ Read count surfaces and return the (M, 3) triangles of their
+    polygons, with the material of the first polygon.
+    """
+    ref_lines = []
+    ref_counts = []
+    flags = []
+    materials = []
+    material = 0
+
+    # Surface headers are matched by prefix, as this loop runs once for
+    # every polygon of the file.
+    readline = stream.readline
+    for _ in range(count):
+        line = readline()
+        if not line.startswith('SURF'):
+            raise SyntaxError(f'Expected SURF, got {line!r}.')
+        flags.append(int(line[4:], base=16))
+
+        line = readline()
+        if line.startswith('mat'):
+            material = int(line[3:])
+            line = readline()
+        if not line.startswith('refs'):
+            raise SyntaxError(f'Expected refs, got {line!r}.')
+        materials.append(material)
+
+        ref_count = int(line[4:])
+        ref_counts.append(ref_count)
+        ref_lines.extend(islice(stream, ref_count))
+
+    ref_counts = np.array(ref_counts, dtype=np.intp)
+    polygons = (np.array(flags, dtype=np.intp) & 0xF) == POLYGON
+    first_material = (materials[int(polygons.argmax())] if polygons.any()
+                      else None)
+
+    # References are lines of a point index and texture coordinates.
+    refs = parse_rows(ref_lines, ref_counts.sum(), 3)[:, 0].astype(np.intp)
+    if len(refs) and not 0 <= refs.min() <= refs.max() < point_count:
+        raise SyntaxError('Surface reference out of range.')
+
+    return (fans(refs[np.repeat(polygons, ref_counts)],
+                 ref_counts[polygons]), first_material)
+
 
-        for line in stream:
-            line = line.strip()
+def _write_object(stream: TextIO, node: Node, materials: Dict[RGBA, int],
+                  kind: str) -> None:
+    """ Write node as an object of kind, followed by its kids.
+    """
+    mesh = node.mesh
+    if kind != 'world':
+        kind = 'group' if mesh is None else 'poly'
+    stream.write(f'OBJECT {kind}\n')
+    if node.name is not None:
+        name = node.name.replace('"', "'")
+        stream.write(f'name "{name}"\n')
+
+    matrix = node.local_matrix
+    if mesh is not None:
+        matrix = matrix @ mesh.model_matrix()
+    if not np.allclose(matrix[:3, :3], np.identity(3)):
+        # Rotations are stored for row vectors.
+        stream.write('rot %.9g %.9g %.9g %.9g %.9g %.9g %.9g %.9g %.9g\n'
+                     % tuple(matrix[:3, :3].T.ravel().tolist()))
+    if matrix[:3, 3].any():
+        stream.write('loc %.9g %.9g %.9g\n' % tuple(matrix[:3, 3].tolist()))
+
+    if mesh is not None:
+        points = np.asarray(mesh.vertices)
+        triangles = np.asarray(mesh.indices)
+        material = materials[RGBA(*mesh.color)]
+
+        stream.write(f'numvert {len(points)}\n')
+        write_rows(stream, POINT_FORMAT, points)
+        stream.write(f'numsurf {len(triangles)}\n')
+        write_rows(stream, f'SURF {SURFACE_FLAGS:#x}\nmat {material}\n'
+                           'refs 3\n%d 0 0\n%d 0 0\n%d 0 0\n', triangles)
+
+    stream.write(f'kids {len(node.children)}\n')
+    for child in node.children:
+        _write_object(stream, child, materials, 'poly')
+
+
+def _read_rows(stream: TextIO, count: int, width: int) -> np.ndarray:
+    """ Read the next count lines of width numbers into a (count, width)
+    float array.
+    """
+    return parse_rows(islice(stream, count), count, width)
 
-            # Read points.
-            if line.startswith('numvert'):
-                point_count = int(line[8:])
 
-                for _ in range(point_count):
-                    line = next(stream)
+def _token_lines(stream: TextIO) -> Iterator[List[str]]:
+    """ Yield the tokens of the following non-blank lines of stream.
+    """
+    for line in stream:
+        tokens = line.split()
+        if tokens:
+            yield tokens
 
 
-    return points, triangles
+def _skip_characters(stream: TextIO, count: int) -> None:
+    """ Read past a data block of count characters and its newline.
+    """
+    while count > 0:
+        line = stream.readline()
+        if not line:
+            raise SyntaxError('Data block ends the file.')
+        count -= len(line)
 
 
-def save(file, points=(), triangles=()):
-    pass
+def _material(line: str) -> RGBA:
+    """ Return the color of a ``MATERIAL`` line.
+    """
+    rgb = _RGB.search(line)
+    if rgb is None:
+        raise SyntaxError(f'Material without rgb: {line!r}.')
+    trans = _TRANS.search(line)
+    alpha = 1.0 - (0.0 if trans is None else float(trans.group(1)))
+    return RGBA(*map(float, rgb.groups()), alpha)
+
+
+def _lookup(materials: List[RGBA], index: int) -> RGBA:
+    """ Return the material at index.
+    """
+    try:
+        return materials[index]
+    except IndexError:
+        raise SyntaxError(f'Undefined material: {index}.') from None
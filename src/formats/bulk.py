@@ -0,0 +1,85 @@
+"""
+Helpers for text mesh formats, working on blocks of rows at once.
+"""
+
+from typing import Callable, Iterable, Optional, TextIO, Union
+Progress = Optional[Callable[[float], None]]
+
+import io
+import os
+
+import numpy as np
+
+
+# Rows formatted by each write.
+CHUNK_ROWS = 2**16
+
+
+def parse_numbers(text: Union[str, bytes], count: int,
+                  dtype=float) -> np.ndarray:
+    """ Parse count whitespace separated numbers from text.
+    """
+    # NumPy stops at the first bad float, so the count finds it, but
+    # fails at the first bad integer.
+    try:
+        values = np.fromstring(text, dtype=dtype, sep=' ')
+    except ValueError as error:
+        raise SyntaxError(str(error)) from None
+    if len(values) != count:
+        raise SyntaxError(f'Expected {count} numbers, read {len(values)}.')
+    return values
+
+
+def parse_rows(lines: Iterable[str], count: int, width: int,
+               dtype=float) -> np.ndarray:
+    """ Parse lines of width numbers each into a (count, width) array.
+    """
+    return parse_numbers(''.join(lines), count*width, dtype).reshape(
+        count, width)
+
+
+def write_rows(stream: TextIO, row_format: str, rows: np.ndarray) -> None:
+    """ Write every row of rows formatted by row_format, filling a
+    repeated template for a chunk of rows at a time.
+    """
+    for start in range(0, len(rows), CHUNK_ROWS):
+        chunk = rows[start:start + CHUNK_ROWS]
+        stream.write(row_format*len(chunk) % tuple(chunk.ravel().tolist()))
+
+
+def stream_progress(stream, progress: Progress) -> Callable[[], None]:
+    """ Return a function calling progress with the fraction of the file
+    of stream read so far.  It does nothing if progress is None or
+    stream is not a file.
+    """
+    try:
+        size = os.fstat(stream.fileno()).st_size
+    except (AttributeError, io.UnsupportedOperation):
+        progress = None
+    if progress is None:
+        return lambda: None
+
+    # Text streams cannot tell their position while being iterated,
+    # but their buffers can.
+    buffer = getattr(stream, 'buffer', stream)
+    return lambda: progress(min(buffer.tell() / max(size, 1), 1.0))
+
+
+def fans(indices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """ Return the (M, 3) uint32 triangles fanning out from the first
+    corner of each polygon, where polygons are runs of counts indices.
+    Polygons of fewer than three indices give no triangles.
+    """
+    indices = np.asarray(indices)
+    counts = np.asarray(counts, dtype=np.intp)
+
+    # Polygon i of n corners gives the triangles (0, j, j + 1) for j in
+    # 1 .. n - 2.
+    starts = np.cumsum(counts) - counts
+    sizes = np.maximum(counts - 2, 0)
+    firsts = np.repeat(starts, sizes)
+    steps = (np.arange(len(firsts))
+             - np.repeat(np.cumsum(sizes) - sizes, sizes) + 1)
+    triangles = np.column_stack((indices[firsts], indices[firsts + steps],
+                                 indices[firsts + steps + 1]))
+    return triangles.astype(np.uint32).reshape(-1, 3)
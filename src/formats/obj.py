@@ -0,0 +1,244 @@
+"""
+Reads and writes Wavefront OBJ (``.obj``) files.
+
+Files are read in blocks of ``CHUNK_CHARACTERS``.  The ``v`` and ``f``
+records of a block are picked out by regular expressions and parsed by
+single NumPy calls, with each face marked by a zero, which is never an
+OBJ index, so polygons of any size are split and fan triangulated as
+whole arrays.  Each ``o`` object becomes a node of its own.
+
+Texture coordinates, normals, groups and materials are skipped.
+
+Run ``python -m formats.obj`` to time a file of five million faces.
+"""
+
+from typing import Iterator, List, TextIO, Tuple
+
+import re
+import time
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+import shapes
+import transforms
+from formats.bulk import (Progress, fans, parse_numbers, stream_progress,
+    write_rows)
+from geometry import Mesh
+from scene import Node
+
+
+# Characters read at a time, extended to the end of a line.  Small
+# blocks keep each regular expression search short, so a file read on a
+# worker thread holds the GIL for a few milliseconds at a time.
+CHUNK_CHARACTERS = 2**20
+
+# Points are written with enough digits for the float32 scene buffers.
+POINT_FORMAT = 'v %.9g %.9g %.9g\n'
+FACE_FORMAT = 'f %d %d %d\n'
+
+# Records are matched after a newline, rather than at ^ in multiline
+# mode, so the search can skip ahead to the newlines.
+_VERTEX = re.compile(r'\nv[ \t]+([^\n]*)')
+_FACE = re.compile(r'\nf[ \t]+([^\n]*)')
+_OBJECT = re.compile(r'\no[ \t]+([^\n]*)')
+
+_SPACE = ord(' ')
+_SLASH = ord('/')
+
+
+def load(file, progress: Progress = None) -> Node:
+    """ Read the OBJ file at the path file and return a scene graph node
+    whose children hold a mesh for each object of the file.
+    """
+    with open(file, 'r') as stream:
+        return read(stream, progress)
+
+
+def read(stream: TextIO, progress: Progress = None) -> Node:
+    """ Read an OBJ file from the text stream and return a scene graph
+    node whose children hold a mesh for each object of the file.
+    progress is called with the fraction read after each block.
+
+    Negative indices count back from the latest vertex.  The points of
+    each mesh are only those its faces use.
+    """
+    points = []
+    point_count = 0
+    # The name and triangles of each object, starting with the faces
+    # before any o record.
+    objects = [(None, [])]
+
+    report = stream_progress(stream, progress)
+    for chunk in _chunks(stream):
+        pieces = _OBJECT.split('\n' + chunk)
+        for index, piece in enumerate(pieces):
+            if index % 2:
+                objects.append((piece.strip(), []))
+                continue
+            triangles = _read_faces(piece, point_count)
+            if len(triangles):
+                objects[-1][1].append(triangles)
+            new_points = _read_points(piece)
+            points.append(new_points)
+            point_count += len(new_points)
+        report()
+
+    points = np.concatenate(points) if points else np.empty((0, 3))
+    root = Node()
+    for name, triangles in objects:
+        if not triangles:
+            continue
+        triangles = np.concatenate(triangles)
+        if triangles.max() >= point_count:
+            raise SyntaxError('Face index out of range.')
+        Node(Mesh(_used(points, triangles), (0, 0, 0)), parent=root,
+             name=name)
+    return root
+
+
+def save(file, objects) -> None:
+    """ Write objects to an OBJ file at the path file.  objects is a
+    scene graph node whose meshes are each written as an object (as
+    returned by ``load``), or an iterable of meshes.
+    """
+    with open(file, 'w') as stream:
+        write(stream, objects)
+
+
+def write(stream: TextIO, objects) -> None:
+    """ Write objects to the text stream in OBJ format.  objects is a
+    scene graph node whose meshes are each written as an object (as
+    returned by ``read``), or an iterable of meshes.
+
+    OBJ files have no transforms, so points are written in world space.
+    """
+    if isinstance(objects, Node):
+        placed = [(node.name, node.mesh,
+                   node.world_matrix @ node.mesh.model_matrix())
+                  for node in objects if node.mesh is not None]
+    else:
+        placed = [(None, mesh, mesh.model_matrix()) for mesh in objects]
+
+    point_count = 0
+    for index, (name, mesh, matrix) in enumerate(placed):
+        stream.write(f'o {name or f"mesh{index}"}\n')
+        points = transforms.apply(matrix, np.asarray(mesh.vertices))
+        write_rows(stream, POINT_FORMAT, points)
+        write_rows(stream, FACE_FORMAT,
+                   np.asarray(mesh.indices, dtype=np.int64)
+                   + point_count + 1)
+        point_count += len(points)
+
+
+def benchmark(face_count: int = 5_000_000) -> None:
+    """ Print the time to write and read back an OBJ file of a sphere
+    with about face_count triangles.
+    """
+    segments = int(face_count**0.5)
+    mesh = Mesh(shapes.sphere(1, segments), (0, 0, 0))
+
+    with TemporaryDirectory() as directory:
+        path = f'{directory}/sphere.obj'
+        start = time.perf_counter()
+        save(path, [mesh])
+        written = time.perf_counter()
+        node, = load(path).children
+        read_time = time.perf_counter() - written
+
+        with open(path, 'rb') as file:
+            size = file.seek(0, 2)
+
+    assert np.array_equal(node.mesh.triangles, mesh.triangles)
+    print(f'{len(mesh.triangles)} faces, {size / 2**20:.0f} MiB: '
+          f'written in {written - start:.2f} s, read in {read_time:.2f} s')
+
+
+def _chunks(stream: TextIO) -> Iterator[str]:
+    """ Yield blocks of whole lines of stream.
+    """
+    while True:
+        chunk = stream.read(CHUNK_CHARACTERS)
+        if not chunk:
+            return
+        yield chunk + stream.readline()
+
+
+def _read_points(text: str) -> np.ndarray:
+    """ Return the (N, 3) points of the ``v`` records of text.
+    """
+    lines = _VERTEX.findall(text)
+    try:
+        values = parse_numbers('\n'.join(lines), 3*len(lines))
+    except SyntaxError:
+        # Records with a w coordinate or a color.
+        values = parse_numbers(
+            '\n'.join(' '.join(line.split()[:3]) for line in lines),
+            3*len(lines))
+    return values.reshape(-1, 3)
+
+
+def _read_faces(text: str, point_count: int) -> np.ndarray:
+    """ Return the (M, 3) triangles of the ``f`` records of text, after
+    point_count points.
+    """
+    lines = _FACE.findall(text)
+    if not lines:
+        return np.empty((0, 3), dtype=np.uint32)
+
+    values = _face_numbers(lines)
+
+    starts = np.flatnonzero(values == 0)
+    counts = np.diff(np.append(starts, len(values))) - 1
+    corners = np.delete(values, starts)
+
+    if len(corners) and corners.min() < 0:
+        # Count back from the points before each face.
+        point_starts = [match.start() for match in _VERTEX.finditer(text)]
+        face_starts = [match.start() for match in _FACE.finditer(text)]
+        before = point_count + np.repeat(
+            np.searchsorted(point_starts, face_starts), counts)
+        corners = np.where(corners < 0, before + corners, corners - 1)
+        if corners.min() < 0:
+            raise SyntaxError('Face index out of range.')
+    else:
+        corners -= 1
+    return fans(corners, counts)
+
+
+def _face_numbers(lines: List[str]) -> np.ndarray:
+    """ Return the point indices of the corners of the faces in lines,
+    with a 0 before each face.
+    """
+    text = np.frombuffer(('0 ' + ' 0 '.join(lines)).encode(),
+                         dtype=np.uint8).copy()
+    spaces = text <= _SPACE
+
+    # Texture and normal references run from a slash to the next space.
+    if (text == _SLASH).any():
+        positions = np.arange(len(text))
+        last_space = np.maximum.accumulate(np.where(spaces, positions, -1))
+        last_slash = np.maximum.accumulate(
+            np.where(text == _SLASH, positions, -1))
+        text[last_slash > last_space] = _SPACE
+        spaces = text <= _SPACE
+
+    count = np.count_nonzero(spaces[:-1] & ~spaces[1:]) + 1
+    return parse_numbers(text.tobytes(), count, np.int64)
+
+
+def _used(points: np.ndarray, triangles: np.ndarray
+          ) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return the points used by triangles, and the triangles indexing
+    them.
+    """
+    used = np.zeros(len(points), dtype=bool)
+    used[triangles] = True
+    if used.all():
+        return points, triangles
+    numbers = np.cumsum(used) - 1
+    return points[used], numbers[triangles].astype(np.uint32)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,246 @@
+"""
+Reads binary PLY (``.ply``) files.
+
+After its text header, a binary PLY file holds each element as fixed
+size records, so ``PLYFile`` memory-maps the vertex and face elements
+as NumPy structured arrays.  Opening a file only reads its header, and
+the points and faces are views whose pages are read from disk when
+they are first touched.
+
+Faces are mapped with the corner count of the first face, which must
+be shared by every face.  ASCII files are not supported.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+import os
+
+import numpy as np
+
+from common import represent
+from formats.bulk import Progress, fans
+from geometry import Mesh
+from scene import Node
+
+
+SIGNATURE = b'ply'
+
+FORMATS = {
+    'binary_little_endian': '<',
+    'binary_big_endian': '>',
+}
+
+TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+FACE_INDICES = ('vertex_indices', 'vertex_index')
+
+
+class Property(NamedTuple):
+    """ A property of the records of an element, with NumPy type codes.
+    List properties have the type of their length as count_type.
+    """
+    name: str
+    type: str
+    count_type: Optional[str] = None
+
+
+class Element(NamedTuple):
+    """ A header element: a name, a record count and record properties.
+    """
+    name: str
+    count: int
+    properties: List[Property]
+
+
+class PLYFile(object):
+    """ The vertex and face elements of a binary PLY file, mapped into
+    memory.
+    """
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ The (N, 3) points of the vertices, a view of the file unless
+        their coordinates are not stored side by side.
+        """
+        records = self.elements['vertex']
+        fields = records.dtype.fields
+        x_type, x_offset = fields['x'][:2]
+        size = x_type.itemsize
+        if (fields['y'][:2] == (x_type, x_offset + size)
+                and fields['z'][:2] == (x_type, x_offset + 2*size)):
+            return np.lib.stride_tricks.as_strided(
+                records['x'], (len(records), 3),
+                (records.dtype.itemsize, size), writeable=False)
+        return np.column_stack((records['x'], records['y'], records['z']))
+
+    @property
+    def faces(self) -> np.ndarray:
+        """ The (M, K) point indices of the corners of each face, a view
+        of the file.
+        """
+        records = self.elements.get('face')
+        if records is None:
+            return np.empty((0, 3), dtype=np.uint32)
+        return records[self._face_indices()]
+
+    def __init__(self, path):
+        """ Read the header of the binary PLY file at path and map its
+        elements, raising SyntaxError if they do not fill the file.
+        """
+        self.path = path
+        self.elements = {}
+
+        with open(path, 'rb') as file:
+            byte_order, elements = _read_header(file)
+            offset = file.tell()
+
+            layouts = []
+            for element in elements:
+                # The length of each list is read from the first record.
+                counts = {}
+                for index, prop in enumerate(element.properties):
+                    if prop.count_type is not None and element.count:
+                        file.seek(offset + _record_dtype(
+                            element.properties[:index], counts,
+                            byte_order).itemsize)
+                        count_type = np.dtype(byte_order + prop.count_type)
+                        counts[prop.name] = int(np.frombuffer(
+                            file.read(count_type.itemsize), count_type)[0])
+                dtype = _record_dtype(element.properties, counts,
+                                      byte_order)
+                layouts.append((element, dtype, offset))
+                offset += element.count*dtype.itemsize
+
+        if offset != os.path.getsize(path):
+            raise SyntaxError('Elements do not fill the file; faces may '
+                              'not share a corner count.')
+
+        for element, dtype, offset in layouts:
+            if element.count:
+                self.elements[element.name] = np.memmap(
+                    path, dtype=dtype, mode='r', offset=offset,
+                    shape=(element.count,))
+            else:
+                self.elements[element.name] = np.empty(0, dtype=dtype)
+
+        if 'vertex' not in self.elements:
+            raise SyntaxError('No vertex element.')
+
+    def __len__(self) -> int:
+        return len(self.elements['vertex'])
+
+    def __repr__(self) -> str:
+        return represent(self, self.path)
+
+    def triangles(self) -> np.ndarray:
+        """ Return the (M, 3) triangles of the faces, fanning faces of
+        more than three corners.
+        """
+        faces = self.faces
+        if len(faces):
+            counts = self.elements['face'][f'{self._face_indices()}_count']
+            if np.any(counts != faces.shape[1]):
+                raise SyntaxError('Faces do not share a corner count.')
+        if faces.shape[1] == 3:
+            return faces.astype(np.uint32)
+        return fans(faces.ravel(), np.full(len(faces), faces.shape[1]))
+
+    def mesh(self, position=(0, 0, 0), rotation=(0, 0, 0), **keywords
+             ) -> Mesh:
+        """ Return a mesh of the triangles keeping the mapped vertices
+        rather than a copy, passing keywords to ``Mesh``.
+        """
+        keywords.setdefault('copy', False)
+        return Mesh((self.vertices, self.triangles()), position, rotation,
+                    **keywords)
+
+    def _face_indices(self) -> str:
+        """ Return the name of the list property of face corners.
+        """
+        for name in FACE_INDICES:
+            if name in self.elements['face'].dtype.names:
+                return name
+        raise SyntaxError('Face element without vertex indices.')
+
+
+def load(file, progress: Progress = None) -> Node:
+    """ Read the binary PLY file at the path file and return a scene
+    graph node with a child holding its mesh.  progress is called
+    once the mesh is made.
+    """
+    root = Node()
+    Node(PLYFile(file).mesh(), parent=root,
+         name=os.path.splitext(os.path.basename(file))[0])
+    if progress is not None:
+        progress(1.0)
+    return root
+
+
+def _read_header(file) -> Tuple[str, List[Element]]:
+    """ Read the header from the binary file and return the byte order
+    and the elements.
+    """
+    if file.readline().rstrip() != SIGNATURE:
+        raise SyntaxError('Invalid signature.')
+
+    byte_order = None
+    elements = []
+    for line in file:
+        tokens = line.decode('ascii', 'replace').split()
+        if not tokens or tokens[0] in ('comment', 'obj_info'):
+            continue
+        if tokens[0] == 'end_header':
+            break
+        try:
+            if tokens[0] == 'format':
+                if tokens[1] not in FORMATS:
+                    raise SyntaxError(f'Unsupported format: {tokens[1]}.')
+                byte_order = FORMATS[tokens[1]]
+            elif tokens[0] == 'element':
+                elements.append(Element(tokens[1], int(tokens[2]), []))
+            elif tokens[0] == 'property' and tokens[1] == 'list':
+                elements[-1].properties.append(
+                    Property(tokens[4], TYPES[tokens[3]], TYPES[tokens[2]]))
+            elif tokens[0] == 'property':
+                elements[-1].properties.append(
+                    Property(tokens[2], TYPES[tokens[1]]))
+            else:
+                raise SyntaxError(f'Unexpected header line: {line!r}.')
+        except (IndexError, KeyError, ValueError):
+            raise SyntaxError(f'Invalid header line: {line!r}.') from None
+    else:
+        raise SyntaxError('Header without end_header.')
+
+    if byte_order is None:
+        raise SyntaxError('Header without format.')
+    for element in elements:
+        names = {prop.name for prop in element.properties}
+        if element.name == 'vertex' and not {'x', 'y', 'z'} <= names:
+            raise SyntaxError('Vertex element without x, y and z.')
+    return byte_order, elements
+
+
+def _record_dtype(properties: List[Property], counts, byte_order: str
+                  ) -> np.dtype:
+    """ Return the packed structured dtype of records of properties,
+    where list properties have the lengths in counts.
+    """
+    fields = []
+    for prop in properties:
+        if prop.count_type is None:
+            fields.append((prop.name, byte_order + prop.type))
+        else:
+            fields.append((f'{prop.name}_count',
+                           byte_order + prop.count_type))
+            fields.append((prop.name, byte_order + prop.type,
+                           (counts.get(prop.name, 0),)))
+    return np.dtype(fields)
@@ -0,0 +1,130 @@
+"""
+Reads binary STL (``.stl``) files.
+
+A binary STL file is an 80 byte header, a triangle count and then
+fixed 50 byte triangle records, so ``STLFile`` memory-maps the records
+as a NumPy structured array.  Opening a file only reads its size, and
+the normals and corners are views whose pages are read from disk when
+they are first touched.
+"""
+
+from typing import Tuple
+
+import os
+
+import numpy as np
+
+from common import represent
+from formats.bulk import Progress
+from geometry import Mesh
+from scene import Node
+
+
+HEADER_BYTES = 80
+
+TRIANGLE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('corners', '<f4', (3, 3)),
+    ('attributes', '<u2'),
+])
+
+
+class STLFile(object):
+    """ The triangles of a binary STL file, mapped into memory.
+    """
+
+    @property
+    def normals(self) -> np.ndarray:
+        """ The (M, 3) normals stored with the triangles.
+        """
+        return self.records['normal']
+
+    @property
+    def corners(self) -> np.ndarray:
+        """ The (M, 3, 3) points of the corners of each triangle.
+        """
+        return self.records['corners']
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ The (N, 3) distinct corner points, found on first use.
+        """
+        if self._welded is None:
+            self._welded = self.weld()
+        return self._welded[0]
+
+    @property
+    def faces(self) -> np.ndarray:
+        """ The (M, 3) triangles indexing ``vertices``.
+        """
+        if self._welded is None:
+            self._welded = self.weld()
+        return self._welded[1]
+
+    def __init__(self, path):
+        """ Map the binary STL file at path, raising SyntaxError if its
+        size does not match its triangle count.
+        """
+        self.path = path
+        self._welded = None
+
+        size = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            self.header = file.read(HEADER_BYTES)
+            count = np.frombuffer(file.read(4), dtype='<u4')
+        if len(count) != 1 or size != (HEADER_BYTES + 4
+                                       + int(count[0])*TRIANGLE.itemsize):
+            if self.header.startswith(b'solid'):
+                raise SyntaxError('ASCII STL files are not supported.')
+            raise SyntaxError('File size does not match triangle count.')
+
+        if count[0]:
+            self.records = np.memmap(path, dtype=TRIANGLE, mode='r',
+                                     offset=HEADER_BYTES + 4,
+                                     shape=(int(count[0]),))
+        else:
+            self.records = np.empty(0, dtype=TRIANGLE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __repr__(self) -> str:
+        return represent(self, self.path)
+
+    def weld(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Return the distinct corner points, and the triangles indexing
+        them.  Corners are merged when their coordinates are equal.
+        """
+        # Adding zero turns -0.0 into 0.0, so their bytes match.
+        corners = self.corners.reshape(-1, 3) + np.float32(0)
+        keys = corners.view(np.dtype((np.void, corners.itemsize*3)))
+        _, first, inverse = np.unique(keys.ravel(), return_index=True,
+                                      return_inverse=True)
+        # Points are numbered in order of first use.
+        order = np.argsort(first)
+        numbers = np.empty_like(order)
+        numbers[order] = np.arange(len(order))
+        return (corners[first[order]],
+                numbers[inverse.ravel()].astype(np.uint32).reshape(-1, 3))
+
+    def mesh(self, position=(0, 0, 0), rotation=(0, 0, 0), **keywords
+             ) -> Mesh:
+        """ Return a mesh of the welded triangles, keeping the welded
+        points rather than a copy, passing keywords to ``Mesh``.
+        """
+        keywords.setdefault('copy', False)
+        return Mesh((self.vertices, self.faces), position, rotation,
+                    **keywords)
+
+
+def load(file, progress: Progress = None) -> Node:
+    """ Read the binary STL file at the path file and return a scene
+    graph node with a child holding its mesh.  progress is called
+    once the mesh is made.
+    """
+    root = Node()
+    Node(STLFile(file).mesh(), parent=root,
+         name=os.path.splitext(os.path.basename(file))[0])
+    if progress is not None:
+        progress(1.0)
+    return root
@@ -12,17 +12,50 @@ Triangles = Sequence[Tuple[int, int, int]]
 
 import operator
 import functools
+import weakref
 from array import array as Array
+from collections import OrderedDict
 from itertools import chain, combinations, islice
 from math import cos, degrees, radians, hypot, sin, tan
 from numbers import Real
 from random import random
-from statistics import mean
 
 import attr
+import numpy as np
 
+import assets
+import optimize
 import shapes
+import subdivision
+import transforms
 from common import represent, sequence_str
+from halfedge import HalfEdges
+from scene import Scene
+
+
+def read_mesh_file(path) -> Tuple[Points, Triangles]:
+    """ Return the points and triangles of a mesh file.
+    """
+    with open(path) as file:
+        source = file.read().strip()
+
+    try:
+        point_section, triangle_section = source.split('\n\n')
+    except ValueError:
+        raise SyntaxError('There should be a single blank line.')
+
+    points = [tuple(map(float, point_string.strip().split()))
+              for point_string in point_section.split('\n')]
+    triangles = [tuple(map(int, triangle_string.strip().split()))
+                 for triangle_string in triangle_section.split('\n')]
+    return points, triangles
+
+
+def _read_mesh_arrays(path) -> assets.Arrays:
+    """ Return the points and triangles of a mesh file as arrays.
+    """
+    geometry = shapes.Geometry(*read_mesh_file(path))
+    return {'points': geometry.points, 'triangles': geometry.triangles}
 
 
 def lines(triangles: Triangles) -> Set[FrozenSet[int]]:
@@ -140,36 +173,128 @@ class TriangleArray(Arrays):
         return NotImplemented
 
 
+# Total size of the arrays kept by the default shape cache.
+SHAPE_CACHE_BYTES = 16*2**20
+
+
 class _Shape(object):
+    """ The functions of ``shapes.SHAPE_FUNCTIONS``, returning shared
+    geometry from a cache, as in ``Mesh.shape.cube(1)``.
+    """
 
     def shape_func(self, wrapped):
-        functools.wraps(wrapped)
-        def wrapper(position, rotation, *, color=None):
-            shape_info = wrapped()
-            return self.__class__()
-        return wrapped
+        @functools.wraps(wrapped)
+        def wrapper(*args, **keywords):
+            return self.cache.get(wrapped.__name__, *args, **keywords)
+        return wrapper
 
-    def __init__(self, owner):
+    def __init__(self, owner, cache: 'ShapeCache'):
         self.owner = owner
+        self.cache = cache
 
         for name, function in shapes.SHAPE_FUNCTIONS.items():
             setattr(self, name, self.shape_func(function))
 
 
+def _rotate_about(body, x: float, y: float, z: float,
+                  point: Optional[TripleFloat]) -> None:
+    """ Rotate the position and orientation of body in place around
+    point by the angles x, y, and z.
+    """
+    rotation = transforms.quaternion_from_euler(x, y, z)
+    body._orientation[:] = transforms.normalize(
+        transforms.multiply(rotation, body._orientation))
+
+    if point is not None:
+        offset = body._position - point
+        body._position[:] = point + transforms.to_matrix(rotation) @ offset
+
+
 class Mesh(object):
     """ A group of points connected as triangles.
+
+    The points (an (N, 3) float array) are stored relative to the mesh
+    origin, and placed in the world by ``position`` and
+    ``orientation`` (a unit quaternion).  The triangles are an (M, 3)
+    uint32 array of point indices.
+
+    A textured mesh has uvs, the (N, 2) texture coordinates of its
+    points, and a texture, such as a ``pixels.Texture``, whose
+    ``planes`` are its (3, width, height) red, green and blue values.
+
+    A static mesh is expected to stay put once added to a scene, which
+    culls it by the bounds it had when added until ``Scene.relocate``
+    is called.  Meshes are dynamic unless made with static true.
+
+    Points are copied unless the mesh is made with copy false, which
+    keeps float points as they are, such as a view of a mapped file.
     """
 
-    __slots__ = ('color', 'points', 'triangles')
+    __slots__ = ('color', 'points', 'triangles', 'uvs', 'texture', 'static',
+                 '_position', '_orientation', '_half_edges')
 
-    def __init__(self, shape_info, position: TripleFloat,
-                 rotation=(0, 0, 0), *, color: Optional[TripleFloat] = None):
-        point_info, triangle_info = shape_info
+    @property
+    def position(self) -> np.ndarray:
+        """ The world position of the mesh origin.
+        """
+        return self._position
 
-        self.points = Arrays(3, Arrays.float64, point_info)
-        self.move_by(*position)
+    @position.setter
+    def position(self, position: TripleFloat) -> None:
+        self._position[:] = position
 
-        self.triangles = TriangleArray(triangle_info)
+    @property
+    def orientation(self) -> np.ndarray:
+        """ The rotation of the mesh as a ``(w, x, y, z)`` quaternion.
+        """
+        return self._orientation
+
+    @orientation.setter
+    def orientation(self, orientation) -> None:
+        self._orientation[:] = transforms.normalize(orientation)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ The points as an (N, 3) float array in mesh space.
+        """
+        return self.points
+
+    @property
+    def indices(self) -> np.ndarray:
+        """ The triangles as an (M, 3) uint32 array of point indices.
+        """
+        return self.triangles
+
+    @property
+    def half_edges(self) -> HalfEdges:
+        """ The half-edge adjacency of the triangles, built on first use
+        and again whenever ``triangles`` is replaced.
+        """
+        if (self._half_edges is None
+                or self._half_edges.triangles is not self.triangles):
+            self._half_edges = HalfEdges(self.triangles, len(self.points))
+        return self._half_edges
+
+    def __init__(self, shape_info, position: TripleFloat,
+                 rotation=(0, 0, 0), *, color: Optional[TripleFloat] = None,
+                 uvs=None, texture=None, static: bool = False,
+                 copy: bool = True):
+        geometry = shapes.Geometry(*shape_info)
+
+        # Copied, so meshes never share points with their shape info,
+        # unless the points are a view of a mapped file to be kept.
+        if copy:
+            self.points = np.array(geometry.points, dtype=float)
+        else:
+            self.points = geometry.points
+        self.triangles = geometry.triangles.astype(np.uint32, copy=copy)
+        self.uvs = _uvs(uvs, len(self.points))
+        self.texture = texture
+        self.static = static
+        self._half_edges = None
+
+        self._position = np.array(position, dtype=float)
+        self._orientation = transforms.quaternion_from_euler(*rotation)
 
         self.color = RGBA.random() if color is None else RGBA(*color)
 
@@ -179,121 +304,517 @@ class Mesh(object):
         return cls((points, triangles), (0.0, 0.0, 0.0), **keywords)
 
     @classmethod
-    def from_path(cls, path):
+    def from_path(cls, path, *, optimized: bool = False):
         mesh = cls.from_raw()
-        mesh.load(path)
+        mesh.load(path, optimized=optimized)
         return mesh
 
     def __repr__(self) -> str:
-        shape_info = (list(self.points), list(self.triangles))
-        return represent(self, shape_info, color=tuple(self.color))
+        shape_info = (self.points.tolist(), self.triangles.tolist())
+        return represent(self, shape_info, tuple(self.position.tolist()),
+                         color=tuple(self.color))
 
     @property
     def center(self) -> TripleFloat:
-        """ Return the mean of the points as a 3-tuple of floats.
+        """ Return the mean of the points in world space as a 3-tuple of
+        floats.
         """
-        return tuple(map(mean, self.arrays))
+        return tuple(self.world_vertices().mean(axis=0))
+
+    def model_matrix(self) -> np.ndarray:
+        """ Return the 4x4 matrix from mesh space to world space.
+        """
+        return transforms.model_matrix(self._position, self._orientation)
+
+    def world_vertices(self) -> np.ndarray:
+        """ Return the points as an (N, 3) array in world space.
+        """
+        return transforms.apply(self.model_matrix(), self.vertices)
 
     def move_by(self, x: float, y: float, z: float) -> None:
         """ Move self by x, y, and z.
         """
-        for index, (point_x, point_y, point_z) in enumerate(self.points):
-            self.points[index] = (point_x + x, point_y + y, point_z + z)
+        self._position += (x, y, z)
 
-    def load(self, path):
-        """ Load from a mesh file.
+    def rotate(self, x: float, y: float, z: float,
+               point: Optional[TripleFloat] = None) -> None:
+        """ Rotate self around point by the angles x, y, and z.  If
+        point is None, rotate in place around the mesh origin.
         """
-        with open(path) as file:
-            source = file.read().strip()
-
-        try:
-            point_section, triangle_section = source.split('\n\n')
-        except ValueError:
-            raise SyntaxError('There should be a single blank line.')
+        _rotate_about(self, x, y, z, point)
 
-        self.points.extend(map(float, point_string.strip().split())
-            for point_string in point_section.split('\n'))
-        self.triangles.extend(map(int, triangle_string.strip().split())
-            for triangle_string in triangle_section.split('\n'))
+    def subdivide(self, levels: int = 1) -> None:
+        """ Replace the points and triangles with levels of Loop
+        subdivision, so each level has four times the triangles.  Call
+        ``Scene.refresh`` for any scene holding self.  Texture
+        coordinates are dropped.
+        """
+        self.points, self.triangles = subdivision.loop(
+            self.points, self.triangles, levels, self.half_edges)
+        self.uvs = None
+
+    def load(self, path, *, optimized: bool = False):
+        """ Load from a mesh file, keeping the parsed file in
+        ``assets.default_cache``.  If optimized, duplicate points are
+        welded and the points and triangles reordered for locality,
+        and the optimized arrays are cached instead.  Texture
+        coordinates are dropped.
+        """
+        if optimized:
+            points, triangles = optimize.cached(path, read_mesh_file)
+        else:
+            arrays = assets.cached(path, 'mesh', _read_mesh_arrays)
+            points, triangles = arrays['points'], arrays['triangles']
+        geometry = shapes.Geometry(points, triangles)
+
+        if len(self.points):
+            self.points = np.concatenate((self.points, geometry.points))
+            self.triangles = np.concatenate(
+                (self.triangles, geometry.triangles.astype(np.uint32)))
+        else:
+            # An empty mesh keeps the arrays mapped from the cache.
+            self.points = geometry.points
+            self.triangles = geometry.triangles.astype(np.uint32,
+                                                       copy=False)
+        self.uvs = None
 
     def save(self, path):
-        """ Save to a mesh file.
+        """ Save to a mesh file, with the points in world space.
         """
         with open(path, 'w') as file:
 
-            for x, y, z in self.points:
+            for x, y, z in self.world_vertices():
                 file.write(f'{x} {y} {z}\n')
 
             file.write('\n')
 
-            for i1, i2, i3 in self.triangles:
+            for i1, i2, i3 in self.indices.tolist():
                 file.write(f'{i1} {i2} {i3}\n')
 
 
-Mesh.shape = _Shape(Mesh)
+def _uvs(uvs, count: int) -> Optional[np.ndarray]:
+    """ Return uvs as an (N, 2) float array for count points, or None
+    if uvs is None.
+    """
+    if uvs is None:
+        return None
+    uvs = np.array(uvs, dtype=float).reshape(-1, 2)
+    if len(uvs) != count:
+        raise ValueError(f'Expected texture coordinates for {count} '
+                         f'points: {len(uvs)}')
+    return uvs
+
+
+class SharedGeometry(object):
+    """ Immutable points and triangles that any number of ``Instance``
+    meshes draw with their own transforms and colors.
+
+    A scene stores the geometry once however many instances it holds.
+    """
+
+    __slots__ = ('vertices', 'indices', 'uvs', '_half_edges', '__weakref__')
+
+    @property
+    def half_edges(self) -> HalfEdges:
+        """ The half-edge adjacency of the triangles, built on first
+        use.
+        """
+        if self._half_edges is None:
+            self._half_edges = HalfEdges(self.indices, len(self.vertices))
+        return self._half_edges
+
+    def __init__(self, shape_info, uvs=None):
+        point_info, triangle_info = shape_info
+
+        self.vertices = np.array(point_info, dtype=np.float32).reshape(-1, 3)
+        self.indices = np.array(triangle_info, dtype=np.uint32).reshape(-1, 3)
+        self.uvs = _uvs(uvs, len(self.vertices))
+        self.vertices.setflags(write=False)
+        self.indices.setflags(write=False)
+        if self.uvs is not None:
+            self.uvs.setflags(write=False)
+        self._half_edges = None
+
+    @classmethod
+    def from_mesh(cls, mesh: Mesh):
+        return cls((mesh.vertices, mesh.indices), mesh.uvs)
+
+    def __repr__(self) -> str:
+        shape_info = (self.vertices.tolist(), self.indices.tolist())
+        return represent(self, shape_info)
+
+    def __len__(self) -> int:
+        return len(self.vertices)
+
+
+class Instance(Mesh):
+    """ A mesh that draws a ``SharedGeometry`` rather than owning its
+    points and triangles.
+    """
+
+    __slots__ = ('geometry',)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ The read-only (N, 3) float32 points of the shared geometry.
+        """
+        return self.geometry.vertices
+
+    @property
+    def indices(self) -> np.ndarray:
+        """ The read-only (M, 3) uint32 triangles of the shared
+        geometry.
+        """
+        return self.geometry.indices
+
+    @property
+    def uvs(self) -> Optional[np.ndarray]:
+        """ The read-only (N, 2) texture coordinates of the shared
+        geometry, or None.
+        """
+        return self.geometry.uvs
+
+    @property
+    def half_edges(self) -> HalfEdges:
+        """ The half-edge adjacency of the shared geometry.
+        """
+        return self.geometry.half_edges
+
+    def __init__(self, geometry: SharedGeometry, position: TripleFloat,
+                 rotation=(0, 0, 0), *, color: Optional[TripleFloat] = None,
+                 texture=None, static: bool = False):
+        self.geometry = geometry
+        self.texture = texture
+        self.static = static
+
+        self._position = np.array(position, dtype=float)
+        self._orientation = transforms.quaternion_from_euler(*rotation)
+
+        self.color = RGBA.random() if color is None else RGBA(*color)
+
+    def __repr__(self) -> str:
+        return represent(self, self.geometry, tuple(self.position.tolist()),
+                         color=tuple(self.color))
+
+    def subdivide(self, levels: int = 1) -> None:
+        raise TypeError('Instances cannot change their shared geometry.')
+
+    def load(self, path, *, optimized: bool = False):
+        """ Raise TypeError, as instances cannot be reloaded without
+        changing the geometry they share.  The signature matches
+        ``Mesh.load``.
+        """
+        raise TypeError('Instances cannot change their shared geometry.')
+
+
+class ShapeCache(object):
+    """ Least recently used cache of the ``SharedGeometry`` made by the
+    functions in ``shapes.SHAPE_FUNCTIONS``, keyed by function name and
+    arguments.
+
+    The least recently used geometry is evicted while the arrays held
+    take more than max_bytes.  Geometry larger than max_bytes, or made
+    from unhashable arguments or images that can still change (whose
+    ``planes`` are writeable, as a ``pixels.PixelGrid``), is never
+    kept.
+    """
+
+    def __init__(self, max_bytes: int = SHAPE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._geometries = OrderedDict()
+
+    def __repr__(self) -> str:
+        return represent(self, self.max_bytes, hits=self.hits,
+                         misses=self.misses)
+
+    def __len__(self) -> int:
+        return len(self._geometries)
+
+    def get(self, name: str, *args, **keywords) -> SharedGeometry:
+        """ Return the geometry made by the shape function called name
+        with args and keywords, making it on a miss.
+        """
+        key = (name, args, tuple(sorted(keywords.items())))
+        try:
+            if any(map(_changeable, args + tuple(keywords.values()))):
+                # Editing the image would leave stale geometry here.
+                raise TypeError
+            geometry = self._geometries[key]
+        except KeyError:
+            self.misses += 1
+        except TypeError:
+            # Arguments such as images cannot be keys, so are not kept.
+            self.misses += 1
+            key = None
+        else:
+            self.hits += 1
+            self._geometries.move_to_end(key)
+            return geometry
+
+        geometry = SharedGeometry(
+            shapes.SHAPE_FUNCTIONS[name](*args, **keywords))
+        size = _nbytes(geometry)
+        if key is not None and size <= self.max_bytes:
+            self._geometries[key] = geometry
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._geometries.popitem(last=False)
+                self.bytes -= _nbytes(evicted)
+        return geometry
+
+    def clear(self) -> None:
+        """ Remove every geometry, keeping the hit and miss counts.
+        """
+        self._geometries.clear()
+        self.bytes = 0
+
+
+def _changeable(argument) -> bool:
+    """ Return whether argument is an image whose planes are writeable.
+    """
+    planes = getattr(argument, 'planes', None)
+    return isinstance(planes, np.ndarray) and planes.flags.writeable
+
+
+def _nbytes(geometry: SharedGeometry) -> int:
+    return geometry.vertices.nbytes + geometry.indices.nbytes
+
+
+Mesh.shape = _Shape(Mesh, ShapeCache())
+
+
+class PhysicsBodies(object):
+    """ Packed linear and angular state of every physics body, so all
+    bodies can be simulated in a single vectorized step.
+
+    Each body is given a row of the state arrays and keeps views of
+    that row, so reads and in-place writes need no copying.  Rows of
+    garbage collected bodies are cleared and reused.
+    """
+
+    _STATE = ('positions', 'orientations', 'velocities', 'accelerations',
+              'angular_velocities')
+    # The attributes of a body holding its row of each state array.
+    _ATTRIBUTES = ('_position', '_orientation', '_velocity', '_acceleration',
+                   '_angular_velocity')
+
+    def __init__(self, capacity: int = 16):
+        self.positions = np.zeros((capacity, 3))
+        self.orientations = np.tile(transforms.IDENTITY_QUATERNION,
+                                    (capacity, 1))
+        self.velocities = np.zeros((capacity, 3))
+        self.accelerations = np.zeros((capacity, 3))
+        self.angular_velocities = np.zeros((capacity, 3))
+
+        self._bodies = []
+        self._free = []
+
+    def __repr__(self) -> str:
+        return represent(self, len(self.positions))
+
+    def __len__(self) -> int:
+        return len(self._bodies) - len(self._free)
+
+    def __iter__(self) -> iter:
+        return (body for body in self._iter_slots() if body is not None)
+
+    def add(self, body: 'Physics') -> int:
+        """ Give body a row of the state arrays and return its index.
+        The body's current state, if it has any, is copied into the row,
+        and anything it lacks starts at rest.
+        """
+        if self._free:
+            index = self._free.pop()
+        else:
+            index = len(self._bodies)
+            self._bodies.append(None)
+            if index == len(self.positions):
+                self._grow()
+
+        # A row handed out must never carry another body's motion.
+        self._clear(index)
+        for name, attribute in zip(self._STATE, self._ATTRIBUTES):
+            value = getattr(body, attribute, None)
+            if value is not None:
+                getattr(self, name)[index] = value
+
+        self._bodies[index] = weakref.ref(body)
+        body._finalizer = weakref.finalize(body, self.remove, index)
+        self._bind(body, index)
+        return index
+
+    def release(self, body: 'Physics') -> None:
+        """ Stop simulating body, moving its state out of the arrays
+        into arrays of its own and freeing its row.
+        """
+        index = body._body
+        body._finalizer.detach()
+        for name, attribute in zip(self._STATE, self._ATTRIBUTES):
+            setattr(body, attribute, getattr(self, name)[index].copy())
+        body._body = None
+        self.remove(index)
+
+    def remove(self, index: int) -> None:
+        """ Clear the row at index and make it available for reuse.
+        """
+        self._bodies[index] = None
+        self._clear(index)
+        self._free.append(index)
+
+    def simulate(self, time: float, indices=slice(None)) -> None:
+        """ Advance the bodies at indices (by default every body) by
+        time seconds.
+        """
+        count = len(self._bodies)
+        velocities = self.velocities[:count][indices]
+        accelerations = self.accelerations[:count][indices]
+
+        # s = u*t + 0.5*a*t*t
+        self.positions[:count][indices] += (
+            velocities*time + 0.5*accelerations*time*time)
+        # v = u + a*t
+        self.velocities[:count][indices] += accelerations*time
+
+        self.orientations[:count][indices] = transforms.integrate(
+            self.orientations[:count][indices],
+            self.angular_velocities[:count][indices], time)
+
+    def _bind(self, body: 'Physics', index: int) -> None:
+        body._body = index
+        for name, attribute in zip(self._STATE, self._ATTRIBUTES):
+            setattr(body, attribute, getattr(self, name)[index])
+
+    def _clear(self, index: int) -> None:
+        """ Reset the row at index to a body at rest at the origin.
+        """
+        self.positions[index] = 0.0
+        self.orientations[index] = transforms.IDENTITY_QUATERNION
+        self.velocities[index] = 0.0
+        self.accelerations[index] = 0.0
+        self.angular_velocities[index] = 0.0
+
+    def _grow(self) -> None:
+        """ Double the capacity of the state arrays with clear rows and
+        rebind the views held by every body.
+        """
+        capacity = len(self.positions)
+        for name in self._STATE:
+            array = getattr(self, name)
+            grown = np.zeros((2*capacity,) + array.shape[1:])
+            grown[:capacity] = array
+            setattr(self, name, grown)
+        self.orientations[capacity:] = transforms.IDENTITY_QUATERNION
+
+        for index, body in enumerate(self._iter_slots()):
+            if body is not None:
+                self._bind(body, index)
+
+    def _iter_slots(self) -> iter:
+        """ Yield the body in each row, or None for free rows.
+        """
+        return (reference and reference() for reference in self._bodies)
 
 
 class Physics(object):
-    """ 
+    """ Mix-in for objects with simulated linear and angular motion.
+
+    State is stored in the shared ``Physics.bodies`` arrays and
+    advanced for all bodies at once by ``Physics.bodies.simulate``.
+    A scene releases the bodies of the meshes it drops from the arrays,
+    with ``release_body``, and registers them again when they are added
+    back, with ``register_body``.
     """
 
-    def __init__(self, velocity=None, acceleration=None, mass=None):
-        """ 
+    bodies = PhysicsBodies()
+
+    @property
+    def velocity(self) -> np.ndarray:
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, velocity: TripleFloat) -> None:
+        self._velocity[:] = velocity
+
+    @property
+    def acceleration(self) -> np.ndarray:
+        return self._acceleration
+
+    @acceleration.setter
+    def acceleration(self, acceleration: TripleFloat) -> None:
+        self._acceleration[:] = acceleration
+
+    @property
+    def angular_velocity(self) -> np.ndarray:
+        """ Rotation in radians per second about the x, y and z axes.
         """
-        accel = acceleration
+        return self._angular_velocity
 
-        super().__init__(shape_info, position, color=color)
+    @angular_velocity.setter
+    def angular_velocity(self, angular_velocity: TripleFloat) -> None:
+        self._angular_velocity[:] = angular_velocity
 
-        self.velocity = FixedVector(0, 0, 0) if velocity is None else velocity
-        self.acceleration = FixedVector(0, 0, 0) if accel is None else accel
+    def __init__(self, velocity=None, acceleration=None,
+                 angular_velocity=None, mass=None):
+        """ Register self with ``Physics.bodies``, keeping any existing
+        position and orientation.
+        """
+        self._body = None
+        self.register_body()
+
+        if velocity is not None:
+            self.velocity = velocity
+        if acceleration is not None:
+            self.acceleration = acceleration
+        if angular_velocity is not None:
+            self.angular_velocity = angular_velocity
 
         self.mass = mass
 
     def move_by(self, x: float, y: float, z: float):
         """ Move self by x, y, and z.
         """
-        raise NotImplementedError
+        self._position += (x, y, z)
 
     def rotate(self, x: float, y: float, z: float, point: TripleFloat=None):
         """ Rotate self around point by the angles x, y, and z.
         """
-        raise NotImplementedError
+        _rotate_about(self, x, y, z, point)
 
     def simulate(self, time: float):
-        """ 
+        """ Advance self alone by time seconds.  Prefer
+        ``Physics.bodies.simulate`` to advance every body at once.
         """
-        acceleration_x, acceleration_y, acceleration_z = self.acceleration
-        velocity_x, velocity_y, velocity_z = self.velocity
-
-        # s = u*t + 0.5*a*t*t
-        delta_x = velocity_x*time + 0.5*acceleration_x*time*time
-        delta_y = velocity_y*time + 0.5*acceleration_y*time*time
-        delta_z = velocity_z*time + 0.5*acceleration_z*time*time
-
-        self.move_by(delta_x, delta_y, delta_z)
+        if self._body is not None:
+            self.bodies.simulate(time, [self._body])
 
-        # v = u + a*t
-        velocity_x += acceleration_x*time
-        velocity_y += acceleration_y*time
-        velocity_z += acceleration_z*time
+    def register_body(self) -> None:
+        """ Simulate self with ``Physics.bodies``, if not already.
+        """
+        if self._body is None:
+            self.bodies.add(self)
 
-        self.velocity = velocity_x, velocity_y, velocity_z
+    def release_body(self) -> None:
+        """ Stop simulating self, keeping its current state.
+        """
+        if self._body is not None:
+            self.bodies.release(self)
 
 
 class PhysicsMesh(Mesh, Physics):
     """ A 3D shape with physics simulation functionality.
     """
 
-    def __init__(self, shape_info, position, *, color=None,
-                 velocity=None, acceleration=None, mass=None):
+    def __init__(self, shape_info, position, rotation=(0, 0, 0), *,
+                 color=None, velocity=None, acceleration=None,
+                 angular_velocity=None, mass=None):
         """ 
         """
-        super().__init__(shape_info, position, color=color)
-
-        self.velocity = (0, 0, 0) or velocity
-        self.acceleration = (0, 0, 0) or acceleration
-
-        self.mass = mass #or self.volume
+        Mesh.__init__(self, shape_info, position, rotation, color=color)
+        Physics.__init__(self, velocity, acceleration, angular_velocity,
+                         mass)
 
 
 @attr.s(slots=True)
@@ -368,7 +889,7 @@ class StaticCameraLogic(object):
         self.width = width
         self.height = height
 
-        self.meshes = set(meshes)
+        self.meshes = Scene(meshes)
 
         self.fov = radians(fov)
         self.pro_depth = 0.01
@@ -390,12 +911,48 @@ class StaticCameraLogic(object):
         else:
             return 0, 0
 
+    def screen_radius(self, radius: float, distance: float) -> float:
+        """ Return the approximate radius in pixels of a sphere of radius
+        at distance from the camera.
+        """
+        if distance <= radius:
+            return float('inf')
+        return (self.width*self.pro_depth*radius) / (distance*self.pro_width)
+
+    def project_points(self, points: np.ndarray) -> np.ndarray:
+        """ Return the (N, 2) screen coordinates of (N, 3) camera space
+        points.  Points with a z of zero or less are placed at (0, 0),
+        as with ``project_point``.
+        """
+        x, y, z = points.T
+        visible = z > 0
+        num = (self.width*self.pro_depth) / (
+            np.where(visible, z, 1.0)*self.pro_width)
+
+        screen = np.empty((len(points), 2))
+        screen[:, 0] = self.x + (self.width / 2) + x*num
+        screen[:, 1] = self.y + (self.height / 2) + y*num
+        screen[~visible] = 0.0
+        return screen
+
 
 class CameraLogic(StaticCameraLogic, Physics):
     """ TODO. """
 
+    @property
+    def position(self) -> Point:
+        """ The position of the camera, read from its row of
+        ``Physics.bodies`` so that its velocity moves it.
+        """
+        return Point(*self._position.tolist())
+
+    @position.setter
+    def position(self, position) -> None:
+        self._position[:] = tuple(position)
+
     def __init__(self, position, rotation, *args, **keywords):
         super().__init__(*args, **keywords)
+        Physics.__init__(self)
 
         self.position = self._original_position = Point(*position)
         self._original_rotation = rotation
@@ -444,18 +1001,179 @@ class CameraLogic(StaticCameraLogic, Physics):
 
         return self.project_point(x2, y2, z2)
 
+    def view_matrix(self) -> np.ndarray:
+        """ Return the 4x4 matrix from world space to camera space,
+        matching the translation and rotations of ``resolve_point``.
+        """
+        sin_x, sin_y, sin_z = np.sin((self.angle_x, self.angle_y,
+                                      self.angle_z))
+        cos_x, cos_y, cos_z = np.cos((self.angle_x, self.angle_y,
+                                      self.angle_z))
+
+        rotation_y = np.array([[cos_y, 0, sin_y], [0, 1, 0],
+                               [-sin_y, 0, cos_y]])
+        rotation_x = np.array([[1, 0, 0], [0, cos_x, -sin_x],
+                               [0, sin_x, cos_x]])
+        rotation_z = np.array([[cos_z, -sin_z, 0], [sin_z, cos_z, 0],
+                               [0, 0, 1]])
+        rotation = rotation_z @ rotation_x @ rotation_y
+
+        matrix = np.identity(4)
+        matrix[:3, :3] = rotation
+        matrix[:3, 3] = -rotation @ tuple(self.position)
+        return matrix
+
+    def frustum_planes(self, near: float = 0.0) -> np.ndarray:
+        """ Return the (5, 4) world space planes bounding the view, as
+        ``(a, b, c, d)`` rows with ``a*x + b*y + c*z + d >= 0`` for
+        points in view.  The view has no far plane.
+        """
+        horizontal = self.pro_width / (2*self.pro_depth)
+        vertical = horizontal*self.height / self.width
+        camera_planes = np.array([
+            (1.0, 0.0, horizontal, 0.0),
+            (-1.0, 0.0, horizontal, 0.0),
+            (0.0, 1.0, vertical, 0.0),
+            (0.0, -1.0, vertical, 0.0),
+            (0.0, 0.0, 1.0, -near),
+        ])
+
+        # A plane transforms by the transpose of the inverse matrix.
+        return camera_planes @ self.view_matrix()
+
+    def screen_ray(self, x: float, y: float) -> Tuple[np.ndarray, np.ndarray]:
+        """ Return the world space origin and unit direction of the ray
+        through the screen coordinates x and y, the inverse of
+        ``resolve_point``.
+        """
+        scale = (self.width*self.pro_depth) / self.pro_width
+        direction = np.array([(x - self.x - self.width / 2) / scale,
+                              (y - self.y - self.height / 2) / scale, 1.0])
+
+        rotation = self.view_matrix()[:3, :3]
+        direction = rotation.T @ direction
+        return (np.array(tuple(self.position), dtype=float),
+                direction / np.linalg.norm(direction))
+
+    def pick(self, x: float, y: float):
+        """ Return the ``scene.Pick`` of the nearest mesh triangle at the
+        screen coordinates x and y, or None.
+        """
+        return self.meshes.pick(*self.screen_ray(x, y))
+
     def draw_triangle(self, x1, y1, x2, y2, x3, y3):
         raise NotImplementedError('Implement a draw_triangle method.')
 
-    def draw_mesh(self, mesh):
-        point_buffer = tuple(
-            self.resolve_point(x, y, z) for x, y, z in mesh.points)
-
-        for index_1, index_2, index_3 in mesh.triangles:
-            x1, y1 = point_buffer[index_1]
-            x2, y2 = point_buffer[index_2]
-            x3, y3 = point_buffer[index_3]
+    def draw_triangles(self, screen_points: np.ndarray,
+                       triangles: np.ndarray,
+                       shades: Optional[np.ndarray] = None, *,
+                       depths: Optional[np.ndarray] = None) -> None:
+        """ Draw the (M, 3) triangles indexing the (N, 2) screen points,
+        each with a shade from 0 to 1 scaling its color.  Where given,
+        the points are depths in front of the camera, for depth testing
+        against the other triangles drawn.  Override to submit all
+        triangles in a single batch; this ignores shades and depths.
+        """
+        for (x1, y1), (x2, y2), (x3, y3) in screen_points[triangles]:
             self.draw_triangle(x1, y1, x2, y2, x3, y3)
 
+    def draw_textured_triangles(self, screen_points: np.ndarray,
+                                depths: np.ndarray, triangles: np.ndarray,
+                                uvs: np.ndarray, texture,
+                                shades: Optional[np.ndarray] = None) -> None:
+        """ Draw the (M, 3) triangles indexing the (N, 2) screen points
+        with texture, where the points are depths in front of the camera
+        and have the (N, 2) texture coordinates uvs.  Override to map
+        the texture; this draws the triangles untextured.
+        """
+        self.draw_triangles(screen_points, triangles, shades, depths=depths)
+
+    def draw_mesh(self, mesh, model_view: Optional[np.ndarray] = None,
+                  points: Optional[np.ndarray] = None):
+        """ Draw mesh from its range of the scene buffers, at the detail
+        level suiting its size on screen.  Points are moved by a single
+        model-view transform, unless they are given already in camera
+        space, and triangles with a point behind the camera are skipped.
+        Textured meshes are always drawn in full, as simplified levels
+        have no texture coordinates.
+        """
+        if model_view is None:
+            model_view = self.view_matrix() @ mesh.model_matrix()
+
+        textured = mesh.texture is not None and mesh.uvs is not None
+        levels = self.meshes.detail_levels.get(mesh)
+        if levels is None or points is not None or textured:
+            level = 0
+        else:
+            distance = np.linalg.norm(model_view[:3, 3])
+            level = levels.select(self, self.screen_radius(levels.radius,
+                                                           distance))
+
+        vertices, triangles = self.meshes.buffers(mesh, level)
+        if points is None:
+            points = transforms.apply(model_view, vertices)
+
+        in_front = (points[:, 2] > 0)[triangles].all(axis=1)
+        shades = self.face_shades(mesh, model_view, level)
+        if textured:
+            self.draw_textured_triangles(
+                self.project_points(points), points[:, 2],
+                triangles[in_front], mesh.uvs, mesh.texture,
+                shades[in_front])
+        else:
+            self.draw_triangles(self.project_points(points),
+                                triangles[in_front], shades[in_front],
+                                depths=points[:, 2])
+
+    def face_shades(self, mesh, model_view: np.ndarray,
+                    level: int = 0) -> np.ndarray:
+        """ Return the shade from the scene's ambient level to 1 of each
+        triangle of mesh at a detail level, lit by the scene's light.
+        Both sides of a triangle are lit, seen from the camera.
+        """
+        normals = self.meshes.face_normals(mesh, level)
+        vertices, triangles = self.meshes.buffers(mesh, level)
+
+        # Light and camera are moved to mesh space, rather than every
+        # normal to camera space.
+        light = self.view_matrix()[:3, :3] @ self.meshes.light_direction
+        rotation = model_view[:3, :3]
+        light = rotation.T @ light
+        eye = -rotation.T @ model_view[:3, 3]
+
+        facing = np.einsum('ij,ij->i', normals,
+                           eye - vertices[triangles[:, 0]])
+        lighting = -(normals @ light)*np.where(facing < 0, -1.0, 1.0)
+
+        ambient = self.meshes.ambient
+        return ambient + (1 - ambient)*np.clip(lighting, 0.0, 1.0)
+
+    def draw_meshes(self):
+        """ Draw every mesh in view from furthest to nearest, with the
+        model-view matrices of all meshes computed in one batch and the
+        points of all instances of a geometry transformed in another.
+        """
+        meshes, model_matrices = self.meshes.model_matrices(
+            self.meshes.visible(self.frustum_planes()))
+        model_views = self.view_matrix() @ model_matrices
+
+        # Every instance of a shared geometry is transformed at once.
+        instances = {}
+        for index, mesh in enumerate(meshes):
+            geometry = getattr(mesh, 'geometry', None)
+            if (geometry is not None
+                    and mesh not in self.meshes.detail_levels):
+                instances.setdefault(geometry, []).append(index)
+        points = {}
+        for geometry, indices in instances.items():
+            vertices, _ = self.meshes.buffers(meshes[indices[0]])
+            points.update(zip(indices, transforms.apply(model_views[indices],
+                                                        vertices)))
+
+        distances = np.linalg.norm(model_views[:, :3, 3], axis=1)
+        for index in np.argsort(-distances, kind='stable'):
+            self.draw_mesh(meshes[index], model_views[index],
+                           points.get(index))
+
     def distance_to_mesh(self, mesh: Mesh) -> float:
-        return self.position.distance_to(*mesh.points[0])
+        return float(np.linalg.norm(mesh.position - tuple(self.position)))
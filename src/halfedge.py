@@ -0,0 +1,175 @@
+"""
+Array-backed half-edge adjacency for triangle meshes.
+
+Triangle ``f`` owns the half-edges ``3*f``, ``3*f + 1`` and
+``3*f + 2``, running from each of its corners to the next, so faces
+need no offsets of their own.  ``twin`` gives the half-edge running
+the other way along the same edge, or -1 on a boundary, and the
+outgoing half-edges of each vertex are listed in ``outgoing`` from
+``vertex_offsets``.  Everything is built with sorts and searches over
+whole arrays, so building scales to meshes of millions of faces, and
+each adjacency lookup is a constant number of array reads.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+
+class HalfEdges(object):
+    """ Half-edge adjacency of (M, 3) triangles.
+    """
+
+    @property
+    def destinations(self) -> np.ndarray:
+        """ The vertex each half-edge runs to.
+        """
+        return self.vertices[self.next]
+
+    @property
+    def previous(self) -> np.ndarray:
+        """ The half-edge before each half-edge in its face.
+        """
+        return self.next[self.next]
+
+    @property
+    def faces(self) -> np.ndarray:
+        """ The face of each half-edge.
+        """
+        return np.arange(len(self)) // 3
+
+    @property
+    def boundary(self) -> np.ndarray:
+        """ Mask of the half-edges without a twin.
+        """
+        return self.twin < 0
+
+    @property
+    def edges(self) -> np.ndarray:
+        """ One half-edge for each undirected edge.
+        """
+        half_edges = np.arange(len(self))
+        return np.flatnonzero((self.twin < 0) | (half_edges < self.twin))
+
+    @property
+    def valences(self) -> np.ndarray:
+        """ The number of outgoing half-edges of each vertex.
+        """
+        return np.diff(self.vertex_offsets)
+
+    def __init__(self, triangles, vertex_count: Optional[int] = None):
+        """ Build the adjacency of triangles, whose indices must be
+        below vertex_count (by default, one more than the largest).
+        """
+        # Kept as given, so owners can tell when their triangles are
+        # replaced.
+        self.triangles = triangles
+
+        self.vertices = np.asarray(triangles, dtype=np.intp).reshape(-1)
+        if vertex_count is None:
+            vertex_count = int(self.vertices.max(initial=-1)) + 1
+        self.vertex_count = vertex_count
+
+        half_edges = np.arange(len(self.vertices))
+        self.next = half_edges - half_edges % 3 + (half_edges + 1) % 3
+
+        # Match every half-edge against the reverse of every other.
+        starts, ends = self.vertices, self.vertices[self.next]
+        keys = starts*vertex_count + ends
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+
+        repeated = np.zeros(len(keys), dtype=bool)
+        repeated[1:] = sorted_keys[1:] == sorted_keys[:-1]
+        repeated[:-1] |= repeated[1:]
+        # Half-edges sharing their direction with another, as when
+        # more than two faces meet at an edge or faces are flipped.
+        self.duplicated = np.zeros(len(keys), dtype=bool)
+        self.duplicated[order] = repeated
+
+        reverse = ends*vertex_count + starts
+        found = np.minimum(np.searchsorted(sorted_keys, reverse),
+                           max(len(keys) - 1, 0))
+        self.twin = np.full(len(keys), -1, dtype=np.intp)
+        if len(keys):
+            matched = sorted_keys[found] == reverse
+            self.twin[matched] = order[found[matched]]
+        # Twins are left out where the pairing would be ambiguous.
+        ambiguous = self.duplicated | (
+            (self.twin >= 0) & self.duplicated[np.maximum(self.twin, 0)])
+        self.twin[ambiguous] = -1
+
+        self.outgoing = np.argsort(self.vertices, kind='stable')
+        self.vertex_offsets = np.zeros(vertex_count + 1, dtype=np.intp)
+        np.cumsum(np.bincount(self.vertices, minlength=vertex_count),
+                  out=self.vertex_offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self.vertices)
+
+    def vertex_half_edges(self, vertex: int) -> np.ndarray:
+        """ Return the half-edges leaving vertex.
+        """
+        return self.outgoing[self.vertex_offsets[vertex]:
+                             self.vertex_offsets[vertex + 1]]
+
+    def vertex_faces(self, vertex: int) -> np.ndarray:
+        """ Return the faces around vertex.
+        """
+        return self.vertex_half_edges(vertex) // 3
+
+    def neighbours(self, vertex: int) -> np.ndarray:
+        """ Return the vertices sharing an edge with vertex.
+        """
+        half_edges = self.vertex_half_edges(vertex)
+        return np.unique(np.concatenate((
+            self.vertices[self.next[half_edges]],
+            self.vertices[self.next[self.next[half_edges]]])))
+
+    def face_neighbours(self) -> np.ndarray:
+        """ Return the (M, 3) faces across each edge of each face, or -1
+        where there is none.
+        """
+        return np.where(self.twin < 0, -1, self.twin // 3).reshape(-1, 3)
+
+    def non_manifold_vertices(self) -> np.ndarray:
+        """ Return the vertices whose faces do not form a single fan
+        connected across edges.
+        """
+        # Half-edges leaving the same vertex are joined when they are
+        # consecutive around it, then labels are spread to fixed point.
+        previous = self.previous
+        rotated = self.twin[previous]
+        joined = np.flatnonzero(rotated >= 0)
+        first, second = joined, rotated[joined]
+
+        labels = np.arange(len(self))
+        while True:
+            updated = labels.copy()
+            np.minimum.at(updated, first, labels[second])
+            np.minimum.at(updated, second, labels[first])
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+
+        fans = np.bincount(self.vertices[labels == np.arange(len(self))],
+                           minlength=self.vertex_count)
+        return np.flatnonzero(fans > 1)
+
+    def is_manifold(self) -> bool:
+        """ Return whether every edge has at most two faces with
+        consistent winding, and every vertex a single fan of faces.
+        """
+        return (not self.duplicated.any()
+                and not len(self.non_manifold_vertices()))
+
+    def silhouette(self, front_facing: np.ndarray) -> np.ndarray:
+        """ Return the half-edges of front facing faces whose twin is in
+        a face that is not front facing, or that have no twin.
+        """
+        front_facing = np.asarray(front_facing, dtype=bool)
+        faces = self.faces
+        across = np.where(self.twin < 0, False,
+                          front_facing[self.twin // 3])
+        return np.flatnonzero(front_facing[faces] & ~across)
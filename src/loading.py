@@ -0,0 +1,122 @@
+"""
+Loads mesh files on a worker thread.
+
+``AssetLoader.submit`` starts parsing a file with ``formats.load`` in the
+background, and packing its meshes into blocks laid out like the scene
+buffers.  ``AssetLoader.poll``, called once a frame from the main
+thread, adds the meshes of at most one finished file to a scene with a
+copy of each block, so a large file never holds up a frame while it is
+read or packed.
+"""
+
+from typing import List, Optional
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import formats
+from common import represent
+from scene import Node, PackedMeshes, Scene, pack_meshes
+
+
+class Loading(object):
+    """ A file being read by an ``AssetLoader``.
+    """
+
+    @property
+    def done(self) -> bool:
+        """ Whether the file has been read, or failed to be.
+        """
+        return self.future is not None and self.future.done()
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        """ The exception raised reading the file, or None.
+        """
+        return self.future.exception() if self.done else None
+
+    @property
+    def node(self) -> Optional[Node]:
+        """ The scene graph node read from the file, or None until it is
+        read.
+        """
+        return self.future.result() if self.done and not self.error else None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def __init__(self, path):
+        self.path = path
+        # The fraction read so far, set from the worker thread.
+        self.fraction = 0.0
+        self.future: Optional[Future] = None
+        # The meshes of the node packed on the worker thread.
+        self.packed: Optional[PackedMeshes] = None
+
+    def __repr__(self) -> str:
+        return represent(self, self.path)
+
+    def __str__(self) -> str:
+        return f'loading {self.name}: {self.fraction:.0%}'
+
+    def report(self, fraction: float) -> None:
+        """ Record the fraction of the file read so far.
+        """
+        self.fraction = fraction
+
+    def read(self) -> Node:
+        """ Read the file and pack its meshes, on the worker thread.
+        """
+        node = formats.load(self.path, self.report)
+        self.packed = pack_meshes(descendant.mesh for descendant in node
+                                  if descendant.mesh is not None)
+        return node
+
+
+class AssetLoader(object):
+    """ Reads mesh files in the background and hands their meshes to a
+    scene on the thread calling ``poll``.
+    """
+
+    def __init__(self, workers: int = 1):
+        # Files still being read or not yet polled, in submitted order.
+        self.loading: List[Loading] = []
+        self._executor = ThreadPoolExecutor(
+            workers, thread_name_prefix='AssetLoader')
+
+    def __repr__(self) -> str:
+        return represent(self, [loading.path for loading in self.loading])
+
+    def __str__(self) -> str:
+        """ A line for each file still loading, with its progress.
+        """
+        return '\n'.join(str(loading) for loading in self.loading)
+
+    def submit(self, path) -> Loading:
+        """ Start reading the file at path on the worker thread, raising
+        ValueError at once if its extension has no loader.
+        """
+        formats.loader(path)
+        loading = Loading(path)
+        loading.future = self._executor.submit(loading.read)
+        self.loading.append(loading)
+        return loading
+
+    def poll(self, scene: Scene) -> Optional[Loading]:
+        """ Add the meshes of the first finished file to scene and return
+        its loading, or return None if no file has finished.  A file that
+        failed to load is returned with its error and adds nothing.
+        """
+        for loading in self.loading:
+            if loading.done:
+                self.loading.remove(loading)
+                if loading.error is None:
+                    scene.attach_tree(loading.node, packed=loading.packed)
+                return loading
+        return None
+
+    def shutdown(self) -> None:
+        """ Stop the worker thread, dropping files not yet started.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
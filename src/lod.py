@@ -0,0 +1,272 @@
+"""
+Level of detail generation and selection.
+
+Simplified versions of a mesh are made by quadric error metric edge
+collapse (Garland and Heckbert), and chosen per viewer from the size
+of the mesh on screen.
+"""
+
+from typing import List, Sequence, Tuple
+Geometry = Tuple['np.ndarray', 'np.ndarray']
+
+import weakref
+
+import numpy as np
+
+
+DETAIL_RATIOS = (1.0, 0.5, 0.25, 0.1)
+
+# Minimum screen space radii, in pixels, of each level after the first.
+DETAIL_RADII = (120.0, 50.0, 15.0)
+
+# Fraction a radius must pass a threshold by before the level changes.
+HYSTERESIS = 0.15
+
+# Weight of the planes keeping open boundaries in place.
+BOUNDARY_WEIGHT = 1000.0
+
+# Determinant, relative to the cube of the mean eigenvalue, below which
+# the point minimizing an edge's quadric is not used, as flat regions
+# leave it anywhere along the surface.
+MIN_DETERMINANT = 1e-9
+
+
+def _plane_quadrics(vertices: np.ndarray,
+                    triangles: np.ndarray) -> np.ndarray:
+    """ Return the (N, 4, 4) error quadric of each vertex, summed from
+    the planes of its triangles and of any open boundary edges.
+    """
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0],
+                       corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(lengths == 0, 1.0, lengths)
+
+    planes = np.concatenate(
+        (normals, -np.einsum('ij,ij->i', normals, corners[:, 0])[:, None]),
+        axis=1)
+    quadrics = np.zeros((len(vertices), 4, 4))
+    face_quadrics = np.einsum('ni,nj->nij', planes, planes)
+    for corner in range(3):
+        np.add.at(quadrics, triangles[:, corner], face_quadrics)
+
+    # Edges used by a single triangle are on an open boundary.  Add a
+    # plane through each, perpendicular to its triangle.
+    edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]],
+                            triangles[:, [2, 0]]))
+    faces = np.tile(np.arange(len(triangles)), 3)
+    _, inverse, counts = np.unique(np.sort(edges, axis=1), axis=0,
+                                   return_inverse=True, return_counts=True)
+    boundary = counts[inverse.ravel()] == 1
+    if boundary.any():
+        edges, faces = edges[boundary], faces[boundary]
+        starts, ends = vertices[edges[:, 0]], vertices[edges[:, 1]]
+        normals = np.cross(ends - starts, normals[faces])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = normals / np.where(lengths == 0, 1.0, lengths)
+        planes = np.concatenate(
+            (normals, -np.einsum('ij,ij->i', normals, starts)[:, None]),
+            axis=1)
+        edge_quadrics = BOUNDARY_WEIGHT*np.einsum('ni,nj->nij', planes,
+                                                  planes)
+        for end in range(2):
+            np.add.at(quadrics, edges[:, end], edge_quadrics)
+
+    return quadrics
+
+
+def _collapse_targets(quadrics: np.ndarray, starts: np.ndarray,
+                      ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return the errors and positions of the best points to collapse
+    the edges from starts to ends into, given the (E, 4, 4) quadrics
+    summed over both ends.  The point minimizing the quadric is used
+    where it is well defined, unless an end or the midpoint is better.
+    """
+    # The point solves A p = -b, for the quadric [[A, b], [b, c]].
+    matrices = quadrics[:, :3, :3]
+    scales = np.trace(matrices, axis1=1, axis2=2) / 3
+    solvable = (np.abs(np.linalg.det(matrices))
+                > MIN_DETERMINANT*np.abs(scales)**3)
+    middles = (starts + ends) / 2
+    optimal = middles.copy()
+    if solvable.any():
+        optimal[solvable] = -np.linalg.solve(
+            matrices[solvable], quadrics[solvable, :3, 3:])[..., 0]
+
+    candidates = np.stack((optimal, starts, ends, middles), axis=1)
+    points = np.concatenate(
+        (candidates, np.ones(candidates.shape[:2] + (1,))), axis=2)
+    errors = (points @ quadrics*points).sum(axis=2)
+    best = errors.argmin(axis=1)
+    rows = np.arange(len(best))
+    return errors[rows, best], candidates[rows, best]
+
+
+def _independent(edges: np.ndarray, ranks: np.ndarray,
+                 triangles: np.ndarray, vertex_count: int) -> np.ndarray:
+    """ Return a mask of the edges ranked lowest among every edge
+    touching the triangles around their ends, so no triangle is changed
+    by more than one of them.
+    """
+    # Triangles around each vertex, grouped by vertex.
+    corners = triangles.ravel()
+    order = np.argsort(corners, kind='stable')
+    around = order // 3
+    degrees = np.bincount(corners, minlength=vertex_count)
+    firsts = np.cumsum(degrees) - degrees
+
+    ends = edges.ravel()
+    counts = degrees[ends]
+    owners = np.repeat(np.arange(len(edges)), 2)
+    owners = np.repeat(owners, counts)
+    faces = around[np.repeat(firsts[ends], counts) + _offsets(counts)]
+
+    lowest = np.full(len(triangles), len(edges))
+    np.minimum.at(lowest, faces, ranks[owners])
+    independent = np.ones(len(edges), dtype=bool)
+    independent[owners[lowest[faces] != ranks[owners]]] = False
+    return independent
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    """ Return the positions 0 .. count - 1 within each run of counts.
+    """
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+
+
+def decimate(vertices, triangles, ratio: float) -> Geometry:
+    """ Return the vertices and triangles of the mesh simplified to
+    about ratio of its triangles, by collapsing the edges whose removal
+    adds the least quadric error.  Unused vertices are removed.
+
+    Edges are collapsed in passes.  Each pass finds the cost of the
+    edges with a moved end all at once, keeping the rest, then
+    collapses a random set of the cheapest edges that change no
+    triangle in common.
+    """
+    vertices = np.array(vertices, dtype=float)
+    triangles = np.array(triangles, dtype=np.intp).reshape(-1, 3)
+    target = int(len(triangles)*ratio)
+
+    quadrics = _plane_quadrics(vertices, triangles)
+    # Seeded, so the same mesh always simplifies the same way.
+    random = np.random.default_rng(0)
+    moved = np.ones(len(vertices), dtype=bool)
+    costed = np.empty(0, dtype=np.intp)
+    costed_errors, costed_positions = np.empty(0), np.empty((0, 3))
+
+    while len(triangles) > target:
+        sides = np.sort(np.concatenate((triangles[:, [0, 1]],
+                                        triangles[:, [1, 2]],
+                                        triangles[:, [2, 0]])), axis=1)
+        # Edges are found by a single key, much faster than unique rows.
+        keys, shared = np.unique(sides[:, 0]*len(vertices) + sides[:, 1],
+                                 return_counts=True)
+        starts, ends = np.divmod(keys, len(vertices))
+        edges = np.column_stack((starts, ends))
+
+        # Edges costed before keep their cost unless an end moved.
+        errors = np.empty(len(keys))
+        positions = np.empty((len(keys), 3))
+        found = np.minimum(np.searchsorted(costed, keys),
+                           max(len(costed) - 1, 0))
+        stale = moved[starts] | moved[ends]
+        if len(costed):
+            stale |= costed[found] != keys
+        kept = ~stale
+        errors[kept] = costed_errors[found[kept]]
+        positions[kept] = costed_positions[found[kept]]
+        errors[stale], positions[stale] = _collapse_targets(
+            quadrics[starts[stale]] + quadrics[ends[stale]],
+            vertices[starts[stale]], vertices[ends[stale]])
+        costed, costed_errors, costed_positions = keys, errors, positions
+
+        # Only the cheapest edges that could be needed compete, in a
+        # random order, as ranking them by error would leave few that
+        # are lowest in their neighbourhood where errors vary smoothly.
+        excess = len(triangles) - target
+        count = min(max(excess // 2, 1), len(keys))
+        candidates = np.argsort(errors, kind='stable')[:count]
+        chosen = candidates[_independent(
+            edges[candidates], random.permutation(count), triangles,
+            len(vertices))]
+        chosen = chosen[np.argsort(errors[chosen], kind='stable')]
+        # Stop once enough triangles would go, as a collapse at a time
+        # does.
+        removed = np.cumsum(shared[chosen])
+        chosen = chosen[:int(np.searchsorted(removed, excess)) + 1]
+
+        # Move each start to its collapse position and replace the end
+        # with it.
+        starts, ends = starts[chosen], ends[chosen]
+        vertices[starts] = positions[chosen]
+        quadrics[starts] += quadrics[ends]
+        moved[:] = False
+        moved[starts] = True
+        replaced = np.arange(len(vertices))
+        replaced[ends] = starts
+        triangles = replaced[triangles]
+        triangles = triangles[(triangles[:, 0] != triangles[:, 1])
+                              & (triangles[:, 1] != triangles[:, 2])
+                              & (triangles[:, 2] != triangles[:, 0])]
+
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return vertices[used], triangles.reshape(-1, 3)
+
+
+class LevelsOfDetail(object):
+    """ Simplified versions of a mesh, and the state needed to choose
+    between them for each viewer without flickering.
+
+    Level 0 is the original mesh and is not stored here.
+    """
+
+    def __init__(self, vertices, triangles,
+                 ratios: Sequence[float] = DETAIL_RATIOS,
+                 radii: Sequence[float] = DETAIL_RADII,
+                 hysteresis: float = HYSTERESIS):
+        """ Decimate the mesh to each ratio after the first.
+        """
+        if len(radii) != len(ratios) - 1:
+            raise ValueError('There should be a radius for each ratio '
+                             'after the first.')
+
+        self.ratios = tuple(ratios)
+        self.radii = tuple(radii)
+        self.hysteresis = hysteresis
+
+        vertices = np.asarray(vertices, dtype=float)
+        self.radius = float(np.linalg.norm(vertices, axis=1).max(initial=0))
+        self.levels: List[Geometry] = [
+            tuple(_packed(*decimate(vertices, triangles, ratio)))
+            for ratio in self.ratios[1:]]
+
+        self._current = weakref.WeakKeyDictionary()
+
+    def __len__(self) -> int:
+        return len(self.ratios)
+
+    def select(self, viewer, screen_radius: float) -> int:
+        """ Return the level for viewer to draw at, given the radius of
+        the mesh on its screen in pixels.  A level is only left once
+        the radius passes its threshold by the hysteresis fraction.
+        """
+        current = self._current.get(viewer, 0)
+
+        level = 0
+        for threshold in self.radii:
+            if current > level:
+                threshold *= 1 + self.hysteresis
+            else:
+                threshold *= 1 - self.hysteresis
+            if screen_radius >= threshold:
+                break
+            level += 1
+
+        self._current[viewer] = level
+        return level
+
+
+def _packed(vertices, triangles) -> Geometry:
+    return vertices.astype(np.float32), triangles.astype(np.uint32)
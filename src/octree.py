@@ -0,0 +1,227 @@
+"""
+Loose octree spatial index over axis-aligned item boxes.
+
+A cell at depth ``d`` has an edge of ``size / 2**d``, and its loose
+bounds extend half an edge beyond it on every side.  Each item is
+stored in exactly one cell, chosen from the center and size of its
+box, so inserting, removing and moving items never splits or merges
+cells.  Queries visit a tree level at a time and never descend into
+cells whose loose bounds are rejected.
+"""
+
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+Key = Tuple[int, int, int, int]
+
+import numpy as np
+
+
+class LooseOctree(object):
+    """ Loose octree mapping items to their bounding boxes.
+    """
+
+    def __init__(self, center=(0.0, 0.0, 0.0), size: float = 65536.0,
+                 max_depth: int = 10):
+        self.size = float(size)
+        self.max_depth = max_depth
+        self.origin = np.asarray(center, dtype=float) - self.size / 2
+
+        self.cells: Dict[Key, set] = {}
+        # The number of items in each cell and all of its descendants.
+        self.counts: Dict[Key, int] = {}
+        self.items: Dict[Hashable, tuple] = {}
+        # Items too large for, or centered outside of, the root cell.
+        self.outside = set()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item) -> bool:
+        return item in self.items
+
+    def __iter__(self) -> iter:
+        return iter(self.items)
+
+    def insert(self, item, lower, upper) -> None:
+        """ Add item with the box from lower to upper, replacing any
+        existing box.
+        """
+        if item in self.items:
+            self.remove(item)
+
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+        key = self._key(lower, upper)
+        self.items[item] = (key, lower, upper)
+
+        if key is None:
+            self.outside.add(item)
+            return
+
+        self.cells.setdefault(key, set()).add(item)
+        for ancestor in self._ancestors(key):
+            self.counts[ancestor] = self.counts.get(ancestor, 0) + 1
+
+    def remove(self, item) -> None:
+        """ Remove item, raising a KeyError if it is not present.
+        """
+        key, _, _ = self.items.pop(item)
+
+        if key is None:
+            self.outside.remove(item)
+            return
+
+        cell = self.cells[key]
+        cell.remove(item)
+        if not cell:
+            del self.cells[key]
+
+        for ancestor in self._ancestors(key):
+            self.counts[ancestor] -= 1
+            if not self.counts[ancestor]:
+                del self.counts[ancestor]
+
+    def discard(self, item) -> None:
+        """ Remove item if it is present.
+        """
+        if item in self.items:
+            self.remove(item)
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.counts.clear()
+        self.items.clear()
+        self.outside.clear()
+
+    def query_box(self, lower, upper) -> List:
+        """ Return the items whose boxes overlap the box from lower to
+        upper.
+        """
+        lower = np.asarray(lower, dtype=float)
+        upper = np.asarray(upper, dtype=float)
+
+        def classify(centers, extents):
+            overlap = np.all((centers - extents <= upper)
+                             & (centers + extents >= lower), axis=1)
+            inside = np.all((centers - extents >= lower)
+                            & (centers + extents <= upper), axis=1)
+            return ~overlap, inside
+
+        return self._query(classify)
+
+    def query_sphere(self, center, radius: float) -> List:
+        """ Return the items whose boxes overlap the sphere.
+        """
+        center = np.asarray(center, dtype=float)
+
+        def classify(centers, extents):
+            offsets = np.abs(centers - center)
+            nearest = np.maximum(offsets - extents, 0.0)
+            farthest = offsets + extents
+            outside = np.einsum('ij,ij->i', nearest, nearest) > radius**2
+            inside = np.einsum('ij,ij->i', farthest, farthest) <= radius**2
+            return outside, inside
+
+        return self._query(classify)
+
+    def query_frustum(self, planes) -> List:
+        """ Return the items whose boxes are not entirely outside any of
+        the (P, 4) planes.  A point p is inside plane ``(a, b, c, d)``
+        when ``a*p.x + b*p.y + c*p.z + d >= 0``.
+        """
+        planes = np.asarray(planes, dtype=float)
+        normals, offsets = planes[:, :3], planes[:, 3]
+
+        def classify(centers, extents):
+            distances = centers @ normals.T + offsets
+            radii = extents @ np.abs(normals).T
+            outside = np.any(distances < -radii, axis=1)
+            inside = np.all(distances >= radii, axis=1)
+            return outside, inside
+
+        return self._query(classify)
+
+    def _query(self, classify: Callable) -> List:
+        """ Return the items accepted by classify, which takes (N, 3)
+        box centers and half extents and returns masks of the boxes
+        entirely outside and entirely inside the query volume.
+        """
+        accepted = []
+        partial = list(self.outside)
+        frontier = [(0, 0, 0, 0)] if (0, 0, 0, 0) in self.counts else []
+        contained = []
+
+        while frontier or contained:
+            # Cells inside the query volume need no further tests.
+            for key in contained:
+                accepted.extend(self.cells.get(key, ()))
+            contained = self._children(contained)
+
+            if not frontier:
+                continue
+
+            keys = np.array(frontier)
+            edge = self.size / 2**keys[0, 0]
+            centers = self.origin + (keys[:, 1:] + 0.5)*edge
+            # Loose bounds are twice the size of the cell.
+            extents = np.full_like(centers, edge)
+            outside, inside = classify(centers, extents)
+
+            visible = [key for key, out in zip(frontier, outside) if not out]
+            for key in visible:
+                partial.extend(self.cells.get(key, ()))
+            contained.extend(self._children(
+                [key for key, full in zip(frontier, inside) if full]))
+            frontier = self._children(
+                [key for key, out, full in zip(frontier, outside, inside)
+                 if not (out or full)])
+
+        if partial:
+            bounds = np.array([self.items[item][1:] for item in partial])
+            centers = (bounds[:, 0] + bounds[:, 1]) / 2
+            extents = (bounds[:, 1] - bounds[:, 0]) / 2
+            outside, _ = classify(centers, extents)
+            accepted.extend(item for item, out in zip(partial, outside)
+                            if not out)
+
+        return accepted
+
+    def _children(self, keys: List[Key]) -> List[Key]:
+        """ Return the occupied children of the cells with keys.
+        """
+        children = []
+        for depth, x, y, z in keys:
+            x, y, z = 2*x, 2*y, 2*z
+            for child in ((depth + 1, x + dx, y + dy, z + dz)
+                          for dx in (0, 1) for dy in (0, 1) for dz in (0, 1)):
+                if child in self.counts:
+                    children.append(child)
+        return children
+
+    def _key(self, lower: np.ndarray, upper: np.ndarray) -> Optional[Key]:
+        """ Return the key of the deepest cell whose loose bounds
+        contain the box, or None if the root cell does not.
+        """
+        center = (lower + upper) / 2
+        radius = np.max(upper - lower) / 2
+
+        # A cell fits boxes up to half its edge beyond its own bounds.
+        if radius > 0:
+            depth = int(np.floor(np.log2(self.size / (2*radius))))
+            depth = min(depth, self.max_depth)
+        else:
+            depth = self.max_depth
+
+        relative = (center - self.origin) / self.size
+        if depth < 0 or np.any(relative < 0) or np.any(relative >= 1):
+            return None
+
+        x, y, z = (relative*2**depth).astype(int)
+        return depth, int(x), int(y), int(z)
+
+    def _ancestors(self, key: Key) -> iter:
+        """ Yield key and the keys of every cell containing it.
+        """
+        depth, x, y, z = key
+        for level in range(depth, -1, -1):
+            shift = depth - level
+            yield level, x >> shift, y >> shift, z >> shift
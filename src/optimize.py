@@ -0,0 +1,177 @@
+"""
+Mesh optimization: vertex welding and reordering for locality.
+
+``optimize`` welds vertices closer than a tolerance, drops the
+triangles that collapse, and then reorders triangles along a Morton
+curve and numbers vertices in order of first use, which also strips
+unused vertices.  ``cached`` keeps the result in
+``assets.default_cache`` so each asset is only optimized once.
+"""
+
+from typing import Callable, Tuple
+Geometry = Tuple['np.ndarray', 'np.ndarray']
+
+import numpy as np
+
+import assets
+
+
+TOLERANCE = 1e-6
+
+# Bump to invalidate every cache entry when the optimization changes.
+CACHE_VERSION = 1
+
+# Bits per axis of packed grid cell keys.
+_CELL_BITS = 21
+
+
+def morton_codes(points: np.ndarray, bits: int = 10) -> np.ndarray:
+    """ Return the Morton (Z-order) code of each (N, 3) point, from its
+    position within the bounds of all points quantized to bits per
+    axis.
+    """
+    points = np.asarray(points, dtype=float)
+    lower = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lower, np.finfo(float).tiny)
+    cells = ((points - lower) / extent*(2**bits - 1)).astype(np.uint64)
+
+    # Spread the bits of each axis out to every third bit.
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for axis in range(3):
+        spread = np.zeros(len(points), dtype=np.uint64)
+        for bit in range(bits):
+            spread |= ((cells[:, axis] >> np.uint64(bit)) & np.uint64(1)
+                       ) << np.uint64(3*bit + axis)
+        codes |= spread
+    return codes
+
+
+def weld(vertices, triangles, tolerance: float = TOLERANCE) -> Geometry:
+    """ Return the vertices and triangles with every group of vertices
+    within tolerance of each other merged at their mean.  Triangles
+    left with repeated corners are removed.
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.intp).reshape(-1, 3)
+    if not len(vertices):
+        return vertices, triangles
+
+    if tolerance > 0:
+        _, inverse = np.unique(_weld_labels(vertices, tolerance),
+                               return_inverse=True)
+    else:
+        _, inverse = np.unique(vertices, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    counts = np.bincount(inverse)
+    welded = np.zeros((len(counts), 3))
+    np.add.at(welded, inverse, vertices)
+    welded /= counts[:, None]
+
+    triangles = inverse[triangles]
+    distinct = ((triangles[:, 0] != triangles[:, 1])
+                & (triangles[:, 1] != triangles[:, 2])
+                & (triangles[:, 2] != triangles[:, 0]))
+    return welded, triangles[distinct]
+
+
+def reorder(vertices, triangles) -> Geometry:
+    """ Return the vertices and triangles with triangles sorted along a
+    Morton curve through their centroids, and vertices numbered in
+    order of first use.  Unused vertices are removed.
+    """
+    vertices = np.asarray(vertices).reshape(-1, 3)
+    triangles = np.asarray(triangles, dtype=np.intp).reshape(-1, 3)
+    if not len(triangles):
+        return vertices[:0], triangles
+
+    codes = morton_codes(vertices[triangles].mean(axis=1))
+    triangles = triangles[np.argsort(codes, kind='stable')]
+
+    used, first = np.unique(triangles, return_index=True)
+    order = used[np.argsort(first)]
+    renumbered = np.empty(len(vertices), dtype=np.intp)
+    renumbered[order] = np.arange(len(order))
+    return vertices[order], renumbered[triangles]
+
+
+def optimize(vertices, triangles, tolerance: float = TOLERANCE) -> Geometry:
+    """ Return the vertices and triangles welded, then reordered.
+    """
+    return reorder(*weld(vertices, triangles, tolerance))
+
+
+def cached(path: str, read: Callable[[str], Geometry],
+           tolerance: float = TOLERANCE) -> Geometry:
+    """ Return the optimized vertices and triangles of the asset at
+    path, as returned by read.  The result is kept in
+    ``assets.default_cache`` and reused until the asset changes.
+    """
+    def read_arrays(path) -> assets.Arrays:
+        vertices, triangles = optimize(*read(path), tolerance)
+        return {'vertices': vertices, 'triangles': triangles}
+
+    arrays = assets.cached(
+        path, f'optimized-{CACHE_VERSION}-{tolerance:g}', read_arrays)
+    return arrays['vertices'], arrays['triangles']
+
+
+def _weld_labels(vertices: np.ndarray, tolerance: float) -> np.ndarray:
+    """ Return, for each vertex, the lowest index of the vertices
+    connected to it by chains of pairs within tolerance.
+
+    Vertices are hashed into a grid of cells at least tolerance wide,
+    so close pairs are always in the same or neighbouring cells.
+    """
+    lower = vertices.min(axis=0)
+    extent = float((vertices.max(axis=0) - lower).max())
+    cell_size = max(tolerance, extent / 2**(_CELL_BITS - 1))
+
+    # Cells are offset by one so neighbour keys never go negative.
+    cells = np.floor((vertices - lower) / cell_size).astype(np.int64) + 1
+    shifts = np.array([2*_CELL_BITS, _CELL_BITS, 0], dtype=np.int64)
+    keys = (cells << shifts).sum(axis=1)
+
+    order = np.argsort(keys, kind='stable')
+    cell_keys, starts, counts = np.unique(keys[order], return_index=True,
+                                          return_counts=True)
+
+    # Half of the neighbourhood is enough, as pairs are symmetric.
+    offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+               for dz in (-1, 0, 1) if (dx, dy, dz) >= (0, 0, 0)]
+
+    firsts, seconds = [], []
+    for offset in offsets:
+        neighbour_keys = keys + int((np.array(offset) << shifts).sum())
+        cell = np.minimum(np.searchsorted(cell_keys, neighbour_keys),
+                          len(cell_keys) - 1)
+        found = np.flatnonzero(cell_keys[cell] == neighbour_keys)
+        cell = cell[found]
+
+        # Pair each vertex with every vertex in its neighbour cell.
+        sizes = counts[cell]
+        first = np.repeat(found, sizes)
+        within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes,
+                                                     sizes)
+        second = order[np.repeat(starts[cell], sizes) + within]
+
+        close = (np.linalg.norm(vertices[first] - vertices[second], axis=1)
+                 <= tolerance)
+        if offset == (0, 0, 0):
+            close &= first < second
+        firsts.append(first[close])
+        seconds.append(second[close])
+
+    firsts = np.concatenate(firsts)
+    seconds = np.concatenate(seconds)
+
+    # Propagate the lowest label across pairs until nothing changes.
+    labels = np.arange(len(vertices))
+    while True:
+        updated = labels.copy()
+        np.minimum.at(updated, firsts, labels[seconds])
+        np.minimum.at(updated, seconds, labels[firsts])
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
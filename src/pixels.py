@@ -1,11 +1,30 @@
 # -*- coding: utf-8 -*-
 
+from typing import Iterator, Optional, Tuple
+
 import cProfile
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
 from kivy.app import App
 from kivy.uix.widget import Widget
 
+from geometry import CameraLogic
+
+
+BITMAP_SIGNATURE = b'BM'
+
+# Compression values of uncompressed BMP files.  Bit fields are only
+# read with the usual masks, which give the same layout.
+BI_RGB = 0
+BI_BITFIELDS = 3
+BITFIELD_MASKS = (0x00ff0000, 0x0000ff00, 0x000000ff)
+
+# Candidate pixels tested against triangles at a time.
+CHUNK_PIXELS = 2**20
+
 
 class PixelGridApp(App):
     def build(self):
@@ -29,6 +48,68 @@ class PixelRGB(bytes):
         return self[0]*256**2 + self[1]*256 + self[2]
 
 
+class Texture(object):
+    """ A read-only image for textured meshes, whose ``planes`` are
+    its (3, width, height) red, green and blue values, indexed by x
+    and then y up from the bottom.
+
+    Planes are copied unless copy is False, so the texture does not
+    change when the array it was made from does.
+    """
+
+    @property
+    def width(self) -> int:
+        return self.planes.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.planes.shape[2]
+
+    def __init__(self, planes, *, copy: bool = True) -> None:
+        planes = (np.array(planes, dtype=np.uint8) if copy
+                  else np.asarray(planes, dtype=np.uint8).view())
+        if planes.ndim != 3 or len(planes) != 3:
+            raise ValueError(f'Expected (3, width, height) planes: '
+                             f'{planes.shape}')
+        planes.flags.writeable = False
+        self.planes = planes
+
+    @classmethod
+    def from_bitmap(cls, file, *, mapped: bool = False) -> 'Texture':
+        """ Read an uncompressed 24 or 32 bit BMP file.  The planes are
+        a read-only view of the file, so no pixel is copied.  If
+        mapped, the file is memory-mapped rather than read.
+        """
+        if mapped:
+            data = np.memmap(file, dtype=np.uint8, mode='r')
+        else:
+            with open(file, 'rb') as fh:
+                data = np.frombuffer(fh.read(), dtype=np.uint8)
+
+        offset, width, height, bits = _bitmap_header(data)
+        pixel_bytes = bits // 8
+        row_bytes = (width*pixel_bytes + 3) // 4 * 4
+        if len(data) < offset + row_bytes*abs(height):
+            raise SyntaxError('Pixel data is shorter than the image.')
+
+        # Rows run bottom up, like y, unless the height is negative.
+        # Pixels are stored as blue, green, red (and alpha), so red is
+        # third and channels step back a byte at a time.
+        start = offset + 2
+        row_step = row_bytes
+        if height < 0:
+            height = -height
+            start += (height - 1)*row_bytes
+            row_step = -row_bytes
+
+        return cls(np.lib.stride_tricks.as_strided(
+            data[start:], (3, width, height),
+            (-1, pixel_bytes, row_step), writeable=False), copy=False)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.width}x{self.height})'
+
+
 class PixelGrid(object):
     """ .
     """
@@ -45,22 +126,39 @@ class PixelGrid(object):
     def blue(self):
         return self.pixels[self._index,2]
 
-    @classmethod
-    def from_bitmap(cls, file):
-        with open(file, 'rb') as fh:
-            bmp = fh.read()
+    @property
+    def planes(self) -> np.ndarray:
+        """ The (3, width, height) red, green and blue values shown.
+        """
+        return self.pixels[self._index]
 
-        if bmp.startswith(b'BM'):
-            print('is bitmap')
-            length = int.from_bytes(bmp[2:6], byteorder='little')
-            print(length)
-        print(bmp[:len(bmp) - 256*173*3])
-        return cls()
+    @property
+    def image(self) -> np.ndarray:
+        """ The (height, width, 3) pixels shown, with rows from the top,
+        as a view of ``planes``.
+        """
+        return self.planes.transpose(2, 1, 0)[::-1]
+
+    @classmethod
+    def from_bitmap(cls, file, *, mapped: bool = False) -> 'PixelGrid':
+        """ Read an uncompressed 24 or 32 bit BMP file into both
+        buffers of a grid of its size.  The pixels are copied, so they
+        can be drawn over; ``Texture.from_bitmap`` reads an image to
+        texture meshes with, without copying.
+        """
+        texture = Texture.from_bitmap(file, mapped=mapped)
+        grid = cls()
+        grid.pixels = np.ascontiguousarray(np.broadcast_to(
+            texture.planes, (2,) + texture.planes.shape))
+        grid.depth = np.full([texture.width, texture.height], np.inf)
+        return grid
 
     def __init__(self) -> None:
         """ Initialize three identical red, green, and blue 2D arrays.
         """
         self.pixels = np.zeros([2, 3, 100, 100], dtype=np.uint8)
+        # Distance of the nearest triangle drawn to each pixel.
+        self.depth = np.full([100, 100], np.inf)
         self._index = 0
 
     def __repr__(self) -> str:
@@ -74,18 +172,117 @@ class PixelGrid(object):
         """
         self._index ^= 1
 
+    def clear(self, color=(0, 0, 0)) -> None:
+        """ Fill the back buffer with color and forget the depths of
+        the triangles drawn.
+        """
+        self.pixels[self._index ^ 1] = np.reshape(color, (3, 1, 1))
+        self.depth.fill(np.inf)
+
+    def draw_triangles(self, screen_points: np.ndarray,
+                       triangles: np.ndarray,
+                       shades: Optional[np.ndarray] = None, *,
+                       color=(255, 255, 255),
+                       depths: Optional[np.ndarray] = None,
+                       uvs: Optional[np.ndarray] = None,
+                       texture: Optional[Texture] = None) -> None:
+        """ Draw the (M, 3) triangles indexing the (N, 2) screen points
+        into the back buffer, in color or, where the points have the
+        (N, 2) texture coordinates uvs, in the nearest texel of texture
+        (a ``Texture`` or another grid), scaled by the shade of each
+        triangle.
+
+        Given the depths of the points, texture coordinates are
+        interpolated with perspective and only the nearest triangle at
+        each pixel is drawn.  Otherwise later triangles cover earlier.
+        """
+        back = self.pixels[self._index ^ 1]
+        width, height = back.shape[1:]
+        triangles = np.asarray(triangles, dtype=np.intp).reshape(-1, 3)
+        shades = (np.ones(len(triangles)) if shades is None
+                  else np.asarray(shades, dtype=float))
+        color = np.asarray(color, dtype=float).reshape(3, 1)
+        textured = texture is not None and uvs is not None
+        # Arrays are indexed by corner first, so each corner is a
+        # contiguous row.
+        triangle_corners = np.ascontiguousarray(triangles.T)
+        if depths is not None:
+            inverse_depths = 1 / np.asarray(depths, dtype=float)
+        if textured:
+            us, vs = np.asarray(uvs, dtype=float).T.copy()
+        # Pixels are written by their index in the flattened planes.
+        flat = back.reshape(3, -1)
+        depth_buffer = self.depth.reshape(-1)
+
+        for numbers, xs, ys, weights in covered_pixels(
+                screen_points, triangles, width, height):
+            keys = xs*height + ys
+            corners = triangle_corners[:, numbers]
+            if depths is not None:
+                # Weights of 1/z are linear on screen, unlike those of
+                # the texture coordinates.
+                weights = weights*inverse_depths[corners]
+                pixel_depths = 1 / weights.sum(axis=0)
+                weights *= pixel_depths
+
+                nearer = pixel_depths < depth_buffer[keys]
+                np.minimum.at(depth_buffer, keys[nearer],
+                              pixel_depths[nearer])
+                nearest = nearer & (pixel_depths == depth_buffer[keys])
+                numbers, keys, weights, corners = (
+                    numbers[nearest], keys[nearest], weights[:, nearest],
+                    corners[:, nearest])
+
+            if textured:
+                colors = _sample(texture.planes,
+                                 (weights*us[corners]).sum(axis=0),
+                                 (weights*vs[corners]).sum(axis=0))
+            else:
+                colors = color
+            flat[:, keys] = colors*shades[numbers]
+
     @staticmethod
-    def apply_to_pixels(grid, function) -> None:
-        """ Apply ``function`` to each pixel of ``grid``. `function``
-        should take two integer arguments for the x and y coordinates
-        and return an integer in range(2**32). This returned value is
-        set as the new value of the pixel.
-
-        WARNING: Currently this can be a lengthy operation, depending on
-                 the size of ``grid``.
+    def apply_to_pixels(grid: np.ndarray, function, *,
+                        chunk_pixels: Optional[int] = None,
+                        workers: int = 1) -> None:
+        """ Set each pixel of ``grid`` to ``function`` of its
+        coordinates.  ``function`` is called with an array of the
+        coordinates along each axis, broadcast against each other (x as
+        a column and y as a row), and should return values broadcasting
+        to their shape, as NumPy operators do, so that
+        ``lambda x, y: x^y`` is evaluated once for the whole grid.
+        Values are cast to the type of ``grid``.
+
+        If ``chunk_pixels`` is given, ``function`` is called for blocks
+        of whole columns of about that many pixels, bounding the memory
+        taken by its temporary arrays.  With more than one of
+        ``workers``, blocks are evaluated on that many threads, which
+        only helps functions that release the GIL, as NumPy does for
+        large arrays.
         """
-        for coord, pixel in np.ndenumerate(grid):
-            grid[coord] = function(*coord)
+        shape = grid.shape
+        if not grid.size:
+            return
+        column_pixels = int(np.prod(shape[1:]))
+        if chunk_pixels is not None:
+            columns = max(1, chunk_pixels // column_pixels)
+        else:
+            columns = -(-shape[0] // workers)
+
+        def apply(start: int) -> None:
+            stop = min(start + columns, shape[0])
+            coordinates = np.ogrid[(slice(start, stop),)
+                                   + tuple(slice(0, n) for n in shape[1:])]
+            grid[start:stop] = function(*coordinates)
+
+        starts = range(0, shape[0], columns)
+        if workers > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(workers) as executor:
+                # Iterating the results raises the first error.
+                list(executor.map(apply, starts))
+        else:
+            for start in starts:
+                apply(start)
 
     def resize_grids(self, width, height):
         """ Resize all pixel grids to ``width`` by ``height``, without
@@ -93,6 +290,116 @@ class PixelGrid(object):
         """
         shape = self.pixels.shape
         self.pixels.resize(shape[0], shape[1], width, height)
+        self.depth = np.full([width, height], np.inf)
+
+
+def _bitmap_header(data: np.ndarray) -> Tuple[int, int, int, int]:
+    """ Return the pixel data offset, width, height and bits per pixel
+    of the BMP file in data, raising SyntaxError unless it is an
+    uncompressed 24 or 32 bit image.
+    """
+    try:
+        signature, offset, header_size = struct.unpack_from('<2s8xII', data)
+        width, height, _, bits, compression = struct.unpack_from(
+            '<iiHHI', data, 18)
+        # Bit field masks follow the 40 byte header, or are part of a
+        # longer one.
+        masks = (struct.unpack_from('<III', data, 54)
+                 if compression == BI_BITFIELDS else None)
+    except struct.error:
+        raise SyntaxError('File too short for a BMP header.') from None
+
+    if signature != BITMAP_SIGNATURE or header_size < 40:
+        raise SyntaxError('Not a Windows BMP file.')
+    if bits not in (24, 32):
+        raise SyntaxError(f'Unsupported bits per pixel: {bits}.')
+    if not (compression == BI_RGB or bits == 32
+            and masks == BITFIELD_MASKS):
+        raise SyntaxError(f'Unsupported compression: {compression}.')
+    if width <= 0 or height == 0:
+        raise SyntaxError(f'Invalid size: {width} by {height}.')
+    return offset, width, height, bits
+
+
+def covered_pixels(screen_points: np.ndarray, triangles: np.ndarray,
+                   width: int, height: int
+                   ) -> Iterator[Tuple[np.ndarray, ...]]:
+    """ Yield the pixels of a width by height grid whose centers are
+    covered by the (M, 3) triangles indexing the (N, 2) screen points,
+    as arrays of triangle numbers, x and y coordinates, and (3, K)
+    barycentric weights of the corners.
+
+    Each row of a triangle is cut to the span inside all three edges,
+    for blocks of triangles of about ``CHUNK_PIXELS`` pixels at a time.
+    """
+    corners = np.asarray(screen_points, dtype=float)[triangles]
+    # The edge opposite each corner, from start to end.
+    starts = corners[:, [1, 2, 0]]
+    sides = corners[:, [2, 0, 1]] - starts
+    areas = sides[:, 0, 0]*sides[:, 1, 1] - sides[:, 0, 1]*sides[:, 1, 0]
+    signs = np.sign(areas)
+
+    lower = np.maximum(np.ceil(corners.min(axis=1) - 0.5), 0)
+    upper = np.minimum(np.floor(corners.max(axis=1) - 0.5),
+                       (width - 1, height - 1))
+    spans = np.maximum(upper - lower + 1, 0).astype(np.int64)
+    lower = lower.astype(np.int64)
+    sizes = np.where(areas != 0, spans[:, 0]*spans[:, 1], 0)
+
+    numbers = np.flatnonzero(sizes)
+    ends = np.cumsum(sizes[numbers])
+    start = 0
+    while start < len(numbers):
+        before = ends[start] - sizes[numbers[start]]
+        stop = max(int(np.searchsorted(ends, before + CHUNK_PIXELS,
+                                       'right')), start + 1)
+        block = numbers[start:stop]
+        start = stop
+
+        # Along a row, the weight of each corner times the area is
+        # slope*x + offset, and is zero where the row crosses the edge.
+        counts = spans[block, 1]
+        owners = np.repeat(block, counts)
+        ys = lower[owners, 1] + _offsets(counts)
+        side_x, side_y = sides[owners].transpose(2, 1, 0)
+        start_x, start_y = starts[owners].transpose(2, 1, 0)
+        slopes = -side_y*signs[owners]
+        offsets = (side_x*(ys + 0.5 - start_y)
+                   + side_y*start_x)*signs[owners]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossings = -offsets / slopes
+        left = np.where(slopes > 0, crossings, -np.inf).max(axis=0)
+        right = np.where(slopes < 0, crossings, np.inf).min(axis=0)
+        outside = ((slopes == 0) & (offsets < 0)).any(axis=0)
+
+        first = np.maximum(np.ceil(left - 0.5), 0).astype(np.int64)
+        last = np.minimum(np.floor(right - 0.5), width - 1).astype(np.int64)
+        counts = np.where(outside, 0, np.maximum(last - first + 1, 0))
+
+        rows = np.repeat(np.arange(len(owners)), counts)
+        xs = first[rows] + _offsets(counts)
+        weights = ((slopes[:, rows]*(xs + 0.5) + offsets[:, rows])
+                   / np.abs(areas[owners[rows]]))
+        yield owners[rows], xs, ys[rows], np.maximum(weights, 0)
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    """ Return the positions 0 .. count - 1 within each run of counts.
+    """
+    return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+
+
+def _sample(planes: np.ndarray, us: np.ndarray, vs: np.ndarray
+            ) -> np.ndarray:
+    """ Return the (3, K) colors of the (3, width, height) planes at
+    the texels nearest the texture coordinates us and vs, which are
+    clamped to the edges.
+    """
+    width, height = planes.shape[1:]
+    xs = np.clip((us*width).astype(np.int64), 0, width - 1)
+    ys = np.clip((vs*height).astype(np.int64), 0, height - 1)
+    return planes[:, xs, ys]
 
 
 class PixelGridWidget(Widget, PixelGrid):
@@ -122,11 +429,46 @@ class PixelGridWidget(Widget, PixelGrid):
             print(f'{pixel} ({x}, {y})')
 
 
+class PixelCamera(CameraLogic):
+    """ A camera drawing into the back buffer of a ``PixelGrid``, with
+    all the triangles of a mesh rasterized together.
+    """
+
+    def __init__(self, grid: PixelGrid, position=(0, 0, 0),
+                 heading=(0, 0, 0), meshes=(), fov=100):
+        width, height = grid.pixels.shape[2:]
+        super().__init__(position, heading, meshes, fov, width, height)
+        self.grid = grid
+        self.x = self.y = 0
+        self._color = (255, 255, 255)
+
+    def draw_frame(self) -> None:
+        """ Draw every mesh into the back buffer and show it.
+        """
+        self.grid.clear()
+        self.draw_meshes()
+        self.grid.flip()
+
+    def draw_mesh(self, mesh, model_view=None, points=None):
+        self._color = tuple(255*channel for channel in mesh.color[:3])
+        super().draw_mesh(mesh, model_view, points)
+
+    def draw_triangles(self, screen_points, triangles, shades=None, *,
+                       depths=None):
+        self.grid.draw_triangles(screen_points, triangles, shades,
+                                 color=self._color, depths=depths)
+
+    def draw_textured_triangles(self, screen_points, depths, triangles,
+                                uvs, texture, shades=None):
+        self.grid.draw_triangles(screen_points, triangles, shades,
+                                 depths=depths, uvs=uvs, texture=texture)
+
+
 def main():
     # p = PixelGrid()
     # p.apply_to_pixels(p.red, lambda x, y: x^y)
     # p.apply_to_pixels(p.green, lambda x, y: (x+y)/2)
-    PixelGrid.from_bitmap('data/textures/Watermelon.256.bmp')
+    Texture.from_bitmap('data/textures/Watermelon.256.bmp')
     # PixelGridApp().run()
 
 if __name__ == '__main__':
@@ -1,33 +1,306 @@
-import itertools
+"""
+Contains the Scene class, a set of meshes packed into shared buffers.
+"""
+
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from collections.abc import MutableSet
+
 import numpy as np
-from enum import Enum
 
-import shapes
-from common import special_string
+import transforms
+from bvh import BVH, TriangleBVH, ray_box_distances, transform_boxes
+from common import represent
+from lod import LevelsOfDetail
+from octree import LooseOctree
+
+
+# Default direction of the light shining on scenes, in world space.
+LIGHT_DIRECTION = (0.3, -0.6, 1.0)
+# Default fraction of full brightness for faces turned from the light.
+AMBIENT = 0.3
 
 
 class Node(object):
-    def __init__(self):
-        self.children = set()
+    """ A node of a scene graph, with an optional mesh.
+
+    Each node has a transform relative to its parent and caches its
+    world matrix.  Changing a transform marks the node and all of its
+    descendants dirty, and world matrices are only recomputed when
+    read, so moving a parent costs a single matrix update.
+    """
+
+    def __init__(self, mesh=None, position=(0, 0, 0), rotation=(0, 0, 0),
+                 *, parent: Optional['Node'] = None,
+                 name: Optional[str] = None):
+        self.children = []
+        self.parent = None
+        self.mesh = mesh
+        self.name = name
+
+        self._local = transforms.model_matrix(
+            position, transforms.quaternion_from_euler(*rotation))
+        self._world = np.identity(4)
+        self._dirty = True
+
+        if parent is not None:
+            parent.add(self)
+
+    def __repr__(self) -> str:
+        return represent(self, self.mesh, tuple(self._local[:3, 3].tolist()))
+
+    def __iter__(self) -> iter:
+        """ Yield self and every descendant, parents before children.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    @property
+    def local_matrix(self) -> np.ndarray:
+        """ The 4x4 matrix from node space to parent space.
+        """
+        return self._local.copy()
+
+    @local_matrix.setter
+    def local_matrix(self, matrix) -> None:
+        self._local = np.array(matrix, dtype=float)
+        self.invalidate()
+
+    @property
+    def world_matrix(self) -> np.ndarray:
+        """ The 4x4 matrix from node space to world space.
+        """
+        if self._dirty:
+            if self.parent is None:
+                self._world = self._local.copy()
+            else:
+                self._world = self.parent.world_matrix @ self._local
+            self._dirty = False
+        return self._world
+
+    def add(self, child: 'Node') -> None:
+        """ Make child a child of self, removing it from any previous
+        parent.
+        """
+        if child.parent is not None:
+            child.parent.remove(child)
+        self.children.append(child)
+        child.parent = self
+        child.invalidate()
+
+    def remove(self, child: 'Node') -> None:
+        """ Detach child from self.
+        """
+        self.children.remove(child)
+        child.parent = None
+        child.invalidate()
+
+    def set_transform(self, position,
+                      orientation=transforms.IDENTITY_QUATERNION) -> None:
+        """ Set the transform relative to the parent from a position and
+        a ``(w, x, y, z)`` orientation quaternion.
+        """
+        self._local = transforms.model_matrix(position, orientation)
+        self.invalidate()
+
+    def move_by(self, x: float, y: float, z: float) -> None:
+        """ Move self, and so every descendant, by x, y, and z.
+        """
+        self._local[:3, 3] += (x, y, z)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """ Mark the world matrices of self and every descendant as out
+        of date.  Subtrees that are already dirty are not revisited.
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node is self or not node._dirty:
+                node._dirty = True
+                stack.extend(node.children)
+
+    def world_matrices(self) -> Tuple[List['Node'], np.ndarray]:
+        """ Return self and its descendants (parents before children)
+        with their (K, 4, 4) world matrices, computed a tree level at a
+        time.  The cached world matrix of every node is updated.
+        """
+        nodes = [self]
+        parents = [-1]
+        depths = [0]
+        for index, node in enumerate(nodes):
+            for child in node.children:
+                nodes.append(child)
+                parents.append(index)
+                depths.append(depths[index] + 1)
+
+        parents = np.array(parents)
+        depths = np.array(depths)
+        local = np.array([node._local for node in nodes])
+
+        matrices = np.empty_like(local)
+        if self.parent is None:
+            matrices[0] = local[0]
+        else:
+            matrices[0] = self.parent.world_matrix @ local[0]
+
+        # Nodes are in breadth-first order, so each level is contiguous.
+        starts = np.searchsorted(depths, np.arange(1, depths[-1] + 2))
+        for start, end in zip(starts[:-1], starts[1:]):
+            matrices[start:end] = (matrices[parents[start:end]] @
+                                   local[start:end])
+
+        for node, matrix in zip(nodes, matrices):
+            node._world = matrix
+            node._dirty = False
+
+        return nodes, matrices
+
+
+class MeshRange(NamedTuple):
+    """ The rows of the scene buffers holding a single mesh.
+    """
+    vertex_start: int
+    vertex_count: int
+    triangle_start: int
+    triangle_count: int
+
+
+class Pick(NamedTuple):
+    """ The result of casting a ray into a scene.
+    """
+    mesh: object
+    triangle: int
+    point: np.ndarray
+    distance: float
+
 
+class PackedMeshes(NamedTuple):
+    """ The points and triangles of meshes packed into blocks laid out
+    like the scene buffers, with ranges relative to the blocks.
+    """
+    meshes: List
+    vertices: np.ndarray
+    triangles: np.ndarray
+    ranges: List[MeshRange]
+    bounds: List[np.ndarray]
 
-class Scene(object):
 
-    def __init__(self, *meshes):
-        chain = itertools.chain.from_iterable
+def pack_meshes(meshes: Iterable) -> PackedMeshes:
+    """ Pack the points and triangles of meshes, leaving out instances
+    of shared geometry.  This can run on a worker thread, so that
+    ``Scene.attach_tree`` only copies a block of each buffer.
+    """
+    meshes = [mesh for mesh in meshes
+              if getattr(mesh, 'geometry', None) is None]
+    vertices = [np.asarray(mesh.vertices) for mesh in meshes]
+    triangles = [np.asarray(mesh.indices) for mesh in meshes]
 
-        points = list(chain(mesh.points for mesh in meshes))
-        self.static_points = np.array(points, dtype=np.float)
+    vertex_starts = np.cumsum([0] + [len(block) for block in vertices])
+    triangle_starts = np.cumsum([0] + [len(block) for block in triangles])
+    ranges = [MeshRange(int(vertex_start), len(mesh_vertices),
+                        int(triangle_start), len(mesh_triangles))
+              for vertex_start, mesh_vertices, triangle_start, mesh_triangles
+              in zip(vertex_starts, vertices, triangle_starts, triangles)]
 
-        triangles = list(chain(mesh.triangles for mesh in meshes))
-        self.triangles = np.array(triangles, dtype=np.uint16)
+    packed_vertices = np.empty((vertex_starts[-1], 3), dtype=np.float32)
+    packed_triangles = np.empty((triangle_starts[-1], 3), dtype=np.uint32)
+    for mesh_range, mesh_vertices, mesh_triangles in zip(
+            ranges, vertices, triangles):
+        start, count = mesh_range.vertex_start, mesh_range.vertex_count
+        packed_vertices[start:start + count] = mesh_vertices
+        start, count = mesh_range.triangle_start, mesh_range.triangle_count
+        packed_triangles[start:start + count] = mesh_triangles
+
+    return PackedMeshes(meshes, packed_vertices, packed_triangles, ranges,
+                        [_bounds(block) for block in vertices])
+
+
+class Scene(MutableSet):
+    """ A set of meshes whose points and triangles are packed into a
+    float32 vertex buffer and a uint32 index buffer.
+
+    Buffers double in capacity when full, so adding a mesh is O(1)
+    amortized in the number of meshes already present.  Removing a
+    mesh only drops its range; the space is reclaimed by compacting
+    the buffers the next time they are needed.
+
+    Triangles are stored with indices relative to the first vertex of
+    their mesh, so a mesh range can be drawn with its own transform.
+
+    Meshes added with ``attach`` are also placed in the scene graph
+    under ``root``, and are positioned relative to their node.
+
+    Rays are cast with ``pick``, through a hierarchy over the world
+    bounds of the meshes and a hierarchy over the triangles of each
+    mesh, built on first use.
+
+    Static meshes (those with a true ``static`` attribute, that are not
+    attached to the scene graph) are indexed by world bounds in
+    ``octree``, so ``visible`` only visits the cells in view.  Call
+    ``relocate`` after moving a static mesh.  Other meshes are dynamic,
+    and are culled by their current world bounds, found together.
+
+    Simplified versions of a mesh made by ``add_detail_levels`` are
+    kept in ``detail_levels`` and drawn through ``buffers``.
+
+    Meshes with the same ``geometry`` attribute (instances of a shared
+    geometry) share a single range of the buffers, copied once.
+
+    Meshes with ``register_body`` and ``release_body`` methods (physics
+    bodies) are only simulated while they are in the scene.
+
+    Meshes are lit by a single directional light along
+    ``light_direction`` with an ``ambient`` floor, using face normals
+    in mesh space from ``face_normals``, computed once per range.
+    """
+
+    def __init__(self, meshes: Iterable = (), vertex_capacity: int = 256,
+                 triangle_capacity: int = 256):
+        self._vertices = np.empty((vertex_capacity, 3), dtype=np.float32)
+        self._triangles = np.empty((triangle_capacity, 3), dtype=np.uint32)
+
+        self.ranges = {}
+        self.bounds = {}
+        self.detail_levels = {}
+        self.root = Node()
+        self.nodes = {}
+
+        self.light_direction = np.array(LIGHT_DIRECTION) / np.linalg.norm(
+            LIGHT_DIRECTION)
+        self.ambient = AMBIENT
+
+        self.octree = LooseOctree()
+        self._dynamic = set()
+        # The meshes in the scene drawing each shared geometry.
+        self._instances = {}
+
+        self._triangle_bvhs = {}
+        # Face normals by detail level, of each geometry or mesh.
+        self._face_normals = {}
+        self._mesh_bvh = None
+        self._mesh_bvh_meshes = None
+        self._vertex_end = 0
+        self._triangle_end = 0
+
+        # Vertices and triangles left behind by removed meshes.
+        self._dead_vertices = 0
+        self._dead_triangles = 0
+
+        self.update(meshes)
+
+    def __repr__(self) -> str:
+        return represent(self, list(self))
 
     def __str__(self):
-        start = f'<{self.__class__.__name__} static_points=['
+        start = f'<{self.__class__.__name__} vertices=['
         offset = len(start)
 
         point_strings = (np.array_str(point, precision=3, suppress_small=True)
-                         for point in self.static_points)
+                         for point in self.vertices)
         points = pretty_string(point_strings, offset)
 
         triangle_strings = (f'({i1},{i2},{i3})'
@@ -36,8 +309,489 @@ class Scene(object):
 
         return f'{start}{points}]\n{"triangles=[":>{offset}}{triangles}]>'
 
-    def add_static_point(self, x, y, z):
-        self.static_points = np.concatenate((self.static_points, [[x, y, z]]))
+    def __contains__(self, mesh) -> bool:
+        return mesh in self.ranges
+
+    def __iter__(self) -> iter:
+        return iter(self.ranges)
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """ The packed (N, 3) vertices of every mesh, in mesh space.
+        """
+        self.compact()
+        return self._vertices[:self._vertex_end]
+
+    @property
+    def triangles(self) -> np.ndarray:
+        """ The packed (M, 3) triangles of every mesh, indexing
+        ``vertices``.
+        """
+        self.compact()
+        ranges = sorted(set(self.ranges.values()))
+        offsets = np.repeat(
+            np.array([mesh_range.vertex_start for mesh_range in ranges],
+                     dtype=np.uint32),
+            [mesh_range.triangle_count for mesh_range in ranges])
+
+        return self._triangles[:self._triangle_end] + offsets[:, None]
+
+    def add(self, mesh) -> None:
+        """ Copy the points and triangles of mesh into the buffers,
+        unless they are shared with an instance already present.
+        """
+        if mesh in self.ranges:
+            return
+
+        geometry = getattr(mesh, 'geometry', None)
+        instances = self._instances.get(geometry)
+        if instances:
+            # Share the range and bounds of another instance.
+            instance = next(iter(instances))
+            self.ranges[mesh] = self.ranges[instance]
+            self.bounds[mesh] = self.bounds[instance]
+        else:
+            self._copy(mesh)
+        self._added(mesh)
+
+    def discard(self, mesh) -> None:
+        """ Remove mesh if present, leaving its space to be reclaimed.
+        """
+        mesh_range = self.ranges.pop(mesh, None)
+        if mesh_range is not None:
+            geometry = getattr(mesh, 'geometry', None)
+            instances = self._instances.get(geometry, set())
+            instances.discard(mesh)
+            if not instances:
+                self._instances.pop(geometry, None)
+                self._dead_vertices += mesh_range.vertex_count
+                self._dead_triangles += mesh_range.triangle_count
+                self._triangle_bvhs.pop(self._geometry(mesh), None)
+                self._face_normals.pop(self._geometry(mesh), None)
+            self._face_normals.pop(mesh, None)
+            del self.bounds[mesh]
+            self.detail_levels.pop(mesh, None)
+            self.octree.discard(mesh)
+            self._dynamic.discard(mesh)
+            _call(mesh, 'release_body')
+
+        # Keep the node, as other nodes may be positioned relative to it.
+        node = self.nodes.pop(mesh, None)
+        if node is not None:
+            node.mesh = None
+
+    def update(self, *iterables: Iterable) -> None:
+        """ Add every mesh in iterables.
+        """
+        for iterable in iterables:
+            for mesh in iterable:
+                self.add(mesh)
+
+    def clear(self) -> None:
+        """ Remove every mesh.
+        """
+        for mesh in self.ranges:
+            _call(mesh, 'release_body')
+        self.ranges.clear()
+        self.bounds.clear()
+        self.detail_levels.clear()
+        self.root = Node()
+        self.nodes.clear()
+        self._triangle_bvhs.clear()
+        self._face_normals.clear()
+        self.octree.clear()
+        self._dynamic.clear()
+        self._instances.clear()
+        self._vertex_end = self._triangle_end = 0
+        self._dead_vertices = self._dead_triangles = 0
+
+    def attach(self, mesh, position=(0, 0, 0), rotation=(0, 0, 0), *,
+               parent: Optional[Node] = None) -> Node:
+        """ Add mesh in a new scene graph node under parent (by default
+        ``root``) and return the node.
+        """
+        self.add(mesh)
+        node = self.nodes[mesh] = Node(mesh, position, rotation,
+                                       parent=parent or self.root)
+
+        # Nodes can move at any time, so attached meshes are dynamic.
+        self.octree.discard(mesh)
+        self._dynamic.add(mesh)
+        return node
+
+    def attach_tree(self, node: Node, parent: Optional[Node] = None,
+                    packed: Optional[PackedMeshes] = None) -> None:
+        """ Place node under parent (by default ``root``) and add the
+        meshes of node and its descendants, as loaded from a file.  The
+        meshes in packed, from ``pack_meshes``, are copied as a block.
+        """
+        (parent or self.root).add(node)
+        if packed is not None:
+            self._copy_packed(packed)
+        for descendant in node:
+            mesh = descendant.mesh
+            if mesh is not None:
+                self.add(mesh)
+                self.nodes[mesh] = descendant
+                self.octree.discard(mesh)
+                self._dynamic.add(mesh)
+
+    def add_detail_levels(self, mesh, *args, **keywords) -> LevelsOfDetail:
+        """ Make and keep simplified versions of mesh, passing args and
+        keywords to ``LevelsOfDetail``.
+        """
+        levels = self.detail_levels[mesh] = LevelsOfDetail(
+            *self.buffers(mesh), *args, **keywords)
+        self._face_normals.pop(mesh, None)
+        return levels
+
+    def relocate(self, mesh) -> None:
+        """ Update the world bounds of a static mesh in the octree.
+        """
+        lower, upper = transform_boxes(mesh.model_matrix()[None],
+                                       *self.bounds[mesh][:, None])
+        self.octree.insert(mesh, lower[0], upper[0])
+
+    def visible(self, planes) -> List:
+        """ Return the meshes whose world bounds are not entirely
+        outside any of the (P, 4) frustum planes.
+        """
+        dynamic = []
+        if self._dynamic:
+            meshes, matrices = self.model_matrices(self._dynamic)
+            local_bounds = np.array([self.bounds[mesh] for mesh in meshes])
+            lower, upper = transform_boxes(
+                matrices, local_bounds[:, 0], local_bounds[:, 1])
+
+            planes = np.asarray(planes, dtype=float).reshape(-1, 4)
+            normals, offsets = planes[:, :3], planes[:, 3]
+            distances = ((lower + upper) / 2) @ normals.T + offsets
+            radii = ((upper - lower) / 2) @ np.abs(normals).T
+            # Empty meshes have NaN bounds, and are never outside.
+            outside = np.any(distances < -radii, axis=1)
+            dynamic = [mesh for mesh, out in zip(meshes, outside)
+                       if not out]
+        return dynamic + self.octree.query_frustum(planes)
+
+    def model_matrices(self, meshes: Optional[Iterable] = None
+                       ) -> Tuple[List, np.ndarray]:
+        """ Return the meshes (by default every mesh) with their
+        (K, 4, 4) matrices from mesh space to world space.
+        """
+        meshes = list(self.ranges if meshes is None else meshes)
+        matrices = transforms.model_matrix(
+            np.array([mesh.position for mesh in meshes]).reshape(-1, 3),
+            np.array([mesh.orientation for mesh in meshes]).reshape(-1, 4))
+
+        attached = [index for index, mesh in enumerate(meshes)
+                    if mesh in self.nodes]
+        if attached:
+            nodes = [self.nodes[meshes[index]] for index in attached]
+            _update_world_matrices(nodes)
+            node_matrices = np.array([node._world for node in nodes])
+            matrices[attached] = node_matrices @ matrices[attached]
+
+        return meshes, matrices
+
+    def refresh(self, mesh) -> None:
+        """ Copy the points and triangles of mesh again, after they
+        have been changed.  A triangle hierarchy built for mesh is
+        refit if its triangles are unchanged, and any detail levels are
+        made again.
+        """
+        node = self.nodes.get(mesh)
+        triangle_bvh = self._triangle_bvhs.get(self._geometry(mesh))
+        levels = self.detail_levels.get(mesh)
+        _, old_triangles = self.buffers(mesh)
+        old_triangles = old_triangles.copy()
+
+        self.discard(mesh)
+        self.add(mesh)
+
+        if node is not None:
+            node.mesh = mesh
+            self.nodes[mesh] = node
+        if levels is not None:
+            self.add_detail_levels(mesh, levels.ratios, levels.radii,
+                                   levels.hysteresis)
+
+        vertices, triangles = self.buffers(mesh)
+        if (triangle_bvh is not None
+                and np.array_equal(triangles, old_triangles)):
+            triangle_bvh.refit(vertices, triangles)
+            self._triangle_bvhs[self._geometry(mesh)] = triangle_bvh
+
+    def triangle_bvh(self, mesh) -> TriangleBVH:
+        """ Return the hierarchy over the triangles of mesh, building it
+        on first use.  Instances of a geometry share a hierarchy.
+        """
+        key = self._geometry(mesh)
+        try:
+            return self._triangle_bvhs[key]
+        except KeyError:
+            bvh = self._triangle_bvhs[key] = TriangleBVH(*self.buffers(mesh))
+            return bvh
+
+    def face_normals(self, mesh, level: int = 0) -> np.ndarray:
+        """ Return the (M, 3) unit normals in mesh space of the
+        triangles of mesh at a detail level, computing them on first
+        use.  Instances of a geometry share their normals.
+        """
+        owner = self._geometry(mesh) if not level else mesh
+        normals = self._face_normals.setdefault(owner, {})
+        try:
+            return normals[level]
+        except KeyError:
+            normals[level] = _face_normals(*self.buffers(mesh, level))
+            return normals[level]
+
+    def pick(self, origin, direction) -> Optional[Pick]:
+        """ Return the nearest mesh and triangle hit by the ray from the
+        world space origin along direction, or None.
+        """
+        origin = np.asarray(origin, dtype=float)
+        direction = np.asarray(direction, dtype=float)
+
+        meshes, matrices = self.model_matrices()
+        if not meshes:
+            return None
+
+        local_bounds = np.array([self.bounds[mesh] for mesh in meshes])
+        lower, upper = transform_boxes(
+            matrices, local_bounds[:, 0], local_bounds[:, 1])
+
+        # Mesh bounds move every frame, so the hierarchy is refit and
+        # only rebuilt when the meshes themselves change.
+        if self._mesh_bvh_meshes != meshes:
+            self._mesh_bvh = BVH(lower, upper)
+            self._mesh_bvh_meshes = meshes
+        else:
+            self._mesh_bvh.refit(lower, upper)
+
+        candidates = self._mesh_bvh.candidates(origin, direction)
+        entries, _ = ray_box_distances(
+            origin, direction, lower[candidates], upper[candidates])
+
+        nearest = None
+        for entry, index in sorted(zip(entries, candidates)):
+            if nearest is not None and entry > nearest.distance:
+                break
+
+            mesh = meshes[index]
+            inverse = np.linalg.inv(matrices[index])
+            hit = self.triangle_bvh(mesh).intersect(
+                *self.buffers(mesh), inverse[:3, :3] @ origin + inverse[:3, 3],
+                inverse[:3, :3] @ direction)
+
+            if hit is not None and (nearest is None
+                                    or hit[1] < nearest.distance):
+                triangle, distance = hit
+                nearest = Pick(mesh, triangle, origin + distance*direction,
+                               distance)
+
+        return nearest
+
+    def buffers(self, mesh, level: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """ Return views of the vertices and triangles of mesh, or of
+        its simplified version at a detail level above 0.
+        """
+        if level:
+            return self.detail_levels[mesh].levels[level - 1]
+
+        vertex_start, vertex_count, triangle_start, triangle_count = (
+            self.ranges[mesh])
+        return (self._vertices[vertex_start:vertex_start + vertex_count],
+                self._triangles[triangle_start:triangle_start +
+                                triangle_count])
+
+    def compact(self) -> None:
+        """ Move the ranges of the remaining meshes together, reclaiming
+        the space of removed meshes.
+        """
+        if not (self._dead_vertices or self._dead_triangles):
+            return
+
+        vertex_end = triangle_end = 0
+        moved = {}
+        ordered = sorted(self.ranges.items(), key=lambda item: item[1])
+        for mesh, old_range in ordered:
+            # Instances share a range, which is only moved once.
+            if old_range in moved:
+                self.ranges[mesh] = moved[old_range]
+                continue
+
+            vertex_start, vertex_count, triangle_start, triangle_count = (
+                old_range)
+            # Ranges only ever move towards the start, so each copy
+            # reads from rows that have not yet been overwritten.
+            self._vertices[vertex_end:vertex_end + vertex_count] = (
+                self._vertices[vertex_start:vertex_start + vertex_count])
+            self._triangles[triangle_end:triangle_end + triangle_count] = (
+                self._triangles[triangle_start:
+                                triangle_start + triangle_count])
+
+            self.ranges[mesh] = moved[old_range] = MeshRange(
+                vertex_end, vertex_count, triangle_end, triangle_count)
+            vertex_end += vertex_count
+            triangle_end += triangle_count
+
+        self._vertex_end = vertex_end
+        self._triangle_end = triangle_end
+        self._dead_vertices = self._dead_triangles = 0
+
+    def _copy(self, mesh) -> None:
+        """ Copy the points and triangles of mesh to the end of the
+        buffers.
+        """
+        vertices = mesh.vertices
+        triangles = mesh.indices
+        self._reserve(len(vertices), len(triangles))
+
+        vertex_start = self._vertex_end
+        triangle_start = self._triangle_end
+        self._vertex_end += len(vertices)
+        self._triangle_end += len(triangles)
+
+        self._vertices[vertex_start:self._vertex_end] = vertices
+        self._triangles[triangle_start:self._triangle_end] = triangles
+
+        self.ranges[mesh] = MeshRange(
+            vertex_start, len(vertices), triangle_start, len(triangles))
+        self.bounds[mesh] = _bounds(vertices)
+
+    def _added(self, mesh) -> None:
+        """ Index mesh, whose range and bounds have just been set.
+        """
+        geometry = getattr(mesh, 'geometry', None)
+        if geometry is not None:
+            self._instances.setdefault(geometry, set()).add(mesh)
+
+        if getattr(mesh, 'static', False) and self.ranges[mesh].vertex_count:
+            self.relocate(mesh)
+        else:
+            self._dynamic.add(mesh)
+        _call(mesh, 'register_body')
+
+    def _copy_packed(self, packed: PackedMeshes) -> None:
+        """ Copy the blocks of packed to the end of the buffers and add
+        the meshes not already present.
+        """
+        self._reserve(len(packed.vertices), len(packed.triangles))
+        vertex_start = self._vertex_end
+        triangle_start = self._triangle_end
+        self._vertex_end += len(packed.vertices)
+        self._triangle_end += len(packed.triangles)
+        self._vertices[vertex_start:self._vertex_end] = packed.vertices
+        self._triangles[triangle_start:self._triangle_end] = packed.triangles
+
+        for mesh, mesh_range, bounds in zip(packed.meshes, packed.ranges,
+                                            packed.bounds):
+            if mesh in self.ranges:
+                self._dead_vertices += mesh_range.vertex_count
+                self._dead_triangles += mesh_range.triangle_count
+                continue
+            self.ranges[mesh] = mesh_range._replace(
+                vertex_start=vertex_start + mesh_range.vertex_start,
+                triangle_start=triangle_start + mesh_range.triangle_start)
+            self.bounds[mesh] = bounds
+            self._added(mesh)
+
+    def _reserve(self, vertex_count: int, triangle_count: int) -> None:
+        """ Make room for vertex_count more vertices and triangle_count
+        more triangles, compacting before growing the buffers.
+        """
+        def fits():
+            return (self._vertex_end + vertex_count <= len(self._vertices)
+                    and self._triangle_end + triangle_count
+                        <= len(self._triangles))
+
+        if not fits():
+            self.compact()
+        if fits():
+            return
+
+        self._vertices = _grown(self._vertices, self._vertex_end,
+                                self._vertex_end + vertex_count)
+        self._triangles = _grown(self._triangles, self._triangle_end,
+                                 self._triangle_end + triangle_count)
+
+    @staticmethod
+    def _geometry(mesh):
+        """ Return the shared geometry of mesh, or mesh itself if it
+        owns its points and triangles.
+        """
+        geometry = getattr(mesh, 'geometry', None)
+        return mesh if geometry is None else geometry
+
+
+def _update_world_matrices(nodes: Iterable[Node]) -> None:
+    """ Bring the cached world matrices of nodes up to date, computing
+    each dirty subtree holding any of them in a batch.  Clean nodes are
+    not revisited.
+    """
+    # A node is only clean if its parent is, and invalidating a node
+    # dirties its subtree, so the dirty nodes with clean parents are
+    # the roots of disjoint dirty subtrees.
+    tops = {}
+    for node in nodes:
+        if node._dirty:
+            while node.parent is not None and node.parent._dirty:
+                node = node.parent
+            tops[id(node)] = node
+    for node in tops.values():
+        node.world_matrices()
+
+
+def _call(mesh, method: str) -> None:
+    """ Call the method of mesh named method, if it has one.
+    """
+    function = getattr(mesh, method, None)
+    if function is not None:
+        function()
+
+
+def _bounds(vertices: np.ndarray) -> np.ndarray:
+    """ Return the lower and upper corners of the box bounding the
+    vertices as a (2, 3) array.
+    """
+    if not len(vertices):
+        return np.array([(np.inf,)*3, (-np.inf,)*3])
+    # Reducing one column at a time is several times faster than
+    # reducing along axis 0.
+    columns = np.asarray(vertices).T
+    return np.array([[column.min() for column in columns],
+                     [column.max() for column in columns]], dtype=float)
+
+
+def _face_normals(vertices: np.ndarray, triangles: np.ndarray
+                  ) -> np.ndarray:
+    """ Return the unit normals of the triangles, facing the side the
+    corners wind anticlockwise around.  Degenerate triangles get zero.
+    """
+    corners = vertices[triangles].astype(float)
+    normals = np.cross(corners[:, 1] - corners[:, 0],
+                       corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals),
+                     where=lengths > 0)
+
+
+def _grown(array: np.ndarray, used: int, required: int) -> np.ndarray:
+    """ Return a copy of the first used rows of array, with the capacity
+    doubled until it holds at least required rows.
+    """
+    capacity = max(len(array), 1)
+    while capacity < required:
+        capacity *= 2
+    if capacity == len(array):
+        return array
+
+    grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
 
 
 def pretty_string(strings, offset=0, max_line_length=79, sep=' '):
@@ -58,9 +812,3 @@ def pretty_string(strings, offset=0, max_line_length=79, sep=' '):
         current_line.append(string)
 
     return ('\n' + margin).join(sep.join(line) for line in lines)
-
-
-s = Scene(shapes.circle(1, 3))
-print(s)
-s.add_static_point(3, -2, 0)
-print(s)
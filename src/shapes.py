@@ -1,16 +1,18 @@
 """
-Shape construction functions.  All functions should return 2 sequences
-(the first to initialize points, the second to initialize triangles).
+Shape construction functions.  All functions should return a Geometry
+(an (N, 3) float array to initialize points, and an (M, 3) integer
+array to initialize triangles).
 
 The points and triangles (shape info) returned should be treated as
 having an origin at (0, 0, 0), ideally its volumetric center.
 """
 
-from typing import Iterator, Sequence, Tuple
-Coords = Iterator[Tuple[float, float]]
+from typing import List, Optional, Tuple
 
 from collections import namedtuple
-from math import cos, pi, sin, tau
+from math import pi, sin, tau
+
+import numpy as np
 
 
 SEGMENTS_DEFAULT = 16
@@ -25,12 +27,36 @@ def register_shape(function):
 
 
 class Geometry(namedtuple('GeometryBase', 'points, triangles')):
+    """ Points as an (N, 3) float array and triangles as an (M, 3)
+    integer array of point indices.  Any array-like is converted, and
+    checked by its shape and type alone.  Float arrays, such as points
+    mapped from a file, are kept as they are.
+    """
 
     def __new__(cls, points, triangles):
-        assert all(len(point) == 3 for point in points)
-        assert all(len(triangle) == 3 for triangle in triangles)
-
-        return super().__new__(cls, tuple(points), tuple(triangles))
+        points = np.asarray(points)
+        if not np.issubdtype(points.dtype, np.floating):
+            points = points.astype(float)
+        triangles = np.asarray(triangles)
+        if not points.size:
+            points = points.reshape(0, 3)
+        if not triangles.size:
+            triangles = triangles.reshape(0, 3).astype(np.intp)
+
+        if points.ndim != 2 or points.shape[1] != 3:
+            raise ValueError(
+                f'points should have a shape of (N, 3): {points.shape}')
+        if triangles.ndim != 2 or triangles.shape[1] != 3:
+            raise ValueError(
+                f'triangles should have a shape of (M, 3): {triangles.shape}')
+        if not np.issubdtype(triangles.dtype, np.integer):
+            raise TypeError(
+                f'triangles should be integers: {triangles.dtype}')
+        if triangles.size and (triangles.min() < 0
+                               or triangles.max() >= len(points)):
+            raise ValueError('triangles should index the points.')
+
+        return super().__new__(cls, points, triangles)
 
 
 @register_shape
@@ -53,32 +79,26 @@ CUBOID = [
 def cuboid(x: float, y: float, z: float) -> Geometry:
     """ Axis-aligned cuboid.
     """
-    x /= 2
-    y /= 2
-    z /= 2
-
-    return [
-        (+x, +y, +z), (+x, +y, -z), (+x, -y, +z), (+x, -y, -z),
-        (-x, +y, +z), (-x, +y, -z), (-x, -y, +z), (-x, -y, -z),
-    ], [
-        (0, 1, 4), (0, 2, 1), (0, 4, 2), (3, 1, 2), (3, 2, 7), (3, 7, 1),
-        (5, 1, 7), (5, 4, 1), (5, 7, 4), (6, 2, 4), (6, 4, 7), (6, 7, 2),
-    ]
+    points, triangles = CUBOID
+    return Geometry(np.multiply(points, (x, y, z)), triangles)
 
 
 @register_shape
 def pyramid(base_radius: float, base_sides: int, height: float) -> Geometry:
-    """ 
+    """ Pyramid with a regular polygon base in the x-z plane and its
+    apex on the y axis.
     """
     lower = -height / 3
-    base_coords = _circle_coords(base_radius, base_sides)
+    base = _circle_coords(base_radius, base_sides)
 
-    return [
-        (0, height + lower, 0), *((x, lower, y) for x, y in base_coords)
-    ], [
-        *((index, 0, index + 1) for index in range(1, base_sides - 1))
-        # Base triangles missing
-    ]
+    points = np.empty((base_sides + 1, 3))
+    points[0] = (0, height + lower, 0)
+    points[1:] = _xz_ring(base, lower)
+
+    return Geometry(points, np.concatenate((
+        _cap(0, 1, base_sides),
+        _fan(1, base_sides)[:, ::-1],
+    )))
 
 
 @register_shape
@@ -96,23 +116,64 @@ def square_based_pyramid(base_width: float, height: float) -> Geometry:
     ])
 
 
-def _points_2d_to_3d(coords):
-    return ((x, y, 0.0) for x, y in coords)
+def _points_2d_to_3d(coords: np.ndarray) -> np.ndarray:
+    return np.column_stack((coords, np.zeros(len(coords))))
 
 
-def _polygon_coords(sides: int, side_length: float) -> Coords:
+def _xz_ring(coords: np.ndarray, y: float) -> np.ndarray:
+    """ Return (N, 3) points in the plane at height y, with the x and y
+    of coords as x and z.
+    """
+    return np.column_stack((coords[:, 0], np.full(len(coords), y),
+                            coords[:, 1]))
+
+
+def _polygon_coords(sides: int, side_length: float) -> np.ndarray:
     """ Polygon perimeter coordinates.
     """
     if sides < 2:
         raise ValueError('sides should be an integer greater than 1')
 
-    angle_offset = pi + pi / sides
-    side_length /= 2
+    radius = (side_length / 2) / sin(pi / sides)
+    angles = pi + pi / sides + np.arange(sides)*tau / sides
+    return radius*np.column_stack((np.sin(angles), np.cos(angles)))
+
+
+def _fan(start: int, count: int) -> np.ndarray:
+    """ Return the triangles joining point start to each pair of the
+    count points from start onwards.
+    """
+    index = start + np.arange(1, count - 1)
+    return np.column_stack((np.full(len(index), start), index, index + 1))
+
+
+def _cap(center: int, start: int, count: int) -> np.ndarray:
+    """ Return the triangles joining point center to each pair of the
+    closed loop of count points from start onwards.
+    """
+    loop = start + np.arange(count)
+    return np.column_stack((np.full(count, center), loop,
+                            np.roll(loop, -1)))
 
-    for side_index in range(sides):
-        angle = angle_offset + side_index*tau / sides
-        radius = side_length / sin(pi / sides)
-        yield radius*sin(angle), radius*cos(angle)
+
+def _bands(start: int, rows: int, count: int) -> np.ndarray:
+    """ Return the triangles joining each pair of consecutive closed
+    loops of count points, for rows loops stored one after another
+    from start.
+
+    Triangles face the cross product of the step between loops and the
+    step along a loop.
+    """
+    first = start + count*np.arange(rows - 1)[:, None] + np.arange(count)
+    after = start + count*np.arange(rows - 1)[:, None] + (
+        np.arange(count) + 1) % count
+    below = first + count
+    below_after = after + count
+
+    triangles = np.empty((rows - 1, count, 2, 3), dtype=np.intp)
+    triangles[..., 0, :] = np.stack((first, below, after), axis=-1)
+    triangles[..., 1, :] = np.stack((after, below, below_after), axis=-1)
+    return triangles.reshape(-1, 3)
 
 
 @register_shape
@@ -122,20 +183,19 @@ def polygon(sides: int, side_length: float) -> Geometry:
     coords = _polygon_coords(sides, side_length)
 
     return Geometry(
-        tuple(_points_2d_to_3d(coords)),
-        tuple((0, index, index + 1) for index in range(1, sides - 1))
+        _points_2d_to_3d(coords),
+        _fan(0, sides)
     )
 
 
-def _circle_coords(radius: float, sides: int) -> Coords:
+def _circle_coords(radius: float, sides: int) -> np.ndarray:
     """ Circle perimeter coordinates.
     """
     if sides < 2:
         raise ValueError('sides should be an integer over 1')
 
-    for side_index in range(sides):
-        angle = side_index*tau / sides
-        yield radius*sin(angle), radius*cos(angle)
+    angles = np.arange(sides)*tau / sides
+    return radius*np.column_stack((np.sin(angles), np.cos(angles)))
 
 
 @register_shape
@@ -145,8 +205,8 @@ def circle(radius: float, sides: int = 16) -> Geometry:
     coords = _circle_coords(radius, sides)
 
     return Geometry(
-        tuple(_points_2d_to_3d(coords)),
-        tuple((0, index, index + 1) for index in range(1, sides - 1))
+        _points_2d_to_3d(coords),
+        _fan(0, sides)
     )
 
 
@@ -158,23 +218,55 @@ def centered_circle(radius: float, sides: int = 16) -> Geometry:
     coords = _circle_coords(radius, sides)
 
     return Geometry(
-        [(0.0, 0.0, 0.0)] + [(x, y, 0.0) for x, y in coords],
-        [(0, index, index + 1) for index in range(1, sides)] + [(0, sides, 1)]
+        np.concatenate(([(0.0, 0.0, 0.0)], _points_2d_to_3d(coords))),
+        _cap(0, 1, sides)
     )
 
 
 @register_shape
-def cylinder(radius: float, length: float, segments: int = 16):
-    """ 
+def cylinder(radius: float, length: float,
+             segments: int = SEGMENTS_DEFAULT) -> Geometry:
+    """ Cylinder along the y axis, closed at both ends.
     """
     length /= 2
-    tuple(_circle_coords(radius, segments))
+    coords = _circle_coords(radius, segments)
+
+    # Top loop, bottom loop, then the centers of the two ends.
+    points = np.empty((2*segments + 2, 3))
+    points[:segments] = _xz_ring(coords, length)
+    points[segments:2*segments] = _xz_ring(coords, -length)
+    points[-2:] = (0, length, 0), (0, -length, 0)
+
+    return Geometry(points, np.concatenate((
+        _bands(0, 2, segments),
+        _cap(2*segments, 0, segments),
+        _cap(2*segments + 1, segments, segments)[:, ::-1],
+    )))
 
 
 @register_shape
-def ring(radius, width, thickness=0, segments: int = 16) -> Geometry:
-    """ 
+def ring(radius: float, width: float, thickness: float = 0,
+         segments: int = SEGMENTS_DEFAULT) -> Geometry:
+    """ x-y aligned ring with an outer radius of radius, as a flat band
+    of width or, with a thickness, a solid of that depth along z.
     """
+    outer = _points_2d_to_3d(_circle_coords(radius, segments))
+    inner = _points_2d_to_3d(_circle_coords(radius - width, segments))
+
+    if not thickness:
+        return Geometry(np.concatenate((inner, outer)),
+                        _bands(0, 2, segments))
+
+    front, back = (0, 0, -thickness / 2), (0, 0, thickness / 2)
+    # Loops of the front face, outer wall, back face and inner wall.
+    points = np.concatenate((inner + front, outer + front,
+                             outer + back, inner + back))
+    # The inner wall joins the last loop back to the first.
+    inner_wall = _bands(0, 2, segments)
+    inner_wall = np.where(inner_wall < segments, inner_wall + 3*segments,
+                          inner_wall - segments)
+    return Geometry(points,
+                    np.concatenate((_bands(0, 4, segments), inner_wall)))
 
 
 @register_shape
@@ -185,9 +277,167 @@ def sphere(radius, segments: int = 16) -> Geometry:
 
 
 @register_shape
-def spheroid(x, y, z, segments: int = 16) -> Geometry:
-    """ Axis-aligned spheroid.
+def spheroid(x, y, z, segments: int = SEGMENTS_DEFAULT) -> Geometry:
+    """ Axis-aligned spheroid, with segments around the y axis and half
+    as many from pole to pole.
+    """
+    rings = max(segments // 2, 2)
+    polar = np.arange(1, rings)*pi / rings
+    azimuth = np.arange(segments)*tau / segments
+
+    # The top pole, the loops from top to bottom, then the bottom pole.
+    points = np.empty((2 + (rings - 1)*segments, 3))
+    points[0] = (0, y, 0)
+    points[-1] = (0, -y, 0)
+    loops = points[1:-1].reshape(rings - 1, segments, 3)
+    loops[..., 0] = x*np.outer(np.sin(polar), np.sin(azimuth))
+    loops[..., 1] = y*np.cos(polar)[:, None]
+    loops[..., 2] = z*np.outer(np.sin(polar), np.cos(azimuth))
+
+    bottom = len(points) - 1
+    return Geometry(points, np.concatenate((
+        _cap(0, 1, segments),
+        _bands(1, rings - 1, segments),
+        _cap(bottom, bottom - segments, segments)[:, ::-1],
+    )))
+
+
+def _height_plane(image) -> np.ndarray:
+    """ Return the heights of image from 0 to 1 as a float32 array
+    indexed by row and column.
+
+    Integer images are scaled by the largest value of their type, and
+    color channels are averaged.  A ``pixels.Texture`` or
+    ``pixels.PixelGrid`` (indexed by x and y) is read from its current
+    red, green and blue planes.
+    """
+    if hasattr(image, 'planes'):
+        image = image.planes.transpose(2, 1, 0)
+
+    image = np.asarray(image)
+    scale = (np.iinfo(image.dtype).max
+             if np.issubdtype(image.dtype, np.integer) else 1)
+    if image.ndim == 3:
+        # Alpha channels are ignored.
+        image = image[..., :3].mean(axis=-1, dtype=np.float32)
+    if image.ndim != 2 or min(image.shape) < 2:
+        raise ValueError(
+            f'image should be at least 2 by 2 pixels: {image.shape}')
+    return image.astype(np.float32) / np.float32(scale)
+
+
+def _flat_blocks(heights: np.ndarray, max_error: float) -> List[Tuple]:
+    """ Return the rows, columns and size of the largest square blocks
+    of grid cells, from coarsest to finest, that cover the grid and
+    are within max_error of the two triangles of their corners.
+
+    Block sizes are powers of two, forming a quadtree.
+    """
+    cells = np.array(heights.shape) - 1
+    sizes = [1]
+    while 2*sizes[-1] <= cells.min():
+        sizes.append(2*sizes[-1])
+
+    blocks = []
+    covered = None
+    for size in reversed(sizes):
+        counts = cells // size
+        if size == 1:
+            flat = np.ones(counts, dtype=bool)
+        else:
+            # Overlapping views of every block, corners included.
+            windows = np.lib.stride_tricks.sliding_window_view(
+                heights, (size + 1, size + 1))[::size, ::size]
+            windows = windows[:counts[0], :counts[1]]
+            corners = windows[..., ::size, ::size, None, None]
+            first, after = corners[..., 0, 0, :, :], corners[..., 0, 1, :, :]
+            below, last = corners[..., 1, 0, :, :], corners[..., 1, 1, :, :]
+            steps = np.linspace(0, 1, size + 1, dtype=np.float32)
+            u, v = steps[None, :], steps[:, None]
+
+            # Each block is drawn as the triangles either side of the
+            # diagonal from its first corner to its last.
+            planes = np.where(u >= v,
+                              first + u*(after - first) + v*(last - after),
+                              first + v*(below - first) + u*(last - below))
+            flat = (np.abs(windows - planes).max(axis=(-2, -1))
+                    <= max_error)
+
+        if covered is not None:
+            # Children of chosen or covered blocks are covered.
+            parents = np.repeat(np.repeat(covered, 2, axis=0), 2, axis=1)
+            covered = np.zeros(counts, dtype=bool)
+            covered[:parents.shape[0], :parents.shape[1]] = parents
+            flat &= ~covered
+        else:
+            covered = np.zeros(counts, dtype=bool)
+
+        rows, columns = np.nonzero(flat)
+        blocks.append((rows*size, columns*size, size))
+        covered |= flat
+
+    return blocks
+
+
+@register_shape
+def heightmap(image, width: float = 1.0, depth: float = 1.0,
+              height: float = 1.0, max_error: Optional[float] = None
+              ) -> Geometry:
+    """ Grid in the x-z plane with the heights of a grayscale image (an
+    array indexed by row and column, or a ``pixels.Texture`` or
+    ``pixels.PixelGrid``) along y, from 0 to height.
+
+    With a max_error, square regions whose points are all within
+    max_error of a pair of triangles are merged into them.  The points
+    of finer regions along the edge of a coarser one are moved onto
+    that edge, so no cracks open between them.
     """
+    heights = _height_plane(image)*np.float32(height)
+    rows, columns = heights.shape
+
+    if max_error is None:
+        blocks = [np.divmod(np.arange((rows - 1)*(columns - 1)),
+                            columns - 1) + (1,)]
+    else:
+        blocks = _flat_blocks(heights, max_error)
+        heights = heights.copy()
+
+    triangles = []
+    for block_rows, block_columns, size in blocks:
+        first = block_rows*columns + block_columns
+        last = first + size*columns + size
+        after = first + size
+        below = first + size*columns
+        triangles.append(np.column_stack((first, last, after)))
+        triangles.append(np.column_stack((first, below, last)))
+
+        if max_error is not None and size > 1:
+            # Move the points along each block edge onto the edge.
+            steps = np.arange(size + 1)
+            flat_heights = heights.reshape(-1)
+            for start, end, stride in ((first, after, 1),
+                                       (below, last, 1),
+                                       (first, below, columns),
+                                       (after, last, columns)):
+                points = start[:, None] + stride*steps
+                flat_heights[points] = (
+                    flat_heights[start][:, None]*(1 - steps / size)
+                    + flat_heights[end][:, None]*(steps / size))
+
+    triangles = np.concatenate(triangles).astype(np.uint32)
+
+    # Only keep the points used by the merged triangles.
+    used = np.zeros(rows*columns, dtype=bool)
+    used[triangles.ravel()] = True
+    indices = np.flatnonzero(used)
+    renumbered = np.cumsum(used, dtype=np.uint32) - 1
+    z, x = np.divmod(indices, columns)
+
+    points = np.empty((len(indices), 3))
+    points[:, 0] = (x / (columns - 1) - 0.5)*width
+    points[:, 1] = heights.reshape(-1)[indices]
+    points[:, 2] = (z / (rows - 1) - 0.5)*depth
+    return Geometry(points, renumbered[triangles])
 
 
 if __name__ == '__main__':
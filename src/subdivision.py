@@ -0,0 +1,111 @@
+"""
+Loop subdivision of triangle meshes.
+
+Each level splits every triangle into four through new points on its
+edges, and moves the old points towards their neighbours, so meshes
+approach a smooth surface.  All points of a level are computed at once
+by gathering across the half-edge adjacency and summing with
+``np.bincount``.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from halfedge import HalfEdges
+
+
+def loop(points, triangles, levels: int = 1,
+         half_edges: Optional[HalfEdges] = None
+         ) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return the points and triangles after levels of Loop
+    subdivision.  half_edges may be given for the first level if they
+    are already built.
+
+    Open boundaries are kept as curves, using the boundary rules.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    triangles = np.asarray(triangles).reshape(-1, 3).astype(np.uint32)
+
+    for _ in range(levels):
+        if half_edges is None:
+            half_edges = HalfEdges(triangles, len(points))
+        points, triangles = _subdivide(points, half_edges)
+        half_edges = None
+
+    return points, triangles
+
+
+def _subdivide(points: np.ndarray, half_edges: HalfEdges
+               ) -> Tuple[np.ndarray, np.ndarray]:
+    """ Return the points and triangles after one level of Loop
+    subdivision.
+    """
+    twin = half_edges.twin
+    starts = half_edges.vertices
+    ends = half_edges.destinations
+    opposite = half_edges.vertices[half_edges.previous]
+    has_twin = twin >= 0
+
+    # Number the edges, giving twins the number of their partner.
+    edges = half_edges.edges
+    edge_numbers = np.empty(len(half_edges), dtype=np.intp)
+    edge_numbers[edges] = np.arange(len(edges))
+    paired = edges[has_twin[edges]]
+    edge_numbers[twin[paired]] = edge_numbers[paired]
+
+    # New points on edges weigh the ends by 3/8 and the opposite
+    # corners by 1/8, or sit at the midpoint of boundary edges.
+    edge_points = (points[starts[edges]] + points[ends[edges]]) / 2
+    interior = has_twin[edges]
+    edge_points[interior] = (
+        3 / 8*(points[starts[edges[interior]]]
+               + points[ends[edges[interior]]])
+        + 1 / 8*(points[opposite[edges[interior]]]
+                 + points[opposite[twin[edges[interior]]]]))
+
+    # Old points move by the weights of Loop's original scheme.
+    count = len(points)
+    valences = np.bincount(starts, minlength=count)
+    neighbour_sums = _sum_rows(starts, points[ends], count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        betas = (5 / 8 - (3 / 8 + np.cos(2*np.pi / valences) / 4)**2
+                 ) / valences
+    moved = ((1 - valences*betas)[:, None]*points
+             + betas[:, None]*neighbour_sums)
+
+    # Boundary points only follow their two boundary neighbours.
+    boundary = np.flatnonzero(~has_twin)
+    boundary_counts = np.bincount(
+        np.concatenate((starts[boundary], ends[boundary])), minlength=count)
+    boundary_sums = (_sum_rows(starts[boundary], points[ends[boundary]],
+                               count)
+                     + _sum_rows(ends[boundary], points[starts[boundary]],
+                                 count))
+    curve = boundary_counts == 2
+    moved[curve] = 3 / 4*points[curve] + boundary_sums[curve] / 8
+
+    # Points without faces, or on more than one boundary, stay put.
+    fixed = (valences == 0) | (boundary_counts > 2) | (boundary_counts == 1)
+    moved[fixed] = points[fixed]
+
+    corners = starts.reshape(-1, 3)
+    middles = count + edge_numbers.reshape(-1, 3)
+    triangles = np.stack((
+        np.column_stack((corners[:, 0], middles[:, 0], middles[:, 2])),
+        np.column_stack((corners[:, 1], middles[:, 1], middles[:, 0])),
+        np.column_stack((corners[:, 2], middles[:, 2], middles[:, 1])),
+        middles,
+    ), axis=1).reshape(-1, 3)
+
+    return (np.concatenate((moved, edge_points)),
+            triangles.astype(np.uint32))
+
+
+def _sum_rows(indices: np.ndarray, rows: np.ndarray,
+              count: int) -> np.ndarray:
+    """ Return the (count, 3) sums of the (K, 3) rows at each index.
+    """
+    return np.column_stack([
+        np.bincount(indices, weights=rows[:, axis], minlength=count)
+        for axis in range(3)]).reshape(-1, 3)
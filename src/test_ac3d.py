@@ -0,0 +1,157 @@
+from io import StringIO
+
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from formats import ac3d, bulk
+from geometry import Mesh
+from scene import Node
+
+
+SOURCE = '''AC3Db
+MATERIAL "red" rgb 1 0 0  amb 0.2 0.2 0.2  emis 0 0 0  shi 0  trans 0.25
+OBJECT world
+kids 1
+OBJECT poly
+name "square"
+data 9
+some
+data
+texture "square.png"
+loc 1 2 3
+rot 0 1 0  -1 0 0  0 0 1
+numvert 5
+0 0 0
+1 0 0
+1 1 0
+0 1 0
+0.5 2 0
+numsurf 3
+SURF 0x10
+mat 0
+refs 4
+0 0 0
+1 1 0
+2 1 1
+3 0 1
+SURF 0x12
+refs 2
+2 0 0
+4 0 0
+SURF 0x10
+refs 3
+3 0 0
+2 0 0
+4 0 0
+kids 1
+OBJECT group
+kids 0
+'''
+
+
+class TestRead:
+
+    def setup_method(self):
+        self.root = ac3d.read(StringIO(SOURCE))
+        self.world, = self.root.children
+        self.square, = self.world.children
+
+    def test_hierarchy(self):
+        assert self.world.mesh is None
+        assert self.square.name == 'square'
+        group, = self.square.children
+        assert group.mesh is None and not group.children
+
+    def test_polygons_triangulated(self):
+        mesh = self.square.mesh
+        assert mesh.points.shape == (5, 3)
+        # The line surface is skipped.
+        assert mesh.triangles.tolist() == [[0, 1, 2], [0, 2, 3], [3, 2, 4]]
+        assert np.allclose(tuple(mesh.color), (1, 0, 0, 0.75))
+
+    def test_transform(self):
+        matrix = self.square.world_matrix
+        assert np.allclose(matrix[:3, 3], (1, 2, 3))
+        assert np.allclose(matrix[:3, :3] @ (1, 0, 0), (0, 1, 0))
+
+    def test_load(self, tmp_path):
+        path = tmp_path / 'square.ac'
+        path.write_text(SOURCE)
+        root = ac3d.load(str(path))
+        assert root.children[0].children[0].mesh.triangles.shape == (3, 3)
+
+    def test_errors(self):
+        with raises(SyntaxError):
+            ac3d.read(StringIO('OBJ\n'))
+        with raises(SyntaxError):
+            ac3d.read(StringIO(SOURCE.replace('0.5 2 0', '0.5 2')))
+        with raises(SyntaxError):
+            ac3d.read(StringIO(SOURCE.replace('4 0 0', '7 0 0')))
+        with raises(SyntaxError):
+            ac3d.read(StringIO(SOURCE.replace('kids 0\n', '')))
+
+
+class TestWrite:
+
+    def test_round_trip(self):
+        root = ac3d.read(StringIO(SOURCE))
+        stream = StringIO()
+        ac3d.write(stream, root)
+        stream.seek(0)
+        copy = ac3d.read(stream)
+
+        for node, copied in zip(root, copy):
+            assert node.name == copied.name
+            assert np.allclose(node.world_matrix, copied.world_matrix)
+            if node.mesh is None:
+                assert copied.mesh is None
+            else:
+                assert np.allclose(node.mesh.points, copied.mesh.points)
+                assert np.array_equal(node.mesh.triangles,
+                                      copied.mesh.triangles)
+                assert np.allclose(tuple(node.mesh.color),
+                                   tuple(copied.mesh.color))
+
+    def test_meshes_placed(self, tmp_path):
+        sphere = Mesh(shapes.sphere(1, 8), (1, 2, 3), (0.5, 0, 0))
+        cube = Mesh(shapes.cube(2), (0, 0, 0), color=sphere.color)
+        path = str(tmp_path / 'meshes.ac')
+        ac3d.save(path, [sphere, cube])
+
+        with open(path) as file:
+            assert file.read().count('MATERIAL') == 1
+
+        world, = ac3d.load(path).children
+        for mesh, node in zip((sphere, cube), world.children):
+            assert np.allclose(mesh.world_vertices(),
+                               node.mesh.points @ node.world_matrix[:3, :3].T
+                               + node.world_matrix[:3, 3], atol=1e-6)
+            assert np.array_equal(mesh.triangles, node.mesh.triangles)
+
+    def test_single_world_object(self):
+        root = Node()
+        for x in range(2):
+            Node(Mesh(shapes.cube(1), (x, 0, 0)), parent=root)
+        stream = StringIO()
+        ac3d.write(stream, root)
+        assert stream.getvalue().count('OBJECT world') == 1
+
+        stream.seek(0)
+        world, = ac3d.read(stream).children
+        assert world.mesh is None and len(world.children) == 2
+        for x, node in enumerate(world.children):
+            assert np.allclose(node.world_matrix[:3, 3], (x, 0, 0))
+
+    def test_large_meshes_chunked(self):
+        points, triangles = shapes.sphere(1, 400)
+        stream = StringIO()
+        ac3d.write(stream, [Mesh((points, triangles), (0, 0, 0))])
+        assert len(triangles) > bulk.CHUNK_ROWS
+        stream.seek(0)
+        mesh = ac3d.read(stream).children[0].children[0].mesh
+        assert np.array_equal(mesh.triangles, triangles)
+
+
+if __name__ == '__main__':
+    main()
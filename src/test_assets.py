@@ -0,0 +1,177 @@
+import os
+import threading
+
+import numpy as np
+from pytest import fixture, main
+
+import assets
+import formats
+from geometry import Mesh
+from scene import Node
+from test_formats import MESH_TEXT
+
+
+def read(path):
+    read.calls += 1
+    with open(path) as file:
+        values = np.array(file.read().split(), dtype=float)
+    return {'values': values, 'squares': values**2}
+
+
+@fixture
+def cache(tmp_path, monkeypatch):
+    cache = assets.AssetCache(str(tmp_path / 'cache'))
+    monkeypatch.setattr(assets, 'default_cache', cache)
+    read.calls = 0
+    return cache
+
+
+def test_hits_mapped(cache, tmp_path):
+    path = tmp_path / 'values.txt'
+    path.write_text('1 2 3')
+    first = cache.get(str(path), 'values', read)
+    second = cache.get(str(path), 'values', read)
+
+    assert read.calls == 1 and (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(second['values'], np.memmap)
+    assert np.array_equal(second['squares'], first['squares'])
+
+    cache.get(str(path), 'other', read)
+    assert read.calls == 2
+
+
+def test_keyed_by_content(cache, tmp_path):
+    path = tmp_path / 'values.txt'
+    path.write_text('1 2 3')
+    cache.get(str(path), 'values', read)
+
+    # Rewriting the same content is hashed again, and still hits.
+    path.write_text('1 2 3')
+    os.utime(path, ns=(0, 0))
+    cache.get(str(path), 'values', read)
+    assert read.calls == 1
+
+    path.write_text('4 5 6')
+    assert cache.get(str(path), 'values', read)['values'].tolist() == [
+        4, 5, 6]
+    assert read.calls == 2
+
+
+def test_threads_write_apart(tmp_path):
+    path = str(tmp_path / 'entry')
+    both_writing = threading.Barrier(2, timeout=5)
+    temporaries = []
+
+    def write(temporary):
+        temporaries.append(temporary)
+        with open(temporary, 'w') as file:
+            both_writing.wait()
+            file.write('done')
+    threads = [threading.Thread(target=assets._replace, args=(path, write))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(temporaries)) == 2
+    with open(path) as file:
+        assert file.read() == 'done'
+
+
+def test_evicts_least_recently_used(cache, tmp_path):
+    paths = []
+    for index in range(3):
+        paths.append(str(tmp_path / f'{index}.txt'))
+        with open(paths[-1], 'w') as file:
+            file.write(' '.join(['1'] * 100 + [str(index)]))
+    for path in paths[:2]:
+        cache.get(path, 'values', read)
+    sizes = list(cache.entries().values())
+    cache.max_bytes = sum(sizes)
+
+    # Entries are ordered by modification time, touched on each hit.
+    first = next(iter(cache.entries()))
+    os.utime(first, (0, 0))
+    cache.get(paths[2], 'values', read)
+    assert len(cache.entries()) == 2 and first not in cache.entries()
+
+    cache.max_bytes = 10
+    cache.get(paths[0], 'values', read)
+    assert len(cache.entries()) == 2
+
+
+def test_mesh_from_path(cache, tmp_path):
+    path = tmp_path / 'triangle.txt'
+    path.write_text(MESH_TEXT)
+    first = Mesh.from_path(str(path))
+    second = Mesh.from_path(str(path))
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert np.array_equal(second.points, first.points)
+    assert np.array_equal(second.triangles, first.triangles)
+    # Meshes map the cached arrays, but changes stay their own.
+    assert not second.points.flags.owndata
+    second.points += 1
+    assert np.array_equal(Mesh.from_path(str(path)).points, first.points)
+
+
+def test_formats_tree(cache, tmp_path):
+    root = Node()
+    group = Node(None, (1, 2, 3), parent=root, name='group')
+    for index in range(2):
+        points = np.array([(0, 0, 0), (1, 0, 0), (0, 1, index)],
+                          dtype=np.float32)
+        Node(Mesh((points, [(0, 1, 2)]), (index, 0, 0), (0, 0, index),
+                  color=(index, 0, 1), copy=False),
+             parent=group, name=f'mesh{index}')
+
+    path = tmp_path / 'tree.test'
+    path.write_text('tree')
+    formats.register_loader('.test')(lambda path, progress=None: root)
+    try:
+        assert formats.load(str(path)) is root
+        loaded = formats.load(str(path))
+    finally:
+        del formats.LOADERS['.test']
+
+    assert cache.hits == 1
+    for node, original in zip(loaded, root):
+        assert node.name == original.name
+        assert np.allclose(node.local_matrix, original.local_matrix)
+        assert len(node.children) == len(original.children)
+        if original.mesh is not None:
+            assert node.mesh.color == original.mesh.color
+            assert np.allclose(node.mesh.model_matrix(),
+                               original.mesh.model_matrix())
+            assert np.array_equal(node.mesh.points, original.mesh.points)
+            # Points keep their type and stay mapped from the entry.
+            assert node.mesh.points.dtype == np.float32
+            assert not node.mesh.points.flags.owndata
+
+
+def test_formats_uncached_loaders(cache, tmp_path):
+    path = tmp_path / 'triangle.txt'
+    path.write_text(MESH_TEXT)
+    for _ in range(2):
+        formats.load(str(path))
+    # Only Mesh.load caches mesh text files.
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache.entries()) == 1
+
+    calls = []
+    path = tmp_path / 'model.test'
+    path.write_text('model')
+    load = formats.register_loader('.test', cached=False)(
+        lambda path, progress=None: calls.append(path) or Node())
+    try:
+        formats.load(str(path))
+        formats.load(str(path))
+    finally:
+        del formats.LOADERS['.test']
+        formats.UNCACHED_LOADERS.discard(load)
+    assert len(calls) == 2 and cache.misses == 1
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+from math import pi
+
+import numpy as np
+from pytest import main
+
+import shapes
+from bvh import BVH, TriangleBVH, ray_box_distances, ray_triangle_distances
+from geometry import Mesh
+from scene import Scene
+
+
+def random_boxes(count, seed=0):
+    random = np.random.default_rng(seed)
+    lower = random.uniform(-10, 10, (count, 3))
+    return lower, lower + random.uniform(0, 1, (count, 3))
+
+
+def test_ray_triangle_distances():
+    corners = np.array([[(0, 0, 5), (1, 0, 5), (0, 1, 5)],
+                        [(2, 2, 5), (3, 2, 5), (2, 3, 5)]], dtype=float)
+    distances = ray_triangle_distances(
+        np.array([0.2, 0.2, 0.0]), np.array([0.0, 0.0, 1.0]),
+        corners[:, 0], corners[:, 1], corners[:, 2])
+    assert distances[0] == 5
+    assert np.isinf(distances[1])
+
+
+class TestBVH:
+
+    def setup_method(self):
+        self.lower, self.upper = random_boxes(500)
+        self.bvh = BVH(self.lower, self.upper, leaf_size=4)
+
+    def brute_force(self, origin, direction):
+        entry, exit_ = ray_box_distances(origin, direction,
+                                         self.lower, self.upper)
+        return set(np.flatnonzero((entry <= exit_) & (exit_ >= 0)))
+
+    def test_every_primitive_in_a_leaf(self):
+        leaves = self.bvh.left < 0
+        assert self.bvh.counts[leaves].sum() == 500
+        assert sorted(self.bvh.order) == list(range(500))
+
+    def test_candidates_include_every_hit(self):
+        random = np.random.default_rng(1)
+        for _ in range(20):
+            origin = random.uniform(-15, 15, 3)
+            direction = random.normal(size=3)
+            candidates = set(self.bvh.candidates(origin, direction))
+            assert self.brute_force(origin, direction) <= candidates
+
+    def test_refit(self):
+        self.lower += 100
+        self.upper += 100
+        self.bvh.refit(self.lower, self.upper)
+        assert np.allclose(self.bvh.lower[0], self.lower.min(axis=0))
+        assert np.allclose(self.bvh.upper[0], self.upper.max(axis=0))
+
+
+class TestTriangleBVH:
+
+    def setup_method(self):
+        mesh = Mesh(shapes.cube(2), (0, 0, 0))
+        self.vertices, self.triangles = mesh.vertices, mesh.indices
+        self.bvh = TriangleBVH(self.vertices, self.triangles, leaf_size=2)
+
+    def test_intersect(self):
+        triangle, distance = self.bvh.intersect(
+            self.vertices, self.triangles, (0.1, 0.2, -5), (0, 0, 1))
+        assert distance == 4
+        assert np.all(self.vertices[self.triangles[triangle], 2] == -1)
+
+    def test_miss(self):
+        assert self.bvh.intersect(self.vertices, self.triangles,
+                                  (3, 0, -5), (0, 0, 1)) is None
+
+    def test_refit(self):
+        self.vertices = self.vertices*2
+        self.bvh.refit(self.vertices, self.triangles)
+        _, distance = self.bvh.intersect(
+            self.vertices, self.triangles, (0.1, 0.2, -5), (0, 0, 1))
+        assert distance == 3
+
+
+class TestScenePick:
+
+    def setup_method(self):
+        self.near = Mesh(shapes.cube(1), (0, 0, 3))
+        self.far = Mesh(shapes.cube(1), (0, 0, 6), (0, pi / 4, 0))
+        self.scene = Scene([self.near, self.far])
+
+    def test_nearest(self):
+        pick = self.scene.pick((0, 0, 0), (0, 0, 1))
+        assert pick.mesh is self.near
+        assert np.isclose(pick.distance, 2.5)
+        assert np.allclose(pick.point, (0, 0, 2.5))
+
+    def test_follows_transforms(self):
+        self.near.move_by(5, 0, 0)
+        pick = self.scene.pick((0, 0, 0), (0, 0, 1))
+        assert pick.mesh is self.far
+        assert np.isclose(pick.distance, 6 - np.sqrt(0.5))
+
+        self.far.move_by(5, 0, 0)
+        assert self.scene.pick((0, 0, 0), (0, 0, 1)) is None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import struct
+import threading
+import zlib
+
+import numpy as np
+from pytest import main, raises
+
+import capture
+from capture import FrameCapture, encode_png, encode_ppm
+from pixels import PixelGrid
+
+
+def make_frame(height=3, width=4, value=0):
+    frame = np.arange(height*width*3, dtype=np.uint8).reshape(height, width, 3)
+    return frame + np.uint8(value)
+
+
+def read_png(data):
+    assert data.startswith(capture.PNG_SIGNATURE)
+    width, height = struct.unpack('>II', data[16:24])
+    length, = struct.unpack('>I', data[33:37])
+    assert data[37:41] == b'IDAT'
+    rows = np.frombuffer(zlib.decompress(data[41:41 + length]), np.uint8)
+    rows = rows.reshape(height, 1 + 3*width)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(height, width, 3)
+
+
+def test_encode_ppm():
+    frame = make_frame()
+    data = encode_ppm(frame)
+    assert data.startswith(b'P6 4 3 255\n')
+    assert data[11:] == frame.tobytes()
+
+
+def test_encode_png():
+    frame = make_frame(5, 2)
+    assert np.array_equal(read_png(encode_png(frame)), frame)
+
+
+def test_image_sequence(tmp_path):
+    path = str(tmp_path / 'frames' / '{:03d}.png')
+    with FrameCapture(path) as frames:
+        for value in range(3):
+            assert frames.capture(make_frame(value=value))
+    assert frames.closed
+    assert frames.frames_written == frames.frames_captured == 3
+    for value in range(3):
+        data = (tmp_path / 'frames' / f'{value:03d}.png').read_bytes()
+        assert np.array_equal(read_png(data), make_frame(value=value))
+
+    with raises(ValueError):
+        frames.capture(make_frame())
+
+
+def test_raw_video(tmp_path):
+    path = tmp_path / 'frames.rgb'
+    with FrameCapture(str(path)) as frames:
+        assert frames.capture(make_frame(value=1))
+        assert not frames.capture(make_frame(2, 2))
+        assert frames.capture(make_frame(value=2))
+    assert frames.frames_written == 2 and frames.frames_dropped == 1
+    video = np.frombuffer(path.read_bytes(), np.uint8).reshape(2, 3, 4, 3)
+    assert np.array_equal(video[1], make_frame(value=2))
+
+
+def test_frames_are_copied(tmp_path):
+    grid = PixelGrid()
+    grid.pixels[0, 0, 1, 99] = 200
+    with FrameCapture(str(tmp_path / '{}.ppm')) as frames:
+        frames.capture(grid.image)
+        grid.pixels[0] = 0
+    data = (tmp_path / '0.ppm').read_bytes()
+    image = np.frombuffer(data[15:], np.uint8).reshape(100, 100, 3)
+    # y is up in the grid, and rows are from the top in images.
+    assert image[0, 1, 0] == 200 and image.sum() == 200
+
+
+def test_drops_frames_behind_writer(tmp_path, monkeypatch):
+    written = threading.Event()
+    monkeypatch.setitem(capture.ENCODERS, 'ppm',
+                        lambda frame: written.wait(5) and b'')
+    frames = FrameCapture(str(tmp_path / '{}.ppm'), queue_frames=2)
+    results = [frames.capture(make_frame()) for _ in range(5)]
+    dropped = frames.frames_dropped
+    assert not frames.ready() and frames.frames_dropped == dropped + 1
+    written.set()
+    frames.close()
+
+    # The writer may have taken the first frame off the queue.
+    assert results[:2] == [True, True] and results[-1] is False
+    assert frames.frames_captured + frames.frames_dropped == 6
+    assert frames.frames_written == frames.frames_captured
+    assert 'dropped' in str(frames)
+
+
+def test_write_errors(tmp_path):
+    (tmp_path / 'file').write_text('')
+    with FrameCapture(str(tmp_path / 'file' / '{}.png')) as frames:
+        frames.capture(make_frame())
+        frames.capture(make_frame())
+    assert isinstance(frames.error, OSError)
+    assert frames.frames_written == 0
+
+
+def test_encoding_errors(tmp_path, monkeypatch):
+    def encode(frame):
+        raise ValueError
+    monkeypatch.setitem(capture.ENCODERS, 'ppm', encode)
+    frames = FrameCapture(str(tmp_path / '{}.ppm'), queue_frames=1)
+    for _ in range(5):
+        frames.capture(make_frame())
+    frames.close()
+    assert isinstance(frames.error, ValueError)
+    assert frames.frames_written == 0
+
+
+def test_frame_shapes(tmp_path):
+    with FrameCapture(str(tmp_path / '{}.png')) as frames:
+        with raises(ValueError):
+            frames.capture(np.zeros((3, 4, 4), dtype=np.uint8))
+        with raises(ValueError):
+            frames.capture(np.zeros((3, 4, 3)))
+    assert frames.frames_captured == frames.frames_dropped == 0
+
+
+def test_unknown_extension():
+    with raises(ValueError):
+        FrameCapture('frames.gif')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+from pytest import main, raises
+
+import formats
+from geometry import Mesh
+from scene import Node
+
+
+MESH_TEXT = '0 0 0\n1 0 0\n0 1 0\n\n0 1 2\n'
+
+
+def test_loaders_registered():
+    for extension in ('.ac', '.obj', '.ply', '.stl', '.txt'):
+        assert formats.loader(f'model{extension}') is formats.LOADERS[
+            extension]
+    assert formats.loader('MODEL.OBJ') is formats.LOADERS['.obj']
+
+    with raises(ValueError):
+        formats.loader('model.blend')
+
+
+def test_register_loader(tmp_path):
+    @formats.register_loader('.Test')
+    def load_test(path, progress=None):
+        return Node(name=path)
+
+    path = str(tmp_path / 'model.test')
+    open(path, 'w').close()
+    try:
+        assert formats.load(path).name == path
+    finally:
+        del formats.LOADERS['.test']
+
+
+def test_load_mesh_file(tmp_path):
+    path = tmp_path / 'triangle.txt'
+    path.write_text(MESH_TEXT)
+    fractions = []
+    root = formats.load(str(path), fractions.append)
+
+    node, = root.children
+    assert node.name == 'triangle'
+    assert isinstance(node.mesh, Mesh)
+    assert len(node.mesh.triangles) == 1
+    assert fractions == [1.0]
+
+
+def test_obj_progress(tmp_path):
+    path = tmp_path / 'triangle.obj'
+    path.write_text('v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n')
+    fractions = []
+    formats.load(str(path), fractions.append)
+    assert fractions and fractions[-1] == 1.0
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
-from math import isclose
+import gc
+from math import isclose, pi
 
+import numpy as np
 from pytest import main, raises
 
-from geometry import shapes, lines, Mesh, Point, RGBA, TriangleArray
+import transforms
+
+from geometry import (shapes, lines, CameraLogic, Instance, Mesh, Physics,
+    PhysicsBodies, PhysicsMesh, Point, RGBA, ShapeCache, SharedGeometry,
+    TriangleArray)
+from scene import Scene
 
 
 class TestPoint:
@@ -91,6 +98,307 @@ class TestMesh:
     #     self.mesh.save('data/test/mesh_1.txt')
 
 
+class TestMeshArrays:
+
+    def test_points_copied_from_shape_info(self):
+        geometry = shapes.cube(1)
+        mesh = Mesh(geometry, (0, 0, 0))
+        mesh.points[0] = 9
+        assert geometry.points[0, 0] == 0.5
+
+    def test_large_mesh(self):
+        mesh = Mesh(shapes.sphere(1, 400), (0, 0, 0))
+        assert len(mesh.points) > 2**16
+        assert mesh.indices.dtype == np.uint32
+        assert mesh.indices.max() == len(mesh.vertices) - 1
+
+    def test_texture_coordinates(self):
+        points, triangles = shapes.cube(1)
+        uvs = points[:, :2] + 0.5
+        mesh = Mesh((points, triangles), (0, 0, 0), uvs=uvs.tolist())
+        assert mesh.uvs.shape == (8, 2) and np.allclose(mesh.uvs, uvs)
+        assert Mesh(shapes.cube(1), (0, 0, 0)).uvs is None
+        with raises(ValueError):
+            Mesh((points, triangles), (0, 0, 0), uvs=uvs[:-1])
+
+        geometry = SharedGeometry.from_mesh(mesh)
+        instance = Instance(geometry, (0, 0, 0), texture='image')
+        assert np.allclose(instance.uvs, uvs) and instance.texture == 'image'
+        with raises(ValueError):
+            instance.uvs[0] = 0
+
+        mesh.subdivide()
+        assert mesh.uvs is None
+
+
+class TestMeshTransform:
+
+    def setup_method(self):
+        self.mesh = Mesh(shapes.cube(2), (1, 2, 3), (0, 0, pi / 2))
+
+    def test_points_stay_in_mesh_space(self):
+        assert np.allclose(self.mesh.vertices.min(axis=0), (-1, -1, -1))
+        self.mesh.move_by(1, 0, 0)
+        assert np.allclose(self.mesh.vertices.min(axis=0), (-1, -1, -1))
+        assert np.allclose(self.mesh.position, (2, 2, 3))
+
+    def test_world_vertices(self):
+        world = self.mesh.world_vertices()
+        index = np.flatnonzero((self.mesh.points == 1).all(axis=1))[0]
+        assert np.allclose(world[index], (0, 3, 4))
+
+    def test_rotate_about_point(self):
+        self.mesh.rotate(0, 0, pi, point=(0, 2, 3))
+        assert np.allclose(self.mesh.position, (-1, 2, 3))
+
+
+class TestPhysicsBodies:
+
+    def setup_method(self):
+        self.shared_bodies = Physics.bodies
+        self.bodies = Physics.bodies = PhysicsBodies(capacity=2)
+
+    def teardown_method(self):
+        Physics.bodies = self.shared_bodies
+
+    @staticmethod
+    def make_body(position=(0, 0, 0), **keywords):
+        return PhysicsMesh(shapes.cube(1), position, **keywords)
+
+    def test_linear_motion(self):
+        body = self.make_body(velocity=(1, 0, 0), acceleration=(0, -2, 0))
+        self.bodies.simulate(2.0)
+        assert np.allclose(body.position, (2, -4, 0))
+        assert np.allclose(body.velocity, (1, -4, 0))
+
+    def test_angular_motion(self):
+        body = self.make_body(angular_velocity=(0, 0, pi / 2))
+        self.bodies.simulate(1.0)
+        assert np.allclose(body.model_matrix()[:3, :3] @ (1, 0, 0),
+                           (0, 1, 0))
+
+    def test_growth_keeps_views(self):
+        bodies = [self.make_body((index, 0, 0)) for index in range(5)]
+        assert len(self.bodies.positions) >= 5
+        for body in bodies:
+            body.velocity = (0, 1, 0)
+        self.bodies.simulate(1.0)
+        for index, body in enumerate(bodies):
+            assert np.allclose(body.position, (index, 1, 0))
+            assert body.position.base is self.bodies.positions
+
+    def test_growth_clears_new_rows(self):
+        moving = [self.make_body(velocity=(1, 2, 3),
+                                 angular_velocity=(0, 0, 1))
+                  for _ in range(2)]
+        body = self.make_body()
+        assert len(self.bodies.positions) > len(moving)
+        assert np.allclose(body.velocity, 0)
+        assert np.allclose(body.angular_velocity, 0)
+        assert np.allclose(body.orientation,
+                           transforms.IDENTITY_QUATERNION)
+
+    def test_rows_are_reused(self):
+        body = self.make_body(velocity=(1, 1, 1))
+        index = body._body
+        del body
+        gc.collect()
+        assert len(self.bodies) == 0
+        assert np.allclose(self.bodies.velocities[index], 0)
+        assert self.make_body()._body == index
+
+    def test_scene_releases_bodies(self):
+        body = self.make_body(velocity=(1, 0, 0))
+        scene = Scene([body])
+        scene.discard(body)
+        assert len(self.bodies) == 0 and body._body is None
+        self.bodies.simulate(1.0)
+        assert np.allclose(body.position, 0)
+        assert np.allclose(body.velocity, (1, 0, 0))
+
+        scene.add(body)
+        self.bodies.simulate(1.0)
+        assert np.allclose(body.position, (1, 0, 0))
+        scene.clear()
+        assert len(self.bodies) == 0
+
+    def test_camera_moves_with_velocity(self):
+        camera = CameraLogic((1, 2, 3), (0, 0, 0))
+        camera.velocity = (0, 0, 1)
+        self.bodies.simulate(2.0)
+        assert tuple(camera.position) == (1, 2, 5)
+        camera.move_by(1, 0, 0)
+        assert np.allclose(camera.view_matrix()[:3, 3], (-2, -2, -5))
+        camera.reset()
+        assert tuple(camera.position) == (1, 2, 3)
+
+
+class TestCameraLogic:
+
+    def setup_method(self):
+        self.camera = CameraLogic((0.5, -1, -2), (0.2, -0.3, 0.1),
+                                  width=640, height=480)
+        self.camera.x = self.camera.y = 0
+
+    def test_project_points_matches_resolve_point(self):
+        points = np.array([(0.1, 0.2, 3.0), (-1.0, 2.0, 5.0)])
+        model_view = self.camera.view_matrix()
+        camera_points = points @ model_view[:3, :3].T + model_view[:3, 3]
+
+        for point, screen in zip(points,
+                                 self.camera.project_points(camera_points)):
+            assert np.allclose(self.camera.resolve_point(*point), screen)
+
+    def test_screen_ray_inverts_resolve_point(self):
+        point = np.array([0.3, -0.4, 4.0])
+        origin, direction = self.camera.screen_ray(
+            *self.camera.resolve_point(*point))
+        to_point = point - origin
+        assert np.isclose(np.linalg.norm(direction), 1)
+        assert np.allclose(direction, to_point / np.linalg.norm(to_point))
+
+    def test_draw_visible_meshes_far_to_near(self):
+        near = Mesh(shapes.cube(1), (0, 0, 3))
+        far = Mesh(shapes.cube(1), (0, 0, 9))
+        behind = Mesh(shapes.cube(1), (0, 0, -6))
+        camera = CameraLogic((0, 0, 0), (0, 0, 0), (near, far, behind))
+        camera.x = camera.y = 0
+
+        drawn = []
+        camera.draw_triangles = (
+            lambda points, triangles, shades, depths:
+            drawn.append(len(triangles)))
+        camera.draw_meshes()
+
+        assert drawn == [12, 12]
+
+    def test_draw_instances_like_meshes(self):
+        geometry = SharedGeometry(shapes.cube(1))
+        positions = [(0, 0, 3), (1, 0, 6), (-1, 1, 4)]
+        drawn = {}
+        for kind, meshes in (
+                ('meshes', [Mesh(shapes.cube(1), position, (0.3, 0, 0))
+                            for position in positions]),
+                ('instances', [Instance(geometry, position, (0.3, 0, 0))
+                               for position in positions])):
+            camera = CameraLogic((0, 0, 0), (0, 0, 0), meshes)
+            camera.x = camera.y = 0
+            drawn[kind] = []
+            camera.draw_triangles = (
+                lambda points, triangles, shades, depths, kind=kind:
+                drawn[kind].append(points[triangles]))
+            camera.draw_meshes()
+
+        assert len(drawn['instances']) == 3
+        for mesh_points, instance_points in zip(*drawn.values()):
+            assert np.allclose(mesh_points, instance_points, atol=1e-4)
+
+    def test_flat_shading(self):
+        mesh = Mesh(shapes.cube(1), (0, 0, 3))
+        camera = CameraLogic((0, 0, 0), (0, 0, 0), (mesh,))
+        camera.x = camera.y = 0
+        camera.meshes.light_direction = np.array([0.0, 0.0, 1.0])
+
+        shades = camera.face_shades(mesh, camera.view_matrix()
+                                    @ mesh.model_matrix())
+        normals = camera.meshes.face_normals(mesh)
+        # Faces are lit on the side the camera sees.
+        along_light = np.abs(normals[:, 2]) > 0.5
+        assert np.allclose(shades[along_light], 1)
+        assert np.allclose(shades[~along_light], camera.meshes.ambient)
+
+        # Turning the mesh turns its normals, not the light.
+        mesh.rotate(0, pi / 4, 0)
+        shades = camera.face_shades(mesh, camera.view_matrix()
+                                    @ mesh.model_matrix())
+        assert np.isclose(shades.max(), 0.3 + 0.7*np.cos(pi / 4))
+
+        drawn = []
+        camera.draw_triangles = (
+            lambda points, triangles, shades, depths: drawn.append(shades))
+        camera.draw_meshes()
+        assert len(drawn[0]) == 12
+        assert np.all((drawn[0] >= 0.3) & (drawn[0] <= 1))
+
+    def test_draw_textured_mesh(self):
+        points, triangles = shapes.cube(1)
+        mesh = Mesh((points, triangles), (0, 0, 3), uvs=points[:, :2] + 0.5,
+                    texture='image')
+        camera = CameraLogic((0, 0, 0), (0, 0, 0), (mesh,))
+        camera.x = camera.y = 0
+        camera.meshes.add_detail_levels(mesh)
+
+        drawn = []
+        camera.draw_textured_triangles = (
+            lambda points, depths, triangles, uvs, texture, shades:
+            drawn.append((depths, triangles, uvs, texture)))
+        camera.draw_meshes()
+
+        (depths, drawn_triangles, uvs, texture), = drawn
+        assert texture == 'image' and uvs is mesh.uvs
+        assert len(drawn_triangles) == 12
+        assert np.allclose(depths, points[:, 2] + 3)
+
+        # Without an override, textured meshes are drawn untextured.
+        del camera.draw_textured_triangles
+        camera.draw_triangles = (
+            lambda points, triangles, shades, depths: drawn.append(triangles))
+        camera.draw_meshes()
+        assert len(drawn[-1]) == 12
+
+
+class TestInstance:
+
+    def setup_method(self):
+        self.geometry = SharedGeometry(shapes.cube(2))
+        self.instance = Instance(self.geometry, (1, 2, 3), (0, pi / 2, 0))
+
+    def test_shares_read_only_geometry(self):
+        other = Instance(self.geometry, (0, 0, 0))
+        assert other.vertices is self.instance.vertices
+        with raises(ValueError):
+            self.instance.vertices[0] = 0
+        with raises(TypeError):
+            self.instance.load('mesh.txt')
+        with raises(TypeError, match='shared geometry'):
+            self.instance.load('mesh.txt', optimized=True)
+
+    def test_world_vertices(self):
+        mesh = Mesh(shapes.cube(2), (1, 2, 3), (0, pi / 2, 0))
+        assert np.allclose(self.instance.world_vertices(),
+                           mesh.world_vertices())
+
+
+class TestShapeCache:
+
+    def setup_method(self):
+        # Room for the arrays of exactly two cubes.
+        self.cache = ShapeCache(2*(8*3*4 + 12*3*4))
+
+    def test_hits_and_misses(self):
+        cube = self.cache.get('cube', 1)
+        assert self.cache.get('cube', 1) is cube
+        assert self.cache.get('cube', 2) is not cube
+        assert (self.cache.hits, self.cache.misses) == (1, 2)
+
+    def test_least_recently_used_evicted(self):
+        cube_1 = self.cache.get('cube', 1)
+        self.cache.get('cube', 2)
+        self.cache.get('cube', 1)
+        self.cache.get('cube', 3)
+        assert len(self.cache) == 2
+        assert self.cache.get('cube', 1) is cube_1
+        assert self.cache.misses == 3
+
+    def test_large_geometry_not_kept(self):
+        self.cache.get('circle', 1, 64)
+        assert len(self.cache) == self.cache.bytes == 0
+
+    def test_mesh_shape(self):
+        assert Mesh.shape.polygon(5, 1) is Mesh.shape.polygon(5, 1)
+        assert len(Mesh.shape.polygon(5, 1)) == 5
+
+
 class TestRGBA:
 
     def setup(self):
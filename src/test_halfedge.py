@@ -0,0 +1,82 @@
+import numpy as np
+from pytest import main
+
+import shapes
+from geometry import Instance, Mesh, SharedGeometry
+from halfedge import HalfEdges
+
+
+class TestHalfEdges:
+
+    def setup_method(self):
+        _, triangles = shapes.cube(1)
+        self.half_edges = HalfEdges(triangles)
+
+    def test_twins(self):
+        twin = self.half_edges.twin
+        assert np.all(twin >= 0)
+        assert np.array_equal(twin[twin], np.arange(36))
+        assert np.array_equal(self.half_edges.destinations[twin],
+                              self.half_edges.vertices)
+        assert len(self.half_edges.edges) == 18
+
+    def test_vertex_adjacency(self):
+        assert self.half_edges.valences.sum() == 36
+        for vertex in range(8):
+            half_edges = self.half_edges.vertex_half_edges(vertex)
+            assert np.all(self.half_edges.vertices[half_edges] == vertex)
+            assert vertex not in self.half_edges.neighbours(vertex)
+
+    def test_face_neighbours(self):
+        neighbours = self.half_edges.face_neighbours()
+        assert neighbours.shape == (12, 3)
+        assert np.all(neighbours != np.arange(12)[:, None])
+
+    def test_manifold(self):
+        assert self.half_edges.is_manifold()
+        assert not self.half_edges.silhouette(np.ones(12, dtype=bool)).size
+
+    def test_boundary(self):
+        half_edges = HalfEdges(shapes.circle(1, 6).triangles)
+        # A fan of four triangles has six edges on its boundary.
+        assert half_edges.boundary.sum() == 6
+        assert half_edges.is_manifold()
+        assert half_edges.neighbours(0).tolist() == [1, 2, 3, 4, 5]
+
+        front_facing = np.array([True, True, False, False])
+        silhouette = half_edges.silhouette(front_facing)
+        assert set(half_edges.faces[silhouette]) == {0, 1}
+        assert len(silhouette) == 4
+
+    def test_non_manifold(self):
+        # Two triangles touching only at vertex 0.
+        bowtie = HalfEdges([(0, 1, 2), (0, 3, 4)])
+        assert bowtie.non_manifold_vertices().tolist() == [0]
+
+        # Three triangles sharing the edge from 0 to 1.
+        fin = HalfEdges([(0, 1, 2), (1, 0, 3), (1, 0, 4)])
+        assert not fin.is_manifold()
+        assert np.all(fin.twin[:3] == [-1, -1, -1])
+
+
+class TestMeshHalfEdges:
+
+    def test_cached_until_triangles_replaced(self):
+        mesh = Mesh(shapes.cube(1), (0, 0, 0))
+        half_edges = mesh.half_edges
+        assert mesh.half_edges is half_edges
+
+        mesh.triangles = mesh.triangles[:6].copy()
+        assert mesh.half_edges is not half_edges
+        assert len(mesh.half_edges) == 18
+
+    def test_instances_share(self):
+        geometry = SharedGeometry(shapes.sphere(1, 8))
+        first = Instance(geometry, (0, 0, 0))
+        second = Instance(geometry, (1, 0, 0))
+        assert first.half_edges is second.half_edges
+        assert first.half_edges.is_manifold()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+from pytest import main, raises
+
+from loading import AssetLoader
+from scene import Scene
+from test_formats import MESH_TEXT
+
+
+def wait(loader, scene, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        loading = loader.poll(scene)
+        if loading is not None:
+            return loading
+        time.sleep(0.001)
+    raise TimeoutError
+
+
+class TestAssetLoader:
+
+    def setup_method(self):
+        self.loader = AssetLoader()
+        self.scene = Scene()
+
+    def teardown_method(self):
+        self.loader.shutdown()
+
+    def test_poll_attaches_meshes(self, tmp_path):
+        path = tmp_path / 'triangle.txt'
+        path.write_text(MESH_TEXT)
+        loading = self.loader.submit(str(path))
+        assert 'triangle.txt' in str(self.loader)
+
+        assert wait(self.loader, self.scene) is loading
+        assert loading.error is None and loading.fraction == 1.0
+        assert loading.node.parent is self.scene.root
+
+        mesh = loading.node.children[0].mesh
+        assert mesh in self.scene
+        assert loading.packed.meshes == [mesh]
+        assert np.allclose(self.scene.buffers(mesh)[0], mesh.vertices)
+        assert self.scene.nodes[mesh] is loading.node.children[0]
+        assert not self.loader.loading and str(self.loader) == ''
+        assert self.loader.poll(self.scene) is None
+
+    def test_poll_returns_errors(self, tmp_path):
+        path = tmp_path / 'broken.txt'
+        path.write_text('0 0 0\n')
+        loading = self.loader.submit(str(path))
+
+        assert wait(self.loader, self.scene) is loading
+        assert isinstance(loading.error, SyntaxError)
+        assert loading.node is None
+        assert not len(self.scene)
+
+    def test_unknown_extension(self):
+        with raises(ValueError):
+            self.loader.submit('model.blend')
+        assert not self.loader.loading
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from lod import LevelsOfDetail, decimate
+
+
+def grid(size):
+    """ Return a flat square grid of size by size quads.
+    """
+    x, y = np.meshgrid(np.arange(size + 1), np.arange(size + 1))
+    vertices = np.column_stack((x.ravel(), y.ravel(),
+                                np.zeros(x.size))).astype(float)
+    corners = (np.arange(size)[:, None]*(size + 1)
+               + np.arange(size)[None, :]).ravel()
+    triangles = np.concatenate((
+        np.column_stack((corners, corners + 1, corners + size + 2)),
+        np.column_stack((corners, corners + size + 2, corners + size + 1))))
+    return vertices, triangles
+
+
+class TestDecimate:
+
+    def setup_method(self):
+        self.vertices, self.triangles = grid(8)
+
+    def test_triangle_count(self):
+        vertices, triangles = decimate(self.vertices, self.triangles, 0.25)
+        assert len(triangles) <= 0.25*len(self.triangles)
+        assert len(triangles)
+
+    def test_unused_vertices_removed(self):
+        vertices, triangles = decimate(self.vertices, self.triangles, 0.5)
+        assert len(vertices) < len(self.vertices)
+        assert np.array_equal(np.unique(triangles), np.arange(len(vertices)))
+
+    def test_flat_mesh_keeps_its_outline(self):
+        vertices, triangles = decimate(self.vertices, self.triangles, 0.1)
+        assert np.allclose(vertices[:, 2], 0)
+        assert np.allclose(vertices.min(axis=0)[:2], (0, 0))
+        assert np.allclose(vertices.max(axis=0)[:2], (8, 8))
+
+        corners = vertices[triangles]
+        areas = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0],
+                                        corners[:, 2] - corners[:, 0]),
+                               axis=1) / 2
+        assert np.isclose(areas.sum(), 64)
+
+    def test_closed_mesh(self):
+        points, triangles = shapes.sphere(1, 16)
+        vertices, simplified = decimate(points, triangles, 0.5)
+        assert len(simplified) == len(triangles) // 2
+        assert np.allclose(np.linalg.norm(vertices, axis=1), 1, atol=0.05)
+
+        # Faces still point out, and the same mesh decimates the same.
+        corners = vertices[simplified]
+        normals = np.cross(corners[:, 1] - corners[:, 0],
+                           corners[:, 2] - corners[:, 0])
+        assert np.all(np.einsum('ij,ij->i', normals, corners.mean(axis=1))
+                      > 0)
+        assert np.array_equal(decimate(points, triangles, 0.5)[1],
+                              simplified)
+
+
+class TestLevelsOfDetail:
+
+    def setup_method(self):
+        self.levels = LevelsOfDetail(*grid(6), ratios=(1.0, 0.5, 0.2),
+                                     radii=(100, 20), hysteresis=0.1)
+
+    def test_levels(self):
+        assert len(self.levels) == 3
+        counts = [len(triangles) for _, triangles in self.levels.levels]
+        assert counts[0] <= 36 and counts[1] <= 14
+        assert all(vertices.dtype == np.float32
+                   for vertices, _ in self.levels.levels)
+
+    def test_select_with_hysteresis(self):
+        viewer = TestLevelsOfDetail
+        assert self.levels.select(viewer, 200) == 0
+        # Within the hysteresis band the current level is kept.
+        assert self.levels.select(viewer, 95) == 0
+        assert self.levels.select(viewer, 85) == 1
+        assert self.levels.select(viewer, 105) == 1
+        assert self.levels.select(viewer, 115) == 0
+        assert self.levels.select(viewer, 5) == 2
+
+    def test_viewers_are_independent(self):
+        assert self.levels.select(TestDecimate, 200) == 0
+        assert self.levels.select(TestLevelsOfDetail, 95) == 0
+        assert self.levels.select(TestDecimate, 95) == 0
+        assert self.levels.select(TestLevelsOfDetail, 10) == 2
+        assert self.levels.select(TestDecimate, 95) == 0
+
+    def test_radii_must_match_ratios(self):
+        with raises(ValueError):
+            LevelsOfDetail(*grid(2), ratios=(1.0, 0.5), radii=(10, 5))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+from io import StringIO
+
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from formats import obj
+from geometry import Mesh
+
+
+SOURCE = '''# A square and a triangle.
+mtllib square.mtl
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0 1.0
+vt 0 0
+vn 0 0 1
+o square
+usemtl red
+f 1/1/1 2/1/1 3/1/1 4/1/1
+o triangle
+v 5 5 5  0.5 0.5 0.5
+f -1//1 -2//1 -3//1
+g group
+f 1 3 5
+'''
+
+
+class TestRead:
+
+    def setup_method(self):
+        self.square, self.triangle = obj.read(StringIO(SOURCE)).children
+
+    def test_objects(self):
+        assert self.square.name == 'square'
+        assert self.triangle.name == 'triangle'
+
+    def test_polygons_triangulated(self):
+        mesh = self.square.mesh
+        assert np.allclose(mesh.points, [(0, 0, 0), (1, 0, 0), (1, 1, 0),
+                                         (0, 1, 0)])
+        assert mesh.triangles.tolist() == [[0, 1, 2], [0, 2, 3]]
+
+    def test_negative_indices(self):
+        mesh = self.triangle.mesh
+        # Only the points used are kept.
+        assert np.allclose(mesh.points, [(0, 0, 0), (1, 1, 0), (0, 1, 0),
+                                         (5, 5, 5)])
+        assert mesh.triangles.tolist() == [[3, 2, 1], [0, 1, 3]]
+
+    def test_chunks(self, monkeypatch):
+        monkeypatch.setattr(obj, 'CHUNK_CHARACTERS', 7)
+        square, triangle = obj.read(StringIO(SOURCE)).children
+        assert np.array_equal(square.mesh.triangles,
+                              self.square.mesh.triangles)
+        assert np.array_equal(triangle.mesh.triangles,
+                              self.triangle.mesh.triangles)
+
+    def test_errors(self):
+        with raises(SyntaxError):
+            obj.read(StringIO('v 0 0 0\nv 1 0 0\nf 1 2 3\n'))
+        with raises(SyntaxError):
+            obj.read(StringIO('v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 x\n'))
+        with raises(SyntaxError):
+            obj.read(StringIO('v 0 0 0\nv 1 0 0\nf -1 -2 -3\n'))
+
+
+def test_round_trip(tmp_path):
+    sphere = Mesh(shapes.sphere(1, 8), (1, 2, 3), (0.5, 0, 0))
+    cube = Mesh(shapes.cube(2), (0, 0, 0))
+    path = str(tmp_path / 'meshes.obj')
+    obj.save(path, [sphere, cube])
+
+    nodes = obj.load(path).children
+    assert [node.name for node in nodes] == ['mesh0', 'mesh1']
+    for mesh, node in zip((sphere, cube), nodes):
+        assert np.allclose(node.mesh.points, mesh.world_vertices(),
+                           atol=1e-6)
+        assert np.array_equal(node.mesh.triangles, mesh.triangles)
+
+    stream = StringIO()
+    obj.write(stream, obj.load(path))
+    with open(path) as file:
+        assert stream.getvalue() == file.read()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import numpy as np
+from pytest import main, raises
+
+from octree import LooseOctree
+
+
+def random_boxes(count, seed=0):
+    random = np.random.default_rng(seed)
+    lower = random.uniform(-100, 100, (count, 3))
+    return lower, lower + random.uniform(0, 10, (count, 3))
+
+
+class TestLooseOctree:
+
+    def setup_method(self):
+        self.lower, self.upper = random_boxes(300)
+        self.octree = LooseOctree(size=256, max_depth=6)
+        for item, box in enumerate(zip(self.lower, self.upper)):
+            self.octree.insert(item, *box)
+
+    def overlapping(self, lower, upper):
+        overlap = np.all((self.lower <= upper) & (self.upper >= lower),
+                         axis=1)
+        return set(np.flatnonzero(overlap))
+
+    def test_loose_bounds_contain_items(self):
+        for item, (key, lower, upper) in self.octree.items.items():
+            depth, *index = key
+            edge = 256 / 2**depth
+            cell_lower = self.octree.origin + np.array(index)*edge
+            assert np.all(lower >= cell_lower - edge / 2)
+            assert np.all(upper <= cell_lower + edge*1.5)
+
+    def test_query_box(self):
+        lower, upper = (-20, -30, 0), (40, 10, 25)
+        assert (set(self.octree.query_box(lower, upper))
+                == self.overlapping(lower, upper))
+
+    def test_query_sphere(self):
+        center, radius = np.array([10.0, -5.0, 3.0]), 30.0
+        nearest = np.clip(center, self.lower, self.upper)
+        expected = np.linalg.norm(nearest - center, axis=1) <= radius
+        assert (set(self.octree.query_sphere(center, radius))
+                == set(np.flatnonzero(expected)))
+
+    def test_query_frustum(self):
+        # The half-space x >= 0 and the half-space y <= 20.
+        planes = [(1, 0, 0, 0), (0, -1, 0, 20)]
+        expected = (self.upper[:, 0] >= 0) & (self.lower[:, 1] <= 20)
+        assert (set(self.octree.query_frustum(planes))
+                == set(np.flatnonzero(expected)))
+
+    def test_remove(self):
+        for item in range(0, 300, 2):
+            self.octree.remove(item)
+        assert len(self.octree) == 150
+        assert all(item % 2 for item in self.octree.query_box(
+            (-200, -200, -200), (200, 200, 200)))
+        with raises(KeyError):
+            self.octree.remove(0)
+
+        for item in range(1, 300, 2):
+            self.octree.remove(item)
+        assert not self.octree.cells and not self.octree.counts
+
+    def test_outside_items(self):
+        self.octree.insert('far', (1000, 0, 0), (1001, 1, 1))
+        self.octree.insert('huge', (-500, -500, -500), (500, 500, 500))
+        assert self.octree.outside == {'far', 'huge'}
+        assert 'huge' in self.octree.query_sphere((0, 0, 0), 1)
+        assert 'far' not in self.octree.query_sphere((0, 0, 0), 1)
+
+
+if __name__ == '__main__':
+    main()
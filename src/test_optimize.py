@@ -0,0 +1,114 @@
+import os
+
+import numpy as np
+from pytest import main
+
+import shapes
+from geometry import Mesh
+from optimize import cached, morton_codes, optimize, reorder, weld
+
+
+def unwelded_cube(jitter=0.0, seed=0):
+    """ Return a unit cube with separate corners for every triangle.
+    """
+    points, triangles = shapes.cube(1)
+    vertices = np.array(points)[np.array(triangles)].reshape(-1, 3)
+    vertices += np.random.default_rng(seed).uniform(-jitter, jitter,
+                                                    vertices.shape)
+    return vertices, np.arange(len(vertices)).reshape(-1, 3)
+
+
+def corner_sets(vertices, triangles, decimals=3):
+    return sorted(sorted(map(tuple, np.round(corners, decimals).tolist()))
+                  for corners in vertices[triangles])
+
+
+def test_morton_codes_interleave():
+    points = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)])
+    assert morton_codes(points, bits=1).tolist() == [0, 1, 2, 4]
+
+
+class TestWeld:
+
+    def test_merges_close_vertices(self):
+        vertices, triangles = weld(*unwelded_cube(1e-4), tolerance=1e-3)
+        assert len(vertices) == 8
+        assert len(triangles) == 12
+        assert np.allclose(np.abs(vertices), 0.5, atol=1e-4)
+
+    def test_keeps_distant_vertices(self):
+        vertices, _ = weld([(0, 0, 0), (0.01, 0, 0), (0.02, 0, 0)],
+                           [(0, 1, 2)], tolerance=0.005)
+        assert len(vertices) == 3
+
+    def test_removes_collapsed_triangles(self):
+        vertices, triangles = weld(
+            [(0, 0, 0), (1, 0, 0), (0, 1, 0), (1e-9, 0, 0)],
+            [(0, 1, 2), (0, 3, 2)])
+        assert len(vertices) == 3
+        assert triangles.tolist() == [[0, 1, 2]]
+
+    def test_exact(self):
+        vertices, triangles = weld(*unwelded_cube(), tolerance=0)
+        assert len(vertices) == 8 and len(triangles) == 12
+
+
+class TestReorder:
+
+    def test_strips_unused_and_numbers_by_first_use(self):
+        vertices = np.array([(9, 9, 9), (0, 0, 0), (1, 0, 0), (0, 1, 0)])
+        new_vertices, triangles = reorder(vertices, [(3, 1, 2)])
+        assert triangles.tolist() == [[0, 1, 2]]
+        assert new_vertices.tolist() == [[0, 1, 0], [0, 0, 0], [1, 0, 0]]
+
+    def test_keeps_triangles(self):
+        vertices, triangles = shapes.circle(1, 32)
+        vertices = np.array(vertices)
+        new_vertices, new_triangles = reorder(vertices, triangles)
+        assert (corner_sets(new_vertices, new_triangles)
+                == corner_sets(vertices, np.array(triangles)))
+
+
+class TestCached:
+
+    def setup_method(self):
+        self.reads = 0
+
+    def read(self, path):
+        self.reads += 1
+        return unwelded_cube()
+
+    def test_optimizes_once_per_asset(self, tmp_path):
+        path = str(tmp_path / 'cube.txt')
+        with open(path, 'w') as file:
+            file.write('cube')
+
+        vertices, triangles = cached(path, self.read)
+        assert sorted(os.listdir(tmp_path)) == ['cache', 'cube.txt']
+        cached_vertices, cached_triangles = cached(path, self.read)
+        assert self.reads == 1
+        assert isinstance(cached_vertices, np.memmap)
+        assert np.array_equal(vertices, cached_vertices)
+        assert np.array_equal(triangles, cached_triangles)
+
+        with open(path, 'w') as file:
+            file.write('a changed cube')
+        cached(path, self.read)
+        assert self.reads == 2
+
+    def test_mesh_load(self, tmp_path):
+        path = str(tmp_path / 'cube.txt')
+        vertices, triangles = unwelded_cube()
+        with open(path, 'w') as file:
+            file.writelines(f'{x} {y} {z}\n' for x, y, z in vertices)
+            file.write('\n')
+            file.writelines(f'{a} {b} {c}\n' for a, b, c in triangles)
+
+        mesh = Mesh.from_path(path, optimized=True)
+        assert len(mesh.points) == 8 and len(mesh.triangles) == 12
+        assert (corner_sets(mesh.vertices, mesh.indices)
+                == corner_sets(*optimize(vertices, triangles)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import struct
+
+import numpy as np
+from pytest import main, mark, raises
+
+import shapes
+from geometry import Mesh, ShapeCache
+from pixels import (BI_BITFIELDS, BITFIELD_MASKS, PixelCamera, PixelGrid,
+    Texture, covered_pixels)
+
+
+WATERMELON = 'data/textures/Watermelon.256.bmp'
+
+
+def write_bitmap(path, rgb, bits=24, top_down=False, bitfields=False):
+    """ Write the (width, height, 3) array rgb, indexed by x and then y
+    up from the bottom, as a BMP file.
+    """
+    width, height = rgb.shape[:2]
+    pixel_bytes = bits // 8
+    rows = np.zeros((height, width, pixel_bytes), dtype=np.uint8)
+    rows[..., :3] = rgb.transpose(1, 0, 2)[..., ::-1]
+    if top_down:
+        rows = rows[::-1]
+    padding = -width*pixel_bytes % 4
+    pixel_data = b''.join(row.tobytes() + bytes(padding) for row in rows)
+
+    masks = struct.pack('<III', *BITFIELD_MASKS) if bitfields else b''
+    offset = 54 + len(masks)
+    with open(path, 'wb') as file:
+        file.write(struct.pack('<2sIHHI', b'BM', offset + len(pixel_data),
+                               0, 0, offset))
+        file.write(struct.pack('<IiiHHIIiiII', 40, width,
+                               -height if top_down else height, 1, bits,
+                               BI_BITFIELDS if bitfields else 0,
+                               len(pixel_data), 2835, 2835, 0, 0))
+        file.write(masks + pixel_data)
+
+
+@mark.parametrize('bits, top_down, bitfields', [
+    (24, False, False), (24, True, False), (32, False, False),
+    (32, True, True)])
+def test_from_bitmap(tmp_path, bits, top_down, bitfields):
+    rgb = np.random.randint(0, 256, (5, 3, 3), dtype=np.uint8)
+    path = str(tmp_path / 'image.bmp')
+    write_bitmap(path, rgb, bits, top_down, bitfields)
+
+    for mapped in (False, True):
+        texture = Texture.from_bitmap(path, mapped=mapped)
+        assert (texture.width, texture.height) == (5, 3)
+        assert np.array_equal(texture.planes, rgb.transpose(2, 0, 1))
+        assert not texture.planes.flags.writeable
+        assert not texture.planes.flags.owndata
+
+        grid = PixelGrid.from_bitmap(path, mapped=mapped)
+        assert grid.pixels.shape == (2, 3, 5, 3)
+        assert grid.depth.shape == (5, 3)
+        assert np.array_equal(grid.red, rgb[..., 0])
+        assert np.array_equal(grid.green, rgb[..., 1])
+        assert np.array_equal(grid.blue, rgb[..., 2])
+
+
+def test_bitmap_grids_can_be_drawn():
+    grid = PixelGrid.from_bitmap(WATERMELON)
+    grid.clear((1, 2, 3))
+    grid.draw_triangles([(0, 0), (256, 0), (0, 173)], [(0, 1, 2)],
+                        depths=(1, 1, 1))
+    grid.flip()
+    assert grid.red[0, 0] == 255 and grid.red[255, 172] == 1
+    grid.flip()
+    assert grid.red[255, 172] != 1
+
+
+def test_texture_is_a_snapshot():
+    grid = make_grid(4, 2)
+    texture = Texture(grid.planes)
+    grid.red[:] = 9
+    assert not texture.planes.any()
+    with raises(ValueError):
+        texture.planes[0, 0, 0] = 1
+    with raises(ValueError):
+        Texture(np.zeros((4, 4)))
+
+
+def test_watermelon():
+    texture = Texture.from_bitmap(WATERMELON, mapped=True)
+    assert texture.planes.shape == (3, 256, 173)
+    with open(WATERMELON, 'rb') as file:
+        file.seek(54)
+        assert tuple(file.read(3)) == tuple(texture.planes[::-1, 0, 0])
+
+
+def test_invalid(tmp_path):
+    path = tmp_path / 'image.bmp'
+    write_bitmap(str(path), np.zeros((4, 4, 3), dtype=np.uint8), bits=24)
+    data = path.read_bytes()
+
+    for invalid in (data[:20], b'PN' + data[2:], data[:-1],
+                    data[:28] + struct.pack('<H', 8) + data[30:]):
+        path.write_bytes(invalid)
+        with raises(SyntaxError):
+            Texture.from_bitmap(str(path))
+
+
+def make_grid(width, height):
+    grid = PixelGrid()
+    grid.resize_grids(width, height)
+    return grid
+
+
+def test_covered_pixels():
+    points = np.array([(0, 0), (8, 0), (8, 8), (0, 8), (100, 100)], float)
+    triangles = np.array([(0, 1, 2), (0, 2, 3), (0, 1, 4), (0, 0, 1)])
+    covered = list(covered_pixels(points, triangles, 8, 8))
+    numbers, xs, ys = map(np.concatenate, list(zip(*covered))[:3])
+    weights = np.concatenate([block[3] for block in covered], axis=1)
+
+    # The square covers each pixel once, apart from its diagonal.
+    square = numbers < 2
+    assert len(set(zip(xs[square], ys[square]))) == 64
+    assert np.count_nonzero(square) == 64 + 8
+    assert np.allclose(weights.sum(axis=0), 1)
+    assert np.all(weights >= 0)
+    assert np.allclose((weights.T[:, :, None]*points[triangles[numbers]]
+                        ).sum(axis=1), np.column_stack((xs, ys)) + 0.5)
+    assert 3 not in numbers
+
+
+def test_draw_textured_triangles():
+    texture = make_grid(2, 1)
+    texture.pixels[0, :, 1, 0] = 200
+
+    # A quad seen at an angle, with its right side twice as far away.
+    grid = make_grid(30, 10)
+    points = np.array([(0, 0), (30, 0), (30, 10), (0, 10)], float)
+    triangles = np.array([(0, 1, 2), (0, 2, 3)])
+    uvs = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], float)
+    grid.clear()
+    grid.draw_triangles(points, triangles, np.array([1.0, 0.5]),
+                        depths=np.array([1.0, 2.0, 2.0, 1.0]), uvs=uvs,
+                        texture=texture)
+    grid.flip()
+
+    # Halfway across the texture is two thirds of the way across the
+    # screen, not halfway.
+    red = grid.red.astype(int)
+    assert np.all(red[:19, 1] == 0) and np.all(red[21:, 1] == 200)
+    assert np.all(red[21:23, 8] == 100)
+    assert np.all(grid.depth[:, 5] < 2) and np.all(grid.depth[:, 5] > 1)
+
+    # Nearer triangles cover farther ones, whatever the order.
+    near, far = make_grid(1, 1), make_grid(1, 1)
+    near.pixels[:] = 50
+    far.pixels[:] = 250
+    for order in ((near, 1.0), (far, 2.0)), ((far, 2.0), (near, 1.0)):
+        grid.clear()
+        for texture, depth in order:
+            grid.draw_triangles(points, triangles, depths=np.full(4, depth),
+                                uvs=uvs, texture=texture)
+        grid.flip()
+        assert np.all(grid.red == 50)
+
+    # Flat triangles are depth tested against textured ones too.
+    for flat_depth, red in (1.0, 70), (3.0, 250):
+        for flat_first in (True, False):
+            grid.clear()
+            if not flat_first:
+                grid.draw_triangles(points, triangles, uvs=uvs, texture=far,
+                                    depths=np.full(4, 2.0))
+            grid.draw_triangles(points, triangles, color=(70, 0, 0),
+                                depths=np.full(4, flat_depth))
+            if flat_first:
+                grid.draw_triangles(points, triangles, uvs=uvs, texture=far,
+                                    depths=np.full(4, 2.0))
+            grid.flip()
+            assert np.all(grid.red == red)
+
+
+def test_pixel_camera():
+    texture = Texture.from_bitmap(WATERMELON)
+    points, triangles = shapes.cube(2)
+    cube = Mesh((points, triangles), (0, 0, 4), (0.4, 0.5, 0),
+                uvs=points[:, :2] / 2 + 0.5, texture=texture)
+    camera = PixelCamera(make_grid(64, 48), meshes=(cube,))
+    camera.draw_frame()
+
+    shown = camera.grid.planes
+    assert shown[:, 32, 24].any() and not shown[:, 0, 0].any()
+    assert np.isfinite(camera.grid.depth[32, 24])
+
+
+def test_shape_cache_keeps_textures_only():
+    cache = ShapeCache()
+    grid = make_grid(4, 3)
+    first = cache.get('heightmap', grid)
+    grid.apply_to_pixels(grid.red, lambda x, y: x*50)
+    assert cache.get('heightmap', grid) is not first
+    assert len(cache) == 0
+
+    texture = Texture(grid.planes)
+    assert cache.get('heightmap', texture) is cache.get('heightmap', texture)
+    assert len(cache) == 1
+
+
+@mark.parametrize('keywords', [
+    {},
+    {'chunk_pixels': 100},
+    {'chunk_pixels': 1},
+    {'workers': 3},
+    {'chunk_pixels': 250, 'workers': 2},
+])
+def test_apply_to_pixels(keywords):
+    grid = make_grid(37, 23)
+    grid.apply_to_pixels(grid.red, lambda x, y: x^y, **keywords)
+    grid.apply_to_pixels(grid.green, lambda x, y: (x + y)/2, **keywords)
+    grid.apply_to_pixels(grid.blue, lambda x, y: 7, **keywords)
+    for (x, y), red in np.ndenumerate(grid.red):
+        assert red == x^y
+        assert grid.green[x, y] == (x + y)//2
+    assert (grid.blue == 7).all()
+
+
+def test_apply_to_pixels_errors():
+    def function(x, y):
+        raise ZeroDivisionError
+    grid = make_grid(10, 10)
+    with raises(ZeroDivisionError):
+        grid.apply_to_pixels(grid.red, function, chunk_pixels=10, workers=2)
+    grid.apply_to_pixels(grid.red[:0], function)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from formats import ply
+
+
+def write_ply(path, points, faces, byte_order='<'):
+    faces = np.asarray(faces)
+    vertex = np.zeros(len(points), dtype=[
+        ('x', 'f4'), ('y', 'f4'), ('z', 'f4'), ('red', 'u1')])
+    vertex['x'], vertex['y'], vertex['z'] = np.asarray(points).T
+    face = np.zeros(len(faces), dtype=[
+        ('count', 'u1'), ('indices', 'i4', (faces.shape[1],))])
+    face['count'] = faces.shape[1]
+    face['indices'] = faces
+    format_name = {'<': 'little', '>': 'big'}[byte_order]
+    header = (f'ply\nformat binary_{format_name}_endian 1.0\n'
+              f'comment made by a test\n'
+              f'element vertex {len(points)}\n'
+              'property float x\nproperty float y\nproperty float z\n'
+              'property uchar red\n'
+              f'element face {len(faces)}\n'
+              'property list uchar int vertex_indices\nend_header\n')
+    with open(path, 'wb') as file:
+        file.write(header.encode())
+        file.write(vertex.astype(vertex.dtype.newbyteorder(byte_order))
+                   .tobytes())
+        file.write(face.astype(face.dtype.newbyteorder(byte_order))
+                   .tobytes())
+
+
+class TestPLY:
+
+    def setup_method(self):
+        self.points, self.triangles = shapes.cube(2)
+
+    def test_views(self, tmp_path):
+        for byte_order in '<>':
+            path = str(tmp_path / f'cube{byte_order == "<"}.ply')
+            write_ply(path, self.points, self.triangles, byte_order)
+            ply_file = ply.PLYFile(path)
+
+            assert len(ply_file) == 8
+            assert np.shares_memory(ply_file.vertices,
+                                    ply_file.elements['vertex'])
+            assert np.shares_memory(ply_file.faces,
+                                    ply_file.elements['face'])
+            assert np.allclose(ply_file.vertices, self.points)
+            assert np.array_equal(ply_file.faces, self.triangles)
+
+    def test_mesh_keeps_mapping(self, tmp_path):
+        path = str(tmp_path / 'cube.ply')
+        write_ply(path, self.points, self.triangles)
+        ply_file = ply.PLYFile(path)
+        mesh = ply_file.mesh()
+        assert np.shares_memory(mesh.points, ply_file.elements['vertex'])
+        assert not mesh.points.flags.writeable
+        assert not np.shares_memory(ply_file.mesh(copy=True).points,
+                                    ply_file.elements['vertex'])
+
+    def test_quads_fanned(self, tmp_path):
+        path = str(tmp_path / 'square.ply')
+        write_ply(path, [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)],
+                  [(0, 1, 2, 3)])
+        mesh = ply.load(path).children[0].mesh
+        assert mesh.triangles.tolist() == [[0, 1, 2], [0, 2, 3]]
+
+    def test_errors(self, tmp_path):
+        path = tmp_path / 'cube.ply'
+        write_ply(str(path), self.points, self.triangles)
+        source = path.read_bytes()
+
+        path.write_bytes(source + b'\0')
+        with raises(SyntaxError):
+            ply.PLYFile(str(path))
+        path.write_bytes(source.replace(b'binary_little_endian', b'ascii'))
+        with raises(SyntaxError):
+            ply.PLYFile(str(path))
+        path.write_bytes(source.replace(b'property float x',
+                                        b'property float32x x'))
+        with raises(SyntaxError):
+            ply.PLYFile(str(path))
+        path.write_bytes(source.replace(b'property float x',
+                                        b'property float w'))
+        with raises(SyntaxError):
+            ply.PLYFile(str(path))
+
+
+if __name__ == '__main__':
+    main()
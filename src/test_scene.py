@@ -0,0 +1,282 @@
+from math import pi
+
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from geometry import Instance, Mesh, SharedGeometry
+from scene import Node, Scene, pack_meshes
+
+
+class TestScene:
+
+    def setup_method(self):
+        self.cube = Mesh(shapes.cube(1), (0, 0, 0))
+        self.circle = Mesh(shapes.circle(1, 5), (1, 0, 0))
+        self.scene = Scene([self.cube, self.circle], vertex_capacity=1,
+                           triangle_capacity=1)
+
+    def test_set_behaviour(self):
+        assert len(self.scene) == 2
+        assert self.cube in self.scene
+        assert set(self.scene) == {self.cube, self.circle}
+
+        self.scene.add(self.cube)
+        assert len(self.scene) == 2
+
+        self.scene.remove(self.cube)
+        assert self.cube not in self.scene
+        with raises(KeyError):
+            self.scene.remove(self.cube)
+
+    def test_str_lists_buffers(self):
+        text = str(self.scene)
+        assert text.startswith('<Scene vertices=[')
+        assert text.count('[') == 2 + len(self.scene.vertices)
+        assert '(8,9,10)' in text and text.endswith(')]>')
+
+    def test_buffers(self):
+        vertices, triangles = self.scene.buffers(self.circle)
+        assert vertices.dtype == np.float32
+        assert triangles.dtype == np.uint32
+        assert np.allclose(vertices, self.circle.vertices)
+        assert np.array_equal(triangles, self.circle.indices)
+
+    def test_packed_triangles_index_packed_vertices(self):
+        vertices = self.scene.vertices
+        triangles = self.scene.triangles
+        assert len(vertices) == 8 + 5
+        assert len(triangles) == 12 + 3
+        assert np.allclose(vertices[triangles[12:]],
+                           self.circle.vertices[self.circle.indices])
+
+    def test_capacity_doubles(self):
+        capacity = len(self.scene._vertices)
+        assert capacity >= 13
+        assert capacity & (capacity - 1) == 0
+
+    def test_lazy_compaction(self):
+        self.scene.discard(self.cube)
+        assert self.scene.ranges[self.circle].vertex_start == 8
+
+        vertices, triangles = self.scene.vertices, self.scene.triangles
+        assert self.scene.ranges[self.circle].vertex_start == 0
+        assert len(vertices) == 5
+        assert np.allclose(vertices[triangles],
+                           self.circle.vertices[self.circle.indices])
+
+    def test_detail_levels(self):
+        disc = Mesh(shapes.circle(1, 64), (0, 0, 0))
+        self.scene.add(disc)
+        levels = self.scene.add_detail_levels(disc, (1.0, 0.5), (10,))
+        vertices, triangles = self.scene.buffers(disc, 1)
+        assert len(triangles) < len(self.scene.buffers(disc)[1])
+        assert triangles.max() < len(vertices)
+
+        self.scene.refresh(disc)
+        assert self.scene.detail_levels[disc] is not levels
+        self.scene.discard(disc)
+        assert disc not in self.scene.detail_levels
+
+    def test_face_normals_cached_until_refresh(self):
+        normals = self.scene.face_normals(self.circle)
+        assert np.allclose(normals, (0, 0, -1))
+        assert self.scene.face_normals(self.circle) is normals
+
+        self.circle.triangles = self.circle.triangles[:, ::-1].copy()
+        assert self.scene.face_normals(self.circle) is normals
+        self.scene.refresh(self.circle)
+        assert np.allclose(self.scene.face_normals(self.circle), (0, 0, 1))
+
+    def test_clear(self):
+        self.scene.clear()
+        assert len(self.scene) == 0
+        assert len(self.scene.vertices) == len(self.scene.triangles) == 0
+
+
+class TestSceneInstances:
+
+    def setup_method(self):
+        self.geometry = SharedGeometry(shapes.cube(1))
+        self.instances = [Instance(self.geometry, (x, 0, 0))
+                          for x in range(3)]
+        self.circle = Mesh(shapes.circle(1, 5), (0, 0, 0))
+        self.scene = Scene([self.circle, *self.instances])
+
+    def test_face_normals_shared(self):
+        first, second, _ = self.instances
+        normals = self.scene.face_normals(first)
+        assert self.scene.face_normals(second) is normals
+        assert np.allclose(np.linalg.norm(normals, axis=1), 1)
+
+    def test_geometry_copied_once(self):
+        assert len(self.scene.vertices) == 5 + 8
+        assert len({self.scene.ranges[instance]
+                    for instance in self.instances}) == 1
+        assert len(self.scene.triangles) == 3 + 12
+        assert (self.scene.triangle_bvh(self.instances[0])
+                is self.scene.triangle_bvh(self.instances[2]))
+
+    def test_discard_keeps_shared_range(self):
+        self.scene.discard(self.instances[0])
+        self.scene.discard(self.circle)
+        self.scene.compact()
+        vertices, triangles = self.scene.buffers(self.instances[1])
+        assert np.array_equal(vertices, self.geometry.vertices)
+        assert np.array_equal(triangles, self.geometry.indices)
+        assert (self.scene.ranges[self.instances[1]]
+                == self.scene.ranges[self.instances[2]])
+
+        for instance in self.instances[1:]:
+            self.scene.discard(instance)
+        assert not len(self.scene.vertices)
+
+
+class TestNode:
+
+    def setup_method(self):
+        self.root = Node(position=(1, 0, 0))
+        self.arm = Node(position=(0, 1, 0), rotation=(0, 0, pi / 2),
+                        parent=self.root)
+        self.hand = Node(position=(1, 0, 0), parent=self.arm)
+
+    def test_world_matrix(self):
+        assert np.allclose(self.hand.world_matrix[:3, 3], (1, 2, 0))
+
+    def test_dirty_propagation(self):
+        self.hand.world_matrix
+        assert not self.hand._dirty
+
+        self.root.move_by(0, 0, 5)
+        assert self.arm._dirty and self.hand._dirty
+        assert np.allclose(self.hand.world_matrix[:3, 3], (1, 2, 5))
+
+    def test_reparent(self):
+        self.root.add(self.hand)
+        assert self.hand.parent is self.root
+        assert self.hand not in self.arm.children
+        assert np.allclose(self.hand.world_matrix[:3, 3], (2, 0, 0))
+
+    def test_world_matrices_batch(self):
+        self.root.move_by(0, 3, 0)
+        nodes, matrices = self.root.world_matrices()
+
+        assert nodes == [self.root, self.arm, self.hand]
+        assert matrices.shape == (3, 4, 4)
+        assert not any(node._dirty for node in nodes)
+        for node, matrix in zip(nodes, matrices):
+            assert np.allclose(node.world_matrix, matrix)
+        assert np.allclose(matrices[2, :3, 3], (1, 5, 0))
+
+
+class TestSceneGraph:
+
+    def test_model_matrices(self):
+        scene = Scene()
+        loose = Mesh(shapes.cube(1), (0, 0, 4))
+        body = Mesh(shapes.cube(1), (0, 0, 0))
+        wheel = Mesh(shapes.cube(1), (1, 0, 0))
+
+        scene.add(loose)
+        body_node = scene.attach(body, (0, 2, 0))
+        scene.attach(wheel, parent=body_node)
+        body_node.move_by(3, 0, 0)
+
+        meshes, matrices = scene.model_matrices()
+        positions = dict(zip(meshes, matrices[:, :3, 3].tolist()))
+        assert positions == {loose: [0, 0, 4], body: [3, 2, 0],
+                             wheel: [4, 2, 0]}
+
+        scene.discard(body)
+        assert body_node.mesh is None
+        meshes, matrices = scene.model_matrices()
+        assert np.allclose(matrices[meshes.index(wheel), :3, 3], (4, 2, 0))
+
+    def test_model_matrices_only_update_dirty_subtrees(self, monkeypatch):
+        scene = Scene()
+        first, second, child = (Mesh(shapes.cube(1), (0, 0, 0))
+                                for _ in range(3))
+        first_node = scene.attach(first, (1, 0, 0))
+        second_node = scene.attach(second, (2, 0, 0))
+        child_node = scene.attach(child, (0, 1, 0), parent=second_node)
+        scene.model_matrices()
+
+        updated = []
+        world_matrices = Node.world_matrices
+
+        def spy(node):
+            updated.append(node)
+            return world_matrices(node)
+        monkeypatch.setattr(Node, 'world_matrices', spy)
+
+        scene.model_matrices()
+        assert updated == []
+        second_node.move_by(0, 0, 3)
+        meshes, matrices = scene.model_matrices()
+        assert updated == [second_node]
+        assert not child_node._dirty and not first_node._dirty
+        assert np.allclose(matrices[meshes.index(child), :3, 3], (2, 1, 3))
+
+    def test_attach_packed_tree(self):
+        scene = Scene([Mesh(shapes.cube(1), (0, 0, 0))], vertex_capacity=1,
+                      triangle_capacity=1)
+        root = Node()
+        meshes = [Mesh(shapes.circle(1, 5), (1, 0, 0)),
+                  Mesh(shapes.cube(2), (0, 1, 0))]
+        for mesh in meshes:
+            Node(mesh, parent=root)
+        packed = pack_meshes(meshes)
+        assert packed.vertices.dtype == np.float32
+        assert len(packed.triangles) == 3 + 12
+
+        scene.attach_tree(root, packed=packed)
+        for mesh in meshes:
+            vertices, triangles = scene.buffers(mesh)
+            assert np.allclose(vertices, mesh.vertices)
+            assert np.array_equal(triangles, mesh.indices)
+            assert np.allclose(scene.bounds[mesh],
+                               (mesh.vertices.min(axis=0),
+                                mesh.vertices.max(axis=0)))
+            assert scene.nodes[mesh].mesh is mesh
+        assert len(scene) == 3 and len(scene.vertices) == 8 + 5 + 8
+
+
+class TestSceneVisibility:
+
+    def setup_method(self):
+        self.ahead = Mesh(shapes.cube(1), (0, 0, 5), static=True)
+        self.behind = Mesh(shapes.cube(1), (0, 0, -5), static=True)
+        self.scene = Scene([self.ahead, self.behind])
+        # Only points with z >= 1 are in view.
+        self.planes = [(0, 0, 1, -1)]
+
+    def test_static_meshes_are_culled(self):
+        assert self.scene.visible(self.planes) == [self.ahead]
+
+    def test_relocate(self):
+        self.behind.move_by(0, 0, 20)
+        assert self.behind not in self.scene.visible(self.planes)
+        self.scene.relocate(self.behind)
+        assert self.behind in self.scene.visible(self.planes)
+
+    def test_meshes_are_dynamic_by_default(self):
+        moving = Mesh(shapes.cube(1), (0, 0, -5))
+        self.scene.add(moving)
+        assert moving not in self.scene.octree
+        moving.move_by(0, 0, 20)
+        assert moving in self.scene.visible(self.planes)
+
+    def test_dynamic_meshes_culled_where_they_are(self):
+        node = self.scene.attach(self.behind)
+        assert self.behind not in self.scene.octree
+        assert self.scene.visible(self.planes) == [self.ahead]
+
+        node.move_by(0, 0, 20)
+        assert set(self.scene.visible(self.planes)) == {self.ahead,
+                                                        self.behind}
+        self.scene.discard(self.ahead)
+        assert self.scene.visible(self.planes) == [self.behind]
+
+
+if __name__ == '__main__':
+    main()
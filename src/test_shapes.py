@@ -0,0 +1,128 @@
+from math import pi
+
+import numpy as np
+from pytest import main, mark, raises
+
+import shapes
+
+
+def signed_volume(points, triangles):
+    corners = np.asarray(points, dtype=float)[np.asarray(triangles)]
+    return np.einsum('ij,ij->i', corners[:, 0],
+                     np.cross(corners[:, 1], corners[:, 2])).sum() / 6
+
+
+def is_closed(triangles):
+    """ Return whether every edge is used once in each direction.
+    """
+    triangles = np.asarray(triangles)
+    edges = np.concatenate((triangles[:, [0, 1]], triangles[:, [1, 2]],
+                            triangles[:, [2, 0]])).tolist()
+    directed = set(map(tuple, edges))
+    return (len(directed) == len(edges)
+            and all((end, start) in directed for start, end in directed))
+
+
+@mark.parametrize('name, args, volume', [
+    ('sphere', (1, 128), 4 / 3*pi),
+    ('spheroid', (1, 2, 3, 128), 4 / 3*pi*6),
+    ('cylinder', (1, 2, 128), 2*pi),
+    ('ring', (2, 1, 0.5, 128), pi*(4 - 1)*0.5),
+    ('pyramid', (1, 4, 3), 2),
+])
+def test_closed_and_facing_outwards(name, args, volume):
+    points, triangles = shapes.SHAPE_FUNCTIONS[name](*args)
+    assert is_closed(triangles)
+    assert np.isclose(signed_volume(points, triangles), volume, rtol=1e-2)
+
+
+def test_sphere_counts():
+    points, triangles = shapes.sphere(1, 16)
+    assert len(points) == 2 + 7*16
+    assert len(triangles) == 2*16*7
+    assert np.allclose(np.linalg.norm(points, axis=1), 1)
+
+
+def test_flat_ring():
+    points, triangles = shapes.ring(2, 0.5, segments=8)
+    radii = np.linalg.norm(points, axis=1)
+    assert np.allclose(sorted(set(np.round(radii, 6))), (1.5, 2))
+    assert np.allclose(points[:, 2], 0)
+    assert len(triangles) == 16
+
+
+def test_geometry_arrays():
+    geometry = shapes.Geometry([(0, 0, 0), (1, 0, 0), (0, 1, 0)],
+                               [(0, 1, 2)])
+    assert geometry.points.shape == (3, 3)
+    assert geometry.points.dtype == float
+    assert geometry.triangles.tolist() == [[0, 1, 2]]
+    assert shapes.Geometry((), ()).points.shape == (0, 3)
+
+    with raises(ValueError):
+        shapes.Geometry([(0, 0)], ())
+    with raises(ValueError):
+        shapes.Geometry([(0, 0, 0)], [(0, 0, 1)])
+    with raises(TypeError):
+        shapes.Geometry([(0, 0, 0)], [(0, 0, 0.5)])
+
+
+def test_shapes_return_geometry():
+    for name, args in (('cube', (1,)), ('polygon', (5, 1)),
+                       ('sphere', (1,)), ('ring', (1, 0.5))):
+        assert isinstance(shapes.SHAPE_FUNCTIONS[name](*args),
+                          shapes.Geometry)
+
+
+class TestHeightmap:
+
+    def setup_method(self):
+        rows, columns = np.mgrid[0:33, 0:33]
+        self.image = np.sin(columns / 5)*np.cos(rows / 7) / 2 + 0.5
+        self.image[:16, :16] = 0.25
+
+    def test_full_grid(self):
+        points, triangles = shapes.heightmap(
+            (self.image*255).astype(np.uint8), 2, 3, 10)
+        assert len(points) == 33*33 and len(triangles) == 2*32*32
+        assert np.allclose(points.min(axis=0), (-1, 0, -1.5), atol=0.05)
+        assert np.allclose(points.max(axis=0), (1, 10, 1.5), atol=0.05)
+
+    def test_plane_merges_to_two_triangles(self):
+        rows, columns = np.mgrid[0:9, 0:9]
+        points, triangles = shapes.heightmap(0.1*columns + 0.05*rows,
+                                             max_error=1e-6)
+        assert len(points) == 4 and len(triangles) == 2
+
+    def test_max_error(self):
+        points, triangles = shapes.heightmap(self.image, 2, 3,
+                                             max_error=0.01)
+        assert len(triangles) < 2*32*32
+
+        # The triangles still cover the whole grid once.
+        corners = points[triangles]
+        areas = np.cross(corners[:, 1] - corners[:, 0],
+                         corners[:, 2] - corners[:, 0])[:, 1] / 2
+        assert np.all(areas > 0) and np.isclose(areas.sum(), 6)
+
+        columns = np.round((points[:, 0] / 2 + 0.5)*32).astype(int)
+        rows = np.round((points[:, 2] / 3 + 0.5)*32).astype(int)
+        assert np.abs(points[:, 1] - self.image[rows, columns]).max() <= 0.01
+
+    def test_color_image(self):
+        image = np.zeros((4, 5, 4), dtype=np.uint8)
+        image[..., 0] = 255
+        points, _ = shapes.heightmap(image, height=3)
+        assert np.allclose(points[:, 1], 1)
+
+
+def test_circle_unchanged():
+    points, triangles = shapes.circle(1, 4)
+    assert np.allclose(points, [(0, 1, 0), (1, 0, 0), (0, -1, 0),
+                                (-1, 0, 0)])
+    assert [tuple(triangle) for triangle in triangles] == [(0, 1, 2),
+                                                           (0, 2, 3)]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from formats import stl
+
+
+def write_stl(path, points, triangles):
+    corners = np.asarray(points, dtype=np.float32)[np.asarray(triangles)]
+    records = np.zeros(len(corners), dtype=stl.TRIANGLE)
+    records['corners'] = corners
+    with open(path, 'wb') as file:
+        file.write(b'binary cube'.ljust(stl.HEADER_BYTES))
+        file.write(np.uint32(len(records)).tobytes())
+        file.write(records.tobytes())
+
+
+class TestSTL:
+
+    def setup_method(self):
+        self.points, self.triangles = shapes.cube(2)
+
+    def test_views_and_weld(self, tmp_path):
+        path = str(tmp_path / 'cube.stl')
+        write_stl(path, self.points, self.triangles)
+        stl_file = stl.STLFile(path)
+
+        assert len(stl_file) == 12
+        assert isinstance(stl_file.records, np.memmap)
+        assert np.shares_memory(stl_file.corners, stl_file.records)
+        assert np.allclose(stl_file.corners,
+                           self.points[self.triangles])
+
+        assert len(stl_file.vertices) == 8
+        assert np.allclose(stl_file.vertices[stl_file.faces],
+                           stl_file.corners)
+
+        mesh = stl.load(path).children[0].mesh
+        assert len(mesh.points) == 8 and len(mesh.triangles) == 12
+
+    def test_size_checked(self, tmp_path):
+        path = tmp_path / 'cube.stl'
+        write_stl(str(path), self.points, self.triangles)
+        path.write_bytes(path.read_bytes()[:-1])
+        with raises(SyntaxError):
+            stl.STLFile(str(path))
+
+        path.write_bytes(b'solid cube\nendsolid cube\n')
+        with raises(SyntaxError):
+            stl.STLFile(str(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import numpy as np
+from pytest import main, raises
+
+import shapes
+from geometry import Instance, Mesh, SharedGeometry
+from subdivision import loop
+from test_shapes import is_closed, signed_volume
+
+
+class TestLoop:
+
+    def test_counts(self):
+        points, triangles = loop(*shapes.cube(2), levels=2)
+        # Each level adds a point per edge and splits every triangle.
+        assert len(points) == 8 + 18 + 72
+        assert len(triangles) == 12*16
+        assert is_closed(triangles)
+
+    def test_smooths_towards_sphere(self):
+        points, triangles = loop(*shapes.sphere(1, 8), levels=3)
+        radii = np.linalg.norm(points, axis=1)
+        # The limit surface lies inside the original points.
+        assert radii.max() <= 1
+        assert radii.min() > 0.9*radii.max()
+        assert signed_volume(points, triangles) > 0
+
+    def test_plane_stays_flat(self):
+        points, triangles = loop(*shapes.circle(1, 8))
+        assert np.allclose(points[:, 2], 0)
+        assert len(triangles) == 4*6
+
+    def test_regular_vertex_weights(self):
+        # The center of a hexagon fan has six neighbours, and so moves
+        # by a weight of 1/16 towards each of them.
+        points, _ = shapes.centered_circle(1, 6)
+        points = points + (0, 0, 1)*(np.arange(7) == 0)[:, None]
+        new_points, _ = loop(points, shapes.centered_circle(1, 6).triangles)
+        assert np.isclose(new_points[0, 2], 1 - 6 / 16)
+
+
+class TestMeshSubdivide:
+
+    def test_subdivide(self):
+        mesh = Mesh(shapes.cube(1), (0, 0, 0))
+        half_edges = mesh.half_edges
+        mesh.subdivide(2)
+        assert len(mesh.triangles) == 12*16
+        assert mesh.triangles.dtype == np.uint32
+        assert mesh.half_edges is not half_edges
+        assert mesh.half_edges.is_manifold()
+
+    def test_instances_cannot_subdivide(self):
+        with raises(TypeError):
+            Instance(SharedGeometry(shapes.cube(1)), (0, 0, 0)).subdivide()
+
+
+if __name__ == '__main__':
+    main()
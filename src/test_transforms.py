@@ -0,0 +1,52 @@
+from math import pi
+
+import numpy as np
+from pytest import main
+
+import transforms
+
+
+def test_quaternion_from_euler_identity():
+    assert np.allclose(transforms.quaternion_from_euler(0, 0, 0),
+                       transforms.IDENTITY_QUATERNION)
+
+
+def test_to_matrix_quarter_turns():
+    rotation = transforms.to_matrix(transforms.quaternion_from_euler(
+        0, 0, pi / 2))
+    assert np.allclose(rotation @ (1, 0, 0), (0, 1, 0))
+
+    rotation = transforms.to_matrix(transforms.quaternion_from_euler(
+        pi / 2, 0, 0))
+    assert np.allclose(rotation @ (0, 1, 0), (0, 0, 1))
+
+
+def test_multiply_composes_rotations():
+    quarter = transforms.quaternion_from_euler(0, pi / 2, 0)
+    half = transforms.quaternion_from_euler(0, pi, 0)
+    assert np.allclose(transforms.to_matrix(
+        transforms.multiply(quarter, quarter)), transforms.to_matrix(half))
+
+
+def test_integrate_is_vectorized():
+    orientations = np.tile(transforms.IDENTITY_QUATERNION, (3, 1))
+    angular_velocities = [(0, 0, 0), (0, 0, pi), (pi / 2, 0, 0)]
+
+    result = transforms.integrate(orientations, angular_velocities, 1.0)
+
+    assert result.shape == (3, 4)
+    assert np.allclose(result[0], transforms.IDENTITY_QUATERNION)
+    assert np.allclose(transforms.to_matrix(result[1]) @ (1, 0, 0),
+                       (-1, 0, 0))
+    assert np.allclose(transforms.to_matrix(result[2]) @ (0, 1, 0),
+                       (0, 0, 1))
+
+
+def test_model_matrix_apply():
+    matrix = transforms.model_matrix(
+        (1, 2, 3), transforms.quaternion_from_euler(0, 0, pi / 2))
+    assert np.allclose(transforms.apply(matrix, [(1, 0, 0)]), [(1, 3, 3)])
+
+
+if __name__ == '__main__':
+    main()
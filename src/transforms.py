@@ -0,0 +1,93 @@
+"""
+Vectorized quaternion and matrix functions for rigid transforms.
+
+Quaternions are stored as ``(w, x, y, z)`` along the last axis of a
+NumPy array, so any number of them can be processed in a single call.
+"""
+
+import numpy as np
+
+
+IDENTITY_QUATERNION = (1.0, 0.0, 0.0, 0.0)
+
+
+def quaternion_from_euler(x: float, y: float, z: float) -> np.ndarray:
+    """ Return the quaternion for a rotation of x radians about the
+    x axis, followed by y about the y axis, then z about the z axis.
+    """
+    half_x, half_y, half_z = x / 2, y / 2, z / 2
+    rotation_x = (np.cos(half_x), np.sin(half_x), 0.0, 0.0)
+    rotation_y = (np.cos(half_y), 0.0, np.sin(half_y), 0.0)
+    rotation_z = (np.cos(half_z), 0.0, 0.0, np.sin(half_z))
+    return multiply(rotation_z, multiply(rotation_y, rotation_x))
+
+
+def multiply(q1, q2) -> np.ndarray:
+    """ Return the Hamilton products of the quaternions q1 and q2.
+    """
+    w1, x1, y1, z1 = np.moveaxis(np.asarray(q1, dtype=float), -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(np.asarray(q2, dtype=float), -1, 0)
+    return np.stack((
+        w1*w2 - x1*x2 - y1*y2 - z1*z2,
+        w1*x2 + x1*w2 + y1*z2 - z1*y2,
+        w1*y2 - x1*z2 + y1*w2 + z1*x2,
+        w1*z2 + x1*y2 - y1*x2 + z1*w2,
+    ), axis=-1)
+
+
+def normalize(quaternions) -> np.ndarray:
+    """ Return the quaternions scaled to unit length.
+    """
+    quaternions = np.asarray(quaternions, dtype=float)
+    return quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+
+
+def integrate(orientations, angular_velocities, time: float) -> np.ndarray:
+    """ Return the orientations after rotating at the world space
+    angular velocities (radians per second about each axis) for time
+    seconds.
+    """
+    angular_velocities = np.asarray(angular_velocities, dtype=float)
+    speeds = np.linalg.norm(angular_velocities, axis=-1, keepdims=True)
+    half_angles = 0.5*speeds*time
+
+    # Avoid dividing by zero for bodies that are not rotating.
+    axes = angular_velocities / np.where(speeds == 0.0, 1.0, speeds)
+    steps = np.concatenate(
+        (np.cos(half_angles), axes*np.sin(half_angles)), axis=-1)
+
+    return normalize(multiply(steps, orientations))
+
+
+def to_matrix(quaternions) -> np.ndarray:
+    """ Return the 3x3 rotation matrices of unit quaternions.
+    """
+    w, x, y, z = np.moveaxis(np.asarray(quaternions, dtype=float), -1, 0)
+    return np.stack((
+        np.stack((1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)), -1),
+        np.stack((2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)), -1),
+        np.stack((2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)), -1),
+    ), axis=-2)
+
+
+def model_matrix(position, orientation) -> np.ndarray:
+    """ Return the 4x4 matrices rotating by orientation then
+    translating by position.
+    """
+    position = np.asarray(position, dtype=float)
+    rotation = to_matrix(orientation)
+
+    matrix = np.zeros(rotation.shape[:-2] + (4, 4))
+    matrix[..., :3, :3] = rotation
+    matrix[..., :3, 3] = position
+    matrix[..., 3, 3] = 1.0
+    return matrix
+
+
+def apply(matrix, points) -> np.ndarray:
+    """ Return the (N, 3) points transformed by the 4x4 matrix, or the
+    (K, N, 3) points transformed by each of (K, 4, 4) matrices.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    return (np.asarray(points) @ matrix[..., :3, :3].swapaxes(-1, -2)
+            + matrix[..., None, :3, 3])
@@ -21,13 +21,17 @@ Started: April 9th 2017
 
 from typing import Optional, Tuple
 
+import os
 import re
+import time
 from collections import deque
 from functools import partial
 from math import degrees
 from random import random
 from statistics import mean
 
+import numpy as np
+
 from kivy.config import Config
 Config.set('input', 'mouse', 'mouse,disable_multitouch')
 Config.set('kivy', 'exit_on_escape', False)
@@ -36,6 +40,7 @@ from kivy.animation import Animation
 from kivy.app import App
 from kivy.clock import Clock
 from kivy.core.window import Keyboard, Window
+from kivy.graphics.opengl import GL_RGBA, GL_UNSIGNED_BYTE, glReadPixels
 from kivy.logger import Logger
 from kivy.properties import (BooleanProperty, BoundedNumericProperty,
     ObjectProperty, NumericProperty)
@@ -46,10 +51,16 @@ from kivy.uix.label import Label
 from kivy.uix.widget import Widget
 
 from camera import Camera3D, CameraGrid
+from capture import FrameCapture
 from common import TITLE, special_string
 from console import Console
 from controls import shortcut, ShortcutBehavior
 from geometry import Mesh, Physics, PhysicsMesh, RGBA
+from loading import AssetLoader
+
+
+# Captured frames are numbered in a directory named by the start time.
+CAPTURE_PATH = 'captures/%Y%m%d-%H%M%S/{:05d}.png'
 
 
 @shortcut('ctrl+alt+f11')
@@ -87,9 +98,14 @@ class RenderingApp(App):
 
         return WidgetManager()
 
-    @staticmethod
-    def _on_dropfile(win, path: str):
+    def on_stop(self):
+        self.root.loader.shutdown()
+        if self.root.capture is not None:
+            self.root.toggle_capture()
+
+    def _on_dropfile(self, win, path: bytes):
         Logger.info(f'File Dropped: path: {path}, position: {win.mouse_pos}')
+        self.root.load_file(os.fsdecode(path))
 
     @staticmethod
     def _on_focus(win, focus):
@@ -144,10 +160,13 @@ class WidgetManager(ShortcutBehavior, FloatLayout):
         super().__init__(**kwargs)
 
         self.focus = True
+        self.loader = AssetLoader()
+        self.capture: Optional[FrameCapture] = None
         Clock.schedule_interval(self.update, 1 / self.frame_rate)
 
         self.add_shortcut('`', self.toggle_console)
         self.add_shortcut('f12', self.toggle_debug)
+        self.add_shortcut('f9', self.toggle_capture)
 
         self.add_shortcut('0', self.cameras.meshes.clear)
         self.add_shortcut('1', self.cameras.load_meshes_1)
@@ -189,18 +208,31 @@ class WidgetManager(ShortcutBehavior, FloatLayout):
         for view in self.cameras:
             view.reset()
 
+    def load_file(self, path):
+        """ Start loading the meshes of the file at path in the
+        background, notifying if its format is unknown.
+        """
+        try:
+            self.loader.submit(path)
+        except ValueError as error:
+            self.notify(error)
+
     def update(self, time_delta):
-        """ Draw frames for all cameras, update debug information,
-        simulate physics objects.
+        """ Add meshes of a loaded file, draw frames for all cameras,
+        update debug information, simulate physics objects.
         """
+        loading = self.loader.poll(self.cameras.meshes)
+        if loading is not None and loading.error is not None:
+            Logger.error(f'Loading: {loading.path}: {loading.error!r}')
+            self.notify(f'Could not load {loading.name}: {loading.error}')
+
         self.cameras.draw_frame()
         self.fps_counter.update(time_delta)
+        status = (str(self.loader), str(self.capture or ''))
+        self.status_label.text = '\n'.join(filter(None, status))
 
         true_time_delta = self.time_scale*time_delta
-
-        for physics_object in self.cameras.meshes:
-            if isinstance(physics_object, Physics):
-                physics_object.simulate(true_time_delta)
+        Physics.bodies.simulate(true_time_delta)
 
     def notify(self, *objects, duration=None, sep=' '):
         """ Overlay a temporary text notification lasting `duration`
@@ -234,6 +266,39 @@ class WidgetManager(ShortcutBehavior, FloatLayout):
     def toggle_debug(self):
         self.show_debug = not self.show_debug
 
+    def toggle_capture(self):
+        """ Start writing each frame drawn to a new directory of PNG
+        images, or stop and write the frames still queued.
+        """
+        if self.capture is None:
+            self.capture = FrameCapture(time.strftime(CAPTURE_PATH))
+            Window.bind(on_flip=self._capture_frame)
+            self.notify('Capturing frames')
+            return
+
+        Window.unbind(on_flip=self._capture_frame)
+        capture, self.capture = self.capture, None
+        capture.close()
+        if capture.error is not None:
+            Logger.error(f'Capture: {capture.path}: {capture.error!r}')
+            self.notify(f'Could not capture frames: {capture.error}')
+        else:
+            self.notify(f'Captured {capture.frames_written} frames, '
+                        f'{capture.frames_dropped} dropped')
+
+    def _capture_frame(self, window):
+        """ Queue the frame just drawn, before it is flipped to the
+        screen.  Reading the pixels back is the only copy made here,
+        and is skipped for frames that would be dropped.
+        """
+        if not self.capture.ready():
+            return
+        width, height = window.size
+        data = glReadPixels(0, 0, width, height, GL_RGBA, GL_UNSIGNED_BYTE)
+        # Rows are read from the bottom, and padded RGB rows are avoided.
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(height, width, 4)
+        self.capture.capture(frame[::-1, :, :3], copy=False)
+
 
 class FPSCounter(Label, ShownBehaviour):
     """ A Debug label used to keep track of frame rate statistics.